@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from .models import User, Category, Post, Comment
+from .models import User, Category, Post, PostTag, Comment, Tag
+from .search import matching_posts_filter
 
 
 # --- Custom User Admin ---
@@ -26,25 +27,46 @@ class CategoryAdmin(admin.ModelAdmin):
     search_fields = ("name",)
 
 
+# --- Tag Admin ---
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ("name", "post_count")
+    search_fields = ("name",)
+    readonly_fields = ("post_count",)
+
+
+class PostTagInline(admin.TabularInline):
+    model = PostTag
+    autocomplete_fields = ("tag",)
+    extra = 1
+
+
 # --- Post Admin ---
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ("title", "author", "category", "views", "likes", "created_at", "updated_at")
     list_filter = ("category", "author", "created_at")
-    search_fields = ("title", "content", "tags")
+    search_fields = ("title", "content", "tags__name")
     prepopulated_fields = {"slug": ("title",)}
     readonly_fields = ("views", "likes", "created_at", "updated_at")
     raw_id_fields = ("author",)
     autocomplete_fields = ("category",)
     filter_horizontal = ("saved_by", "liked_by")
+    inlines = (PostTagInline,)
 
     fieldsets = (
         ("Basic Info", {"fields": ("author", "title", "slug", "content", "image", "category")}),
-        ("Metadata", {"fields": ("tags", "views", "likes")}),
+        ("Metadata", {"fields": ("views", "likes")}),
         ("Relations", {"fields": ("saved_by", "liked_by")}),
         ("Timestamps", {"fields": ("created_at", "updated_at")}),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of LIKE '%q%' scans over search_fields
+        if not search_term:
+            return queryset, False
+        return queryset.filter(matching_posts_filter(search_term)), False
+
 
 # --- Comment Admin ---
 @admin.register(Comment)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
+
+    def ready(self):
+        from . import authentication, caching, denorm, feeds, metrics, search, tagging, trending  # noqa: F401  (connect signal handlers)
+
+        if metrics.get_config()['ENABLED']:
+            metrics.instrument_serializers()  # patches DRF process-wide
@@ -0,0 +1,175 @@
+"""
+Native async versions of the hottest post endpoints.
+
+Served under `/api/async/` next to the DRF viewsets, which stay the
+canonical API. Reads go through Django's async ORM (`aget`, `async for`)
+and the response bodies are byte-for-byte those of the DRF views, so a
+client can switch between the two freely. The toggles need a
+transaction, which Django only runs synchronously, so each one makes a
+single `sync_to_async` hop into `toggle_like` / `toggle_save`.
+
+Not covered here: the anonymous response cache (blog/caching.py) and
+content negotiation; these views always answer JSON.
+
+`post_events` only exists here: a server-sent event stream holds its
+connection open, which only the ASGI application can afford.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.exceptions import AuthenticationFailed, NotFound
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import fastpath, live
+from .authentication import cached_user, check_user, remember_user, user_cache
+from .counters import record_view
+from .models import Category, Post, User
+from .pagination import PostCursorPagination
+from .renderers import FastJSONRenderer
+from .serializers import CategorySerializer, PostDetailSerializer, PostListSerializer
+from .tagging import MATCH_ALL, MATCH_ANY, filter_by_tags
+from .views import DETAIL_RELATIONS, first_comments, toggle_like, toggle_save, with_list_columns
+
+NOT_AUTHENTICATED = {'detail': 'Authentication credentials were not provided.'}
+INVALID_TOKEN = {'detail': 'Given token not valid for any token type'}
+POST_NOT_FOUND = {'detail': 'No Post matches the given query.'}
+NEEDS_ASGI = {'detail': 'Live events are only served by the ASGI application (blog_api.asgi).'}
+
+
+def json_response(data, status=200):
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+async def authenticate(request):
+    """
+    The active user behind the request's bearer token, or an error response.
+
+    Same rules and user cache as CachedJWTAuthentication, with a cache miss
+    fetched through the async ORM and put through the same `check_user`.
+    """
+    scheme, _, raw = request.headers.get('Authorization', '').partition(' ')
+    if scheme not in jwt_settings.AUTH_HEADER_TYPES or not raw:
+        return None, json_response(NOT_AUTHENTICATED, status=401)
+    try:
+        token = AccessToken(raw)
+        user_id = token[jwt_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None, json_response(INVALID_TOKEN, status=401)
+    try:
+        user = cached_user(token)
+    except AuthenticationFailed as exc:
+        return None, json_response({'detail': exc.detail}, status=401)
+    if user is not None:
+        return user, None
+    version = user_cache.version
+    try:
+        user = check_user(await User.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id}), token)
+    except User.DoesNotExist:
+        return None, json_response(INVALID_TOKEN, status=401)
+    except AuthenticationFailed as exc:
+        return None, json_response({'detail': exc.detail}, status=401)
+    remember_user(user, version)
+    return user, None
+
+
+# -----------------------------
+# READS
+# -----------------------------
+@require_GET
+async def post_list(request):
+    """Newest-first post feed, `?tag=` filtered and cursor paged like /api/posts/"""
+    drf_request = Request(request)
+    queryset = Post.objects.all()
+    tags = drf_request.query_params.getlist('tag')
+    if tags:
+        # Tag names are resolved with a query; the filter itself stays lazy
+        match = MATCH_ANY if drf_request.query_params.get('tag_match') == MATCH_ANY else MATCH_ALL
+        queryset = await sync_to_async(filter_by_tags)(queryset, tags, match)
+    fast = fastpath.values_serializer(PostListSerializer) if fastpath.enabled() else None
+    queryset = fast.rows(queryset) if fast else with_list_columns(queryset)
+    paginator = PostCursorPagination()
+    try:
+        page = await paginator.apaginate_queryset(queryset, drf_request)
+    except NotFound as exc:
+        return json_response({'detail': exc.detail}, status=404)
+    if fast:
+        data = fast.serialize(page)
+    else:
+        data = PostListSerializer(page, many=True, context={'request': drf_request}).data
+    return json_response(paginator.get_paginated_data(data))
+
+
+@require_GET
+async def post_detail(request, pk):
+    """One post with its first comments; counts the view like /api/posts/{id}/"""
+    try:
+        post = await Post.objects.select_related(*DETAIL_RELATIONS).aget(pk=pk)
+    except Post.DoesNotExist:
+        return json_response(POST_NOT_FOUND, status=404)
+    post.first_comments = [comment async for comment in first_comments(post)]
+    data = PostDetailSerializer(post, context={'request': Request(request)}).data
+    record_view(post.pk)
+    return json_response(data)
+
+
+@require_GET
+async def category_list(request):
+    queryset = Category.objects.order_by('name')
+    if fastpath.enabled():
+        fast = fastpath.values_serializer(CategorySerializer)
+        return json_response(fast.serialize([row async for row in fast.rows(queryset)]))
+    categories = [category async for category in queryset]
+    return json_response(CategorySerializer(categories, many=True).data)
+
+
+@require_GET
+async def post_events(request, pk):
+    """Server-sent like counts and new comments of a post (see blog/live.py)"""
+    if not isinstance(request, ASGIRequest):
+        # Under WSGI the stream would tie up a worker thread for good
+        return json_response(NEEDS_ASGI, status=501)
+    if not await Post.objects.filter(pk=pk).aexists():
+        return json_response(POST_NOT_FOUND, status=404)
+    response = StreamingHttpResponse(live.stream(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx: pass events through as they are written
+    return response
+
+
+# -----------------------------
+# TOGGLES
+# -----------------------------
+async def get_post_and_user(request, pk):
+    user, error = await authenticate(request)
+    if error is not None:
+        return None, None, error
+    try:
+        post = await Post.objects.only('id').aget(pk=pk)
+    except Post.DoesNotExist:
+        return None, None, json_response(POST_NOT_FOUND, status=404)
+    return post, user, None
+
+
+@csrf_exempt
+@require_POST
+async def like_post(request, pk):
+    post, user, error = await get_post_and_user(request, pk)
+    if error is not None:
+        return error
+    liked, likes = await sync_to_async(toggle_like)(post, user)
+    return json_response({'message': 'Liked' if liked else 'Unliked', 'likes': likes})
+
+
+@csrf_exempt
+@require_POST
+async def save_post(request, pk):
+    post, user, error = await get_post_and_user(request, pk)
+    if error is not None:
+        return error
+    saved = await sync_to_async(toggle_save)(post, user)
+    return json_response({'message': 'Post saved' if saved else 'Post unsaved'})
@@ -0,0 +1,187 @@
+"""
+JWT authentication without a User query per request.
+
+simplejwt's JWTAuthentication loads the user row on every authenticated
+request. `CachedJWTAuthentication` replaces that lookup, depending on
+`settings.JWT_USER_LOOKUP['MODE']`:
+
+'claims'  Stateless. The user is built from the token's claims (`user_id`,
+          `username`, `email`, `is_staff`, added by
+          CustomTokenObtainPairSerializer) as a User instance whose other
+          fields are deferred: usable as a foreign key value or in
+          `obj.author == request.user` without a query, and loaded on first
+          access to anything else. Changes to the user (is_staff revoked,
+          deactivation, password change) only take effect when the token
+          expires. Tokens lacking the claims fall back to 'cache'.
+'cache'   A per-process LRU of user rows with a TTL. Entries are dropped
+          on User save/delete, so changes made through this process apply
+          to the next request; other worker processes see them within TTL
+          seconds. Inactive users are rejected as simplejwt does.
+'db'      simplejwt's behaviour: one query per request.
+
+    JWT_USER_LOOKUP = {
+        'MODE': 'cache',
+        'TTL': 60,            # seconds a cached user is trusted
+        'MAX_USERS': 10000,   # LRU capacity per process
+    }
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import router
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import User
+
+DEFAULTS = {
+    'MODE': 'cache',
+    'TTL': 60,
+    'MAX_USERS': 10000,
+}
+CLAIM_FIELDS = ('username', 'email', 'is_staff')
+
+# Query-free lookups, for benchmarks and ad-hoc inspection
+stats = {'claims': 0, 'hit': 0, 'miss': 0}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'JWT_USER_LOOKUP', {})}
+
+
+# -----------------------------
+# CLAIMS
+# -----------------------------
+def user_from_claims(token):
+    """A User with only the claimed fields loaded, or None if a claim is missing"""
+    try:
+        values = [token[jwt_settings.USER_ID_CLAIM], *(token[name] for name in CLAIM_FIELDS)]
+    except KeyError:
+        return None
+    values[0] = User._meta.get_field(jwt_settings.USER_ID_FIELD).to_python(values[0])
+    user = User.from_db(router.db_for_read(User), [jwt_settings.USER_ID_FIELD, *CLAIM_FIELDS], values)
+    stats['claims'] += 1
+    return user
+
+
+# -----------------------------
+# USER CACHE
+# -----------------------------
+class UserCache:
+    """
+    Thread-safe LRU of user rows with a TTL.
+
+    Rows are kept as field values and a fresh instance is built per
+    lookup, so requests never share (or mutate) one User object.
+    `version` grows on every invalidation; a row read from the database
+    is only stored if no invalidation happened meanwhile.
+    """
+
+    def __init__(self):
+        # str(USER_ID_FIELD value), as the token claim carries it -> (values, expires_at)
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = 0
+        self.fields = [field.attname for field in User._meta.concrete_fields]
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        with self._lock:
+            entry = self._rows.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._rows[user_id]
+                return None
+            self._rows.move_to_end(user_id)
+        return User.from_db(router.db_for_read(User), self.fields, entry[0])
+
+    def put(self, user, version):
+        config = get_config()
+        values = tuple(getattr(user, name) for name in self.fields)
+        with self._lock:
+            if version != self.version:
+                return
+            key = str(getattr(user, jwt_settings.USER_ID_FIELD))
+            self._rows[key] = (values, time.monotonic() + config['TTL'])
+            self._rows.move_to_end(key)
+            while len(self._rows) > config['MAX_USERS']:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            self.version += 1
+            if user_id is None:
+                self._rows.clear()
+            else:
+                self._rows.pop(str(user_id), None)
+
+
+user_cache = UserCache()
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_user(sender, instance, **kwargs):
+    user_cache.invalidate(getattr(instance, jwt_settings.USER_ID_FIELD))
+
+
+@receiver(setting_changed)
+def reset_user_cache(setting, **kwargs):
+    if setting in ('JWT_USER_LOOKUP', 'SIMPLE_JWT'):
+        user_cache.invalidate()
+
+
+def check_user(user, token):
+    """simplejwt's checks on a loaded user"""
+    if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+    if jwt_settings.CHECK_REVOKE_TOKEN:
+        if token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+    return user
+
+
+def cached_user(token):
+    """The token's user without touching the database, or None"""
+    mode = get_config()['MODE']
+    if mode == 'claims':
+        user = user_from_claims(token)
+        if user is not None:
+            return user
+    if mode in ('claims', 'cache'):
+        user = user_cache.get(token[jwt_settings.USER_ID_CLAIM])
+        if user is not None:
+            stats['hit'] += 1
+            return check_user(user, token)
+    return None
+
+
+def remember_user(user, version):
+    if get_config()['MODE'] in ('claims', 'cache'):
+        stats['miss'] += 1
+        user_cache.put(user, version)
+
+
+# -----------------------------
+# AUTHENTICATION CLASS
+# -----------------------------
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if jwt_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        user = cached_user(validated_token)
+        if user is not None:
+            return user
+        version = user_cache.version
+        user = super().get_user(validated_token)
+        remember_user(user, version)
+        return user
@@ -0,0 +1,276 @@
+"""
+Batched writes: many comments, reactions, post edits and deletes in one
+request and one transaction (POST /api/batch/).
+
+    {"operations": [
+        {"op": "comment", "post": 1, "text": "..."},
+        {"op": "like", "post": 1},                       # toggles, like /posts/{id}/like/
+        {"op": "save", "post": 1},                       # toggles, like /posts/{id}/save_post/
+        {"op": "update_post", "id": 1, "data": {...}},   # partial PostCreateUpdateSerializer data
+        {"op": "delete_post", "id": 1},
+        {"op": "delete_comment", "id": 7}
+    ]}
+
+The batch is all or nothing. Every operation is validated first, with the
+serializers the single-item endpoints use, against posts and comments
+fetched with one query each. If any operation fails, nothing is written
+and the response is a 400 listing each operation's outcome. Otherwise the
+batch runs grouped by kind:
+
+    comments         one bulk_create
+    likes / saves    one DELETE and one bulk INSERT per relation, with a
+                     single m2m_changed per direction for the counters
+    post updates     one bulk_update (tags through set_tags)
+    deletes          one QuerySet.delete() per model
+
+bulk_create and bulk_update send no model signals. So this module does
+what the signal handlers would do: bump the counters, score trending,
+update the search index and invalidate cached responses. It also
+publishes like counts and new comments to live streams (blog/live.py). A post deleted
+in a batch cannot be referenced by another operation of the same batch,
+so running grouped by kind gives the same result as running in order.
+
+Each result is {"status": <HTTP status>, "data" | "errors": ...}. In a
+failed batch, operations that were valid but not run get status 424.
+"""
+from collections import Counter
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from . import live, search
+from .caching import invalidate
+from .denorm import bump
+from .models import Comment, Post
+from .serializers import BatchCommentSerializer, CommentSerializer, PostCreateUpdateSerializer
+from .trending import adjust, get_config as trending_config
+
+RELATIONS = {'like': Post.liked_by.through, 'save': Post.saved_by.through}
+OPERATIONS = ('comment', 'like', 'save', 'update_post', 'delete_post', 'delete_comment')
+
+
+class Invalid(Exception):
+    def __init__(self, status, errors):
+        self.status, self.errors = status, errors
+
+
+def max_operations():
+    return getattr(settings, 'BATCH_MAX_OPERATIONS', 1000)
+
+
+def can_edit(user, obj):
+    return obj.author_id == user.pk or user.is_staff
+
+
+# -----------------------------
+# VALIDATION
+# -----------------------------
+def target_id(operation, key):
+    value = operation.get(key)
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise Invalid(400, {key: ["A valid integer is required."]})
+    return value
+
+
+class Plan:
+    """The validated operations of a batch, grouped by kind"""
+
+    def __init__(self, operations, request):
+        self.operations, self.request, self.user = operations, request, request.user
+        self.comments = []  # (index, Comment)
+        self.toggles = {kind: [] for kind in RELATIONS}  # kind -> [(index, post_id)]
+        self.updates = []  # (index, post, validated_data)
+        self.deleted_posts = {}  # post_id -> index
+        self.deleted_comments = {}  # comment_id -> index
+        self.errors = {}  # index -> Invalid
+
+        wanted_posts, wanted_comments = set(), set()
+        for operation in operations:
+            if isinstance(operation, dict):
+                key = 'id' if operation.get('op') in ('update_post', 'delete_post') else 'post'
+                if isinstance(operation.get(key), int):
+                    wanted_posts.add(operation[key])
+                if operation.get('op') == 'delete_comment' and isinstance(operation.get('id'), int):
+                    wanted_comments.add(operation['id'])
+        self.posts = Post.objects.in_bulk(wanted_posts)
+        self.comments_by_id = Comment.objects.only('id', 'post_id', 'author_id').in_bulk(wanted_comments)
+
+        # Deletes first: any other operation on a deleted post is rejected
+        for index, operation in enumerate(operations):
+            if isinstance(operation, dict) and operation.get('op') == 'delete_post':
+                self.check(index, operation, self.plan_delete_post)
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict):
+                self.errors[index] = Invalid(400, {'non_field_errors': ["Expected an object."]})
+            elif operation.get('op') not in OPERATIONS:
+                self.errors[index] = Invalid(400, {'op': [f"Expected one of: {', '.join(OPERATIONS)}."]})
+            elif operation['op'] != 'delete_post':
+                self.check(index, operation, getattr(self, f"plan_{operation['op']}"))
+
+    def check(self, index, operation, plan):
+        try:
+            plan(index, operation)
+        except Invalid as exc:
+            self.errors[index] = exc
+
+    def live_post(self, post_id, index):
+        post = self.posts.get(post_id)
+        if post is None:
+            raise Invalid(404, {'detail': "Post not found."})
+        deleted_by = self.deleted_posts.get(post_id)
+        if deleted_by is not None and deleted_by != index:
+            raise Invalid(409, {'detail': f"Post is deleted by operation {deleted_by}."})
+        return post
+
+    def plan_comment(self, index, operation):
+        post = self.live_post(target_id(operation, 'post'), index)
+        serializer = BatchCommentSerializer(data={'text': operation.get('text')})
+        if not serializer.is_valid():
+            raise Invalid(400, serializer.errors)
+        self.comments.append((index, Comment(post=post, author=self.user, **serializer.validated_data)))
+
+    def plan_like(self, index, operation):
+        self.toggles['like'].append((index, self.live_post(target_id(operation, 'post'), index).pk))
+
+    def plan_save(self, index, operation):
+        self.toggles['save'].append((index, self.live_post(target_id(operation, 'post'), index).pk))
+
+    def plan_update_post(self, index, operation):
+        post = self.live_post(target_id(operation, 'id'), index)
+        if not can_edit(self.user, post):
+            raise Invalid(403, {'detail': "You may only edit your own posts."})
+        data = operation.get('data')
+        if not isinstance(data, dict):
+            raise Invalid(400, {'data': ["Expected an object."]})
+        serializer = PostCreateUpdateSerializer(post, data=data, partial=True, context={'request': self.request})
+        if not serializer.is_valid():
+            raise Invalid(400, serializer.errors)
+        self.updates.append((index, post, serializer.validated_data))
+
+    def plan_delete_post(self, index, operation):
+        post_id = target_id(operation, 'id')
+        post = self.posts.get(post_id)
+        if post is None or post_id in self.deleted_posts:
+            raise Invalid(404, {'detail': "Post not found."})
+        if not can_edit(self.user, post):
+            raise Invalid(403, {'detail': "You may only delete your own posts."})
+        self.deleted_posts[post_id] = index
+
+    def plan_delete_comment(self, index, operation):
+        comment = self.comments_by_id.get(target_id(operation, 'id'))
+        if comment is None or comment.pk in self.deleted_comments:
+            raise Invalid(404, {'detail': "Comment not found."})
+        if not can_edit(self.user, comment):
+            raise Invalid(403, {'detail': "You may only delete your own comments."})
+        if comment.post_id in self.deleted_posts:
+            raise Invalid(409, {'detail': f"Post is deleted by operation {self.deleted_posts[comment.post_id]}."})
+        self.deleted_comments[comment.pk] = index
+
+    def error_results(self):
+        return [
+            {'status': self.errors[i].status, 'errors': self.errors[i].errors} if i in self.errors
+            else {'status': 424, 'errors': {'detail': "Not run: another operation in the batch failed."}}
+            for i in range(len(self.operations))
+        ]
+
+
+# -----------------------------
+# EXECUTION
+# -----------------------------
+def create_comments(plan, results):
+    if not plan.comments:
+        return
+    comments = Comment.objects.bulk_create([comment for _, comment in plan.comments])
+    per_post = Counter(comment.post_id for comment in comments)
+    bump(Post, 'comment_count', per_post)
+    weight = trending_config()['WEIGHTS']['comments']
+    adjust({post_id: n * weight for post_id, n in per_post.items()})
+    search.index_new_comments(comments)
+    invalidate('posts', *(f'post:{post_id}' for post_id in per_post))
+    live.publish_comments(comments)
+    for (index, _), comment in zip(plan.comments, comments):
+        results[index] = {'status': 201, 'data': CommentSerializer(comment).data}
+
+
+def toggle(kind, plan, results):
+    """Apply a relation's toggles in order; one DELETE, one INSERT, one signal per direction"""
+    through, user = RELATIONS[kind], plan.user
+    ops = plan.toggles[kind]
+    if not ops:
+        return {}
+    post_ids = {post_id for _, post_id in ops}
+    before = set(through.objects.filter(user_id=user.pk, post_id__in=post_ids).values_list('post_id', flat=True))
+    state = set(before)
+    for index, post_id in ops:
+        state ^= {post_id}
+        results[index] = {'status': 200, 'data': {'post': post_id, f'{kind}d': post_id in state}}
+    added, removed = state - before, before - state
+    using = router.db_for_write(through)
+    if removed:
+        through.objects.filter(user_id=user.pk, post_id__in=removed).delete()
+        m2m_changed.send(sender=through, instance=user, action='post_remove', reverse=True,
+                         model=Post, pk_set=removed, using=using)
+    if added:
+        through.objects.bulk_create(through(user_id=user.pk, post_id=post_id) for post_id in added)
+        m2m_changed.send(sender=through, instance=user, action='post_add', reverse=True,
+                         model=Post, pk_set=added, using=using)
+    return post_ids
+
+
+def update_posts(plan, results):
+    if not plan.updates:
+        return
+    changed, fields, tags = {}, {'updated_at'}, {}
+    now = timezone.now()
+    for _, post, data in plan.updates:
+        data = dict(data)
+        if 'tags' in data:
+            tags[post.pk] = data.pop('tags')
+        for attr, value in data.items():
+            setattr(post, attr, value)
+        post.updated_at = now
+        fields.update(data)
+        changed[post.pk] = post
+    Post.objects.bulk_update(changed.values(), sorted(fields))
+    for post_id, names in tags.items():
+        changed[post_id].set_tags(names)
+    if search.backend() == 'sqlite' and fields & {'title', 'content'}:
+        for post in changed.values():
+            search.index_post(post)
+    invalidate('posts', *(f'post:{post_id}' for post_id in changed))
+    prefetch_related_objects(list(changed.values()), 'tags')
+    for index, post, _ in plan.updates:
+        results[index] = {'status': 200, 'data': {'id': post.pk, **PostCreateUpdateSerializer(post).data}}
+
+
+def delete(plan, results):
+    if plan.deleted_comments:
+        Comment.objects.filter(pk__in=plan.deleted_comments).delete()
+    if plan.deleted_posts:
+        Post.objects.filter(pk__in=plan.deleted_posts).delete()
+    for index in [*plan.deleted_comments.values(), *plan.deleted_posts.values()]:
+        results[index] = {'status': 204, 'data': None}
+
+
+def run_batch(operations, request):
+    """Validate and run `operations` for `request.user`; returns (succeeded, per-operation results)"""
+    with transaction.atomic():
+        plan = Plan(operations, request)
+        if plan.errors:
+            return False, plan.error_results()
+        results = [None] * len(operations)
+        update_posts(plan, results)
+        create_comments(plan, results)
+        liked = toggle('like', plan, results)
+        toggle('save', plan, results)
+        if liked:
+            likes = dict(Post.objects.filter(pk__in=liked).values_list('pk', 'likes'))
+            for post_id, count in likes.items():
+                live.publish_likes(post_id, count)
+            for index, post_id in plan.toggles['like']:
+                results[index]['data']['likes'] = likes[post_id]
+        delete(plan, results)
+    return True, results
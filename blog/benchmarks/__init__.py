@@ -0,0 +1,80 @@
+"""
+Benchmark scenarios for the blog API.
+
+Each module in this package exposes `run(command, sizes, repeat)` and a
+`DEFAULT_SIZES` tuple, and is executed through `manage.py benchmark <name>`.
+Scenarios always run against a throwaway test database.
+"""
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test import override_settings
+
+
+@contextmanager
+def bench_database():
+    """
+    Create a fresh test database for the duration of a scenario. SQLite
+    gets a temporary file rather than shared memory, so multi-threaded
+    scenarios see real file locking.
+    """
+    old_name = connection.settings_dict['NAME']
+    with tempfile.TemporaryDirectory() as tmp:
+        if connection.vendor == 'sqlite':
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(tmp, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def without_response_cache():
+    """Settings override that makes anonymous reads bypass blog/caching.py"""
+    dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    return override_settings(CACHES={**settings.CACHES, 'responses': dummy})
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn, repeat):
+    """Call `fn` `repeat` times and return the latencies in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples):
+    return {
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
+
+
+def seed_posts(count, batch_size=5000):
+    """Grow the Post table to `count` rows with bulk inserts; returns the author"""
+    from blog.models import Post, User
+
+    author, _ = User.objects.get_or_create(username='bench-author')
+    existing = Post.objects.count()
+    for start in range(existing, count, batch_size):
+        stop = min(start + batch_size, count)
+        Post.objects.bulk_create(
+            Post(author=author, title=f"Post {i}", slug=f"post-{i}", content="Lorem ipsum " * 20)
+            for i in range(start, stop)
+        )
+    return author
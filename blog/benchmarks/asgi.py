@@ -0,0 +1,128 @@
+"""
+Native async views under ASGI versus the DRF views under WSGI.
+
+`size` concurrent clients each send `repeat` requests, a mix of post list,
+post detail, category list and like toggles (LIKE_SHARE, with a JWT).
+Latency is measured from the moment a client issues a request, including
+any time it waits for a free worker.
+
+- asgi: every client is a coroutine driving /api/async/ through Django's
+  async handler stack (`AsyncClient`), all on one event loop;
+- wsgi: clients queue for WSGI_THREADS worker threads, like a threaded
+  WSGI server, each serving /api/ with the sync `Client`.
+
+No ASGI server or HTTP client ships with the project, so both sides run
+in-process: the numbers compare the request handling, not socket I/O.
+
+    python manage.py benchmark asgi --sizes 100 1000 --repeat 5
+"""
+import asyncio
+import queue
+import random
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from blog.benchmarks import percentile, seed_posts, without_response_cache
+from blog.models import Category, Post
+
+DEFAULT_SIZES = (100, 1000)
+POSTS = 2000
+WSGI_THREADS = 32
+LIKE_SHARE = 0.1
+
+
+def plan(clients, repeat, post_ids, seed=0):
+    """The same (method, path) sequence per client for both servers"""
+    rng = random.Random(seed)
+    plans = []
+    for _ in range(clients):
+        requests = []
+        for _ in range(repeat):
+            roll = rng.random()
+            post_id = rng.choice(post_ids)
+            if roll < LIKE_SHARE:
+                requests.append(('post', f'posts/{post_id}/like/'))
+            elif roll < 0.2:
+                requests.append(('get', 'categories/'))
+            elif roll < 0.6:
+                requests.append(('get', f'posts/{post_id}/'))
+            else:
+                requests.append(('get', 'posts/'))
+        plans.append(requests)
+    return plans
+
+
+def run_asgi(plans, token):
+    async def client_loop(requests, latencies, errors):
+        client, headers = AsyncClient(), {'Authorization': f'Bearer {token}'}
+        for method, path in requests:
+            began = time.perf_counter()
+            response = await getattr(client, method)(f'/api/async/{path}', headers=headers)
+            latencies.append((time.perf_counter() - began) * 1000)
+            errors.append(response.status_code >= 400)
+
+    async def main():
+        latencies, errors = [], []
+        await asyncio.gather(*[client_loop(requests, latencies, errors) for requests in plans])
+        await sync_to_async(connections.close_all)()
+        return latencies, errors
+
+    start = time.perf_counter()
+    latencies, errors = asyncio.run(main())
+    return latencies, sum(errors), time.perf_counter() - start
+
+
+def run_wsgi(plans, token):
+    pending = queue.Queue()
+    for requests in plans:
+        pending.put(requests)
+    latencies, errors = [], []
+    start = time.perf_counter()
+
+    def worker():
+        client = Client(headers={'Authorization': f'Bearer {token}'})
+        while True:
+            try:
+                requests = pending.get_nowait()
+            except queue.Empty:
+                break
+            # A threaded server serves a connection's requests back to back;
+            # its first request waited in the queue since `start`
+            began = start
+            for method, path in requests:
+                response = getattr(client, method)(f'/api/{path}', HTTP_ACCEPT='application/json')
+                latencies.append((time.perf_counter() - began) * 1000)
+                errors.append(response.status_code >= 400)
+                began = time.perf_counter()
+        connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(WSGI_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors), time.perf_counter() - start
+
+
+def run(command, sizes, repeat):
+    author = seed_posts(POSTS)
+    Category.objects.bulk_create(Category(name=f"Category {i}") for i in range(20))
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    token = str(AccessToken.for_user(author))
+    connections.close_all()
+
+    with without_response_cache(), override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0}):
+        for concurrency in sizes:
+            plans = plan(concurrency, repeat, post_ids)
+            for name, runner in (('asgi', run_asgi), ('wsgi', run_wsgi)):
+                latencies, errors, elapsed = runner(plans, token)
+                command.stdout.write(
+                    f"{name}  clients={concurrency:5d}  req/s={len(latencies) / elapsed:7.0f}  "
+                    f"p50={percentile(latencies, 50):8.2f}ms  p99={percentile(latencies, 99):8.2f}ms  "
+                    f"errors={errors}"
+                )
@@ -0,0 +1,69 @@
+"""
+Queries and latency per JWT-authenticated request, per user lookup mode.
+
+`size` users each log in once (tokens carry the CustomTokenObtainPair
+claims); `repeat` requests then rotate through their tokens, alternating
+the saved-posts feed and the like toggle. For every JWT_USER_LOOKUP mode
+the scenario counts queries per request in one pass (an execute wrapper;
+the test client resets `connection.queries` on every request) and times
+a second, uninstrumented pass. A warm-up pass fills the 'cache' mode LRU.
+
+    python manage.py benchmark auth --sizes 1 100 --repeat 500
+"""
+import time
+from collections import Counter
+
+from django.db import connection
+from django.test import Client, override_settings
+
+from blog.authentication import user_cache
+from blog.benchmarks import seed_posts, summarize
+from blog.models import Post, User
+from blog.views import CustomTokenObtainPairSerializer
+
+DEFAULT_SIZES = (1, 100)
+MODES = ('db', 'cache', 'claims')
+
+
+def run(command, sizes, repeat):
+    seed_posts(100)
+    post_id = Post.objects.values_list('id', flat=True).first()
+    client = Client()
+    for size in sizes:
+        users = User.objects.bulk_create(User(username=f"auth-bench-{size}-{i}") for i in range(size))
+        tokens = [str(CustomTokenObtainPairSerializer.get_token(user).access_token) for user in users]
+        requests = [
+            ('get', '/api/posts/saved/') if i % 2 else ('post', f'/api/posts/{post_id}/like/')
+            for i in range(repeat)
+        ]
+
+        def send_all():
+            latencies = []
+            for i, (method, path) in enumerate(requests):
+                began = time.perf_counter()
+                response = getattr(client, method)(path, HTTP_AUTHORIZATION=f'Bearer {tokens[i % size]}')
+                latencies.append((time.perf_counter() - began) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{method.upper()} {path}: {response.status_code}")
+            return latencies
+
+        for mode in MODES:
+            user_cache.invalidate()
+            with override_settings(JWT_USER_LOOKUP={'MODE': mode}):
+                for token in tokens:
+                    client.get('/api/posts/saved/', HTTP_AUTHORIZATION=f'Bearer {token}')
+                counts = Counter()
+
+                def count(execute, sql, params, many, context):
+                    counts['all'] += 1
+                    counts['user'] += 'FROM "blog_user"' in sql
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(count):
+                    send_all()
+                stats = summarize(send_all())
+            command.stdout.write(
+                f"users={size:>5}  mode={mode:<7} queries/req={counts['all'] / repeat:5.2f}  "
+                f"user queries/req={counts['user'] / repeat:4.2f}  "
+                f"p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+            )
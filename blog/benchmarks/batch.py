@@ -0,0 +1,90 @@
+"""
+Batched writes: one POST /api/batch/ vs one request per operation.
+
+Runs `size` operations (half comments, then likes, saves and post title
+updates) both ways against posts by the requesting user, and reports wall
+time, operations per second and SQL statements. Each way runs
+min(repeat, RUNS) times; likes and saves toggle back and forth between
+runs, so every run does the same amount of work.
+
+    python manage.py benchmark batch --sizes 100 1000 --repeat 5
+"""
+import random
+import time
+
+from django.db import connection
+from rest_framework.test import APIClient
+
+from blog.benchmarks import seed_posts
+from blog.models import Post
+
+DEFAULT_SIZES = (100, 1000)
+RUNS = 5
+POSTS = 200
+
+
+def workload(size, post_ids, rng):
+    operations = []
+    for i in range(size):
+        post_id = rng.choice(post_ids)
+        roll = i % 10
+        if roll < 5:
+            operations.append({'op': 'comment', 'post': post_id, 'text': f"Comment {i}"})
+        elif roll < 8:
+            operations.append({'op': 'like', 'post': post_id})
+        elif roll < 9:
+            operations.append({'op': 'save', 'post': post_id})
+        else:
+            operations.append({'op': 'update_post', 'id': post_id, 'data': {'title': f"Edited {i}"}})
+    return operations
+
+
+def one_by_one(client, operations):
+    for operation in operations:
+        if operation['op'] == 'comment':
+            data = {'post': operation['post'], 'text': operation['text']}
+            response = client.post(f"/api/posts/{operation['post']}/comment/", data, format='json')
+        elif operation['op'] == 'like':
+            response = client.post(f"/api/posts/{operation['post']}/like/")
+        elif operation['op'] == 'save':
+            response = client.post(f"/api/posts/{operation['post']}/save_post/")
+        else:
+            response = client.patch(f"/api/posts/{operation['id']}/", operation['data'], format='json')
+        assert response.status_code < 300, response.content
+
+
+def batched(client, operations):
+    response = client.post('/api/batch/', {'operations': operations}, format='json')
+    assert response.status_code == 200, response.content
+
+
+def timed(fn, *args):
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        fn(*args)
+        return time.perf_counter() - start, queries
+
+
+def run(command, sizes, repeat):
+    author = seed_posts(POSTS)
+    client = APIClient()
+    client.force_authenticate(author)
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    rng = random.Random(0)
+    for size in sizes:
+        operations = workload(size, post_ids, rng)
+        for label, fn in (('one by one', one_by_one), ('batched', batched)):
+            runs = [timed(fn, client, operations) for _ in range(min(repeat, RUNS))]
+            elapsed = sorted(seconds for seconds, _ in runs)[len(runs) // 2]
+            queries = runs[-1][1]
+            command.stdout.write(
+                f"ops={size:>5}  {label:<10}  {elapsed * 1000:9.1f}ms  {size / elapsed:8.0f} ops/s  "
+                f"{queries:6} queries ({queries / size:5.2f}/op)"
+            )
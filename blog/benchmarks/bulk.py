@@ -0,0 +1,60 @@
+"""
+JSONL import/export throughput and memory.
+
+Generates `size` records on the fly (nothing is held in memory), imports
+them through blog.bulk.import_posts, then streams them back out through
+export_posts into a counting sink. Reports rows/s and the growth of the
+process's peak RSS during each phase, which should stay flat as the row
+count grows.
+
+    python manage.py benchmark bulk --sizes 10000 100000 1000000
+"""
+import json
+import resource
+import sys
+import time
+
+from blog.bulk import export_posts, import_posts
+from blog.models import Post, User
+
+DEFAULT_SIZES = (10000, 100000)
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024  # bytes vs KiB
+
+
+def generate(size):
+    for i in range(size):
+        yield json.dumps({
+            'title': f"Imported post {i % 1000}",  # repeated titles exercise slug allocation
+            'content': "Lorem ipsum dolor sit amet " * 10,
+            'category': f"Category {i % 20}",
+            'tags': [f"tag-{i % 50}", f"tag-{i % 7}"],
+            'created_at': f"2024-01-01T00:{i // 60 % 60:02d}:{i % 60:02d}+00:00",
+        })
+
+
+def run(command, sizes, repeat):
+    author, _ = User.objects.get_or_create(username='bench-author')
+    for size in sizes:
+        Post.objects.all().delete()
+
+        before = peak_rss_mb()
+        start = time.perf_counter()
+        result = import_posts(generate(size), author)
+        elapsed = time.perf_counter() - start
+        command.stdout.write(
+            f"import rows={size:>8} created={result['created']} errors={result['skipped']} "
+            f"rows/s={size / elapsed:,.0f} peak_rss_growth={peak_rss_mb() - before:.1f}MB"
+        )
+
+        before = peak_rss_mb()
+        start = time.perf_counter()
+        written = sum(len(line) for line in export_posts())
+        elapsed = time.perf_counter() - start
+        command.stdout.write(
+            f"export rows={size:>8} bytes={written:,} "
+            f"rows/s={size / elapsed:,.0f} peak_rss_growth={peak_rss_mb() - before:.1f}MB"
+        )
@@ -0,0 +1,52 @@
+"""
+Post detail and comment paging for heavily commented posts.
+
+Gives one post `size` comments, then reports latency and response size
+for the post detail (first POST_DETAIL_COMMENTS comments + count), the
+first page of /api/posts/{id}/comments/ and a page deep into the thread.
+For comparison it also prints the size the old detail response had, when
+every comment was embedded with CommentSerializer.
+
+    python manage.py benchmark comments --sizes 10 10000 100000
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from blog.benchmarks import measure, summarize, without_response_cache
+from blog.models import Comment, Post, User
+from blog.pagination import CommentCursorPagination
+from blog.serializers import CommentSerializer
+
+DEFAULT_SIZES = (10, 10000, 100000)
+
+
+def run(command, sizes, repeat):
+    client = APIClient()
+    author, _ = User.objects.get_or_create(username='bench-author')
+    for size in sizes:
+        post = Post.objects.create(author=author, title=f"Thread {size}", content="Lorem ipsum " * 50)
+        for start in range(0, size, 5000):
+            Comment.objects.bulk_create(
+                Comment(post=post, author=author, text=f"Comment {i} " * 5)
+                for i in range(start, min(start + 5000, size))
+            )
+
+        middle = Comment.objects.filter(post=post).order_by('created_at', 'id')[size // 2]
+        deep_cursor = CommentCursorPagination().encode_cursor((middle.created_at, middle.pk), reverse=False)
+        urls = {
+            'detail': f'/api/posts/{post.pk}/',
+            'comments p1': f'/api/posts/{post.pk}/comments/',
+            'comments deep': f'/api/posts/{post.pk}/comments/?cursor={deep_cursor}',
+        }
+        with without_response_cache():
+            for label, url in urls.items():
+                body = client.get(url).content
+                stats = summarize(measure(lambda: client.get(url), repeat))
+                command.stdout.write(
+                    f"comments={size:>7}  {label:<14} bytes={len(body):>9,} "
+                    f"p50={stats['p50_ms']:.2f}ms p99={stats['p99_ms']:.2f}ms"
+                )
+
+        everything = Comment.objects.filter(post=post).select_related('author', 'post')
+        legacy = JSONRenderer().render(CommentSerializer(everything, many=True).data)
+        command.stdout.write(f"comments={size:>7}  embedding every comment would add {len(legacy):,} bytes")
@@ -0,0 +1,57 @@
+"""
+Conditional GET: a 304 revalidation vs a full 200, per endpoint.
+
+Seeds `size` posts (the detail post gets COMMENTS comments, the bench
+author a category and a profile) and, as an authenticated reader, so the
+response cache is not involved, times `repeat` plain GETs and `repeat`
+GETs carrying the ETag of the previous response for a post detail, a post
+list page, the category list and a user profile. Reports p50/p99 and
+response bytes for each.
+
+    python manage.py benchmark conditional --sizes 1000 10000 --repeat 500
+"""
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from blog import conditional
+from blog.benchmarks import measure, seed_posts, summarize
+from blog.models import Category, Comment, Post, User
+
+DEFAULT_SIZES = (1000, 10000)
+COMMENTS = 10
+CATEGORIES = 20
+
+
+def run(command, sizes, repeat):
+    reader, _ = User.objects.get_or_create(username='bench-reader')
+    client = APIClient()
+    client.force_authenticate(reader)
+    for size in sizes:
+        author = seed_posts(size)
+        if not Category.objects.exists():
+            Category.objects.bulk_create(Category(name=f"Category {i}") for i in range(CATEGORIES))
+        post = Post.objects.order_by('-created_at', '-id').first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=author, text=f"Comment {i}") for i in range(COMMENTS)
+        )
+        Post.objects.filter(pk=post.pk).update(comment_count=post.comments.count())
+        endpoints = (
+            ('detail', f'/api/posts/{post.pk}/'),
+            ('list', '/api/posts/'),
+            ('categories', '/api/categories/'),
+            ('profile', f'/api/users/{reader.pk}/'),
+        )
+        with override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0}):
+            for label, url in endpoints:
+                full = client.get(url)
+                assert full.status_code == 200, full.content
+                full_stats = summarize(measure(lambda: client.get(url), repeat))
+                served = conditional.stats['not_modified']
+                revalidate = summarize(measure(lambda: client.get(url, HTTP_IF_NONE_MATCH=full['ETag']), repeat))
+                assert conditional.stats['not_modified'] - served == repeat
+                command.stdout.write(
+                    f"posts={size:>6}  {label:<10}  200 p50={full_stats['p50_ms']:7.3f}ms "
+                    f"p99={full_stats['p99_ms']:7.3f}ms {len(full.content):6}B   "
+                    f"304 p50={revalidate['p50_ms']:7.3f}ms p99={revalidate['p99_ms']:7.3f}ms   "
+                    f"x{full_stats['p50_ms'] / revalidate['p50_ms']:.1f}"
+                )
@@ -0,0 +1,72 @@
+"""
+Following feed: fan-out-on-write vs fan-out-on-read vs hybrid.
+
+For an author with `size` followers, times creating a post (and counts
+the inbox rows it writes and trims) under each FEED mode, and times
+GET /api/feed/ for one of the followers, who also follows FOLLOWEES
+smaller authors with POSTS_EACH posts apiece. Writes are capped at 20
+per measurement, since a push to 100k followers takes a while.
+
+    python manage.py benchmark feeds --sizes 10 1000 100000 --repeat 50
+"""
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from blog import feeds
+from blog.benchmarks import measure, summarize
+from blog.models import Follow, Post, User
+
+DEFAULT_SIZES = (10, 1000, 100000)
+MODES = ('push', 'pull', 'hybrid')
+FOLLOWEES = 200
+POSTS_EACH = 20
+CELEBRITY_FOLLOWERS = 10000
+
+
+def seed_reader():
+    """A reader following FOLLOWEES authors, whose posts are in its inbox"""
+    reader = User.objects.create(username='feed-reader')
+    authors = User.objects.bulk_create(User(username=f"feed-author-{i}") for i in range(FOLLOWEES))
+    Follow.objects.bulk_create(Follow(follower=reader, followee=author) for author in authors)
+    posts = Post.objects.bulk_create(
+        Post(author=author, title=f"Post {i}", slug=f"feed-{author.pk}-{i}", content="x")
+        for author in authors for i in range(POSTS_EACH)
+    )
+    with override_settings(FEED={'MODE': 'push'}):
+        feeds.fan_out([post.pk for post in posts])
+    return reader
+
+
+def seed_followers(author, size, reader):
+    users = User.objects.bulk_create(
+        (User(username=f"feed-follower-{size}-{i}") for i in range(size - 1)), batch_size=5000,
+    )
+    Follow.objects.bulk_create(
+        (Follow(follower=user, followee=author) for user in [reader, *users]), batch_size=5000,
+    )
+    User.objects.filter(pk=author.pk).update(follower_count=size)  # bulk_create skips the counters
+
+
+def run(command, sizes, repeat):
+    reader = seed_reader()
+    client = APIClient()
+    client.force_authenticate(reader)
+    for size in sizes:
+        author = User.objects.create(username=f"feed-star-{size}")
+        seed_followers(author, size, reader)
+        for mode in MODES:
+            config = {'MODE': mode, 'CELEBRITY_FOLLOWERS': CELEBRITY_FOLLOWERS}
+            with override_settings(FEED=config):
+                before = dict(feeds.stats)
+                writes = min(repeat, 20)
+                write = summarize(measure(
+                    lambda: Post.objects.create(author=author, title="Fresh", content="x"), writes,
+                ))
+                rows = (feeds.stats['fanned_out'] - before['fanned_out']) / writes
+                trimmed = (feeds.stats['trimmed'] - before['trimmed']) / writes
+                read = summarize(measure(lambda: client.get('/api/feed/'), repeat))
+            command.stdout.write(
+                f"followers={size:>6}  {mode:<6}  write p50={write['p50_ms']:8.2f}ms p99={write['p99_ms']:8.2f}ms  "
+                f"rows/post={rows:8.0f} trimmed/post={trimmed:6.0f}  "
+                f"feed p50={read['p50_ms']:6.2f}ms p99={read['p99_ms']:6.2f}ms"
+            )
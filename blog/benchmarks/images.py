@@ -0,0 +1,117 @@
+"""
+Image uploads: resizing on the request path vs in the process pool, and
+what the variants save on a list page.
+
+For source photos `size` pixels wide (3:2), times `repeat` uploads of
+distinct images with IMAGES['WORKERS'] = 0 (variants written before the
+response) and with a pool of POOL_WORKERS processes (the response only
+stores the original), reporting request latency, uploads/sec as seen by
+clients and, for the pool, end-to-end uploads/sec until every variant is
+written. Then attaches PAGE_SIZE of the images to posts and sums the
+image bytes one /api/posts/ page references: originals vs the smallest
+srcset candidates a browser would pick.
+
+    python manage.py benchmark images --sizes 1024 2048 4096 --repeat 20
+"""
+import io
+import os
+import random
+import tempfile
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image, ImageDraw, ImageFilter
+from rest_framework.test import APIClient
+
+from blog import images
+from blog.benchmarks import summarize
+from blog.models import ImageAsset, Post, User
+
+DEFAULT_SIZES = (1024, 2048, 4096)
+POOL_WORKERS = max(2, os.cpu_count() or 1)
+PAGE_SIZE = 20
+# Variants a list card would request: 320px, or 640px on a 2x screen
+CARD_WIDTHS = ('320', '640')
+
+
+def photo(width, rng):
+    """A JPEG with gradients, shapes and grain: compresses roughly like a photo"""
+    height = width * 2 // 3
+    image = Image.linear_gradient('L').resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(image)
+    for _ in range(40):
+        x, y = rng.randrange(width), rng.randrange(height)
+        r = rng.randrange(width // 20, width // 4)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    image = image.filter(ImageFilter.GaussianBlur(width / 200))
+    grain = Image.effect_noise((width, height), 24).convert('RGB')
+    image = Image.blend(image, grain, 0.15)
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def upload_all(client, photos):
+    latencies = []
+    for i, data in enumerate(photos):
+        start = time.perf_counter()
+        response = client.post('/api/images/', {'file': SimpleUploadedFile(f"{i}.jpg", data)})
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 201, response.content
+    return latencies
+
+
+def file_size(media_root, url):
+    return os.path.getsize(os.path.join(media_root, url.removeprefix('/media/')))
+
+
+def page_bytes(client, media_root):
+    """Image bytes referenced by the first /api/posts/ page, per rendition"""
+    results = client.get(f'/api/posts/?page_size={PAGE_SIZE}').json()['results']
+    totals = {'original': 0, **{f"{fmt} {w}w": 0 for fmt in ('webp', 'jpeg') for w in CARD_WIDTHS}}
+    for post in results:
+        variants = post['image_variants']
+        totals['original'] += file_size(media_root, variants['original'])
+        for fmt in ('webp', 'jpeg'):
+            for width in CARD_WIDTHS:
+                totals[f"{fmt} {width}w"] += file_size(media_root, variants[fmt][width])
+    return totals
+
+
+def run(command, sizes, repeat):
+    rng = random.Random(0)
+    user = User.objects.create(username='image-bench')
+    client = APIClient()
+    client.force_authenticate(user)
+    with tempfile.TemporaryDirectory() as media_root:
+        for size in sizes:
+            for label, workers in (('inline', 0), (f'pool x{POOL_WORKERS}', POOL_WORKERS)):
+                photos = [photo(size, rng) for _ in range(repeat)]
+                with override_settings(MEDIA_ROOT=media_root, IMAGES={'WORKERS': workers}):
+                    if workers:
+                        images.get_executor(workers).submit(int).result()  # spawn the workers up front
+                    start = time.perf_counter()
+                    latencies = upload_all(client, photos)
+                    responded = time.perf_counter() - start
+                    images.wait()
+                    done = time.perf_counter() - start
+                stats = summarize(latencies)
+                command.stdout.write(
+                    f"width={size:>5}  {label:<8}  request p50={stats['p50_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms  "
+                    f"responses/s={repeat / responded:7.1f}  processed/s={repeat / done:6.1f}"
+                )
+            assert not ImageAsset.objects.exclude(status=ImageAsset.READY).exists()
+
+            Post.objects.all().delete()
+            assets = list(ImageAsset.objects.order_by('-pk').values_list('pk', flat=True)[:PAGE_SIZE])
+            Post.objects.bulk_create(
+                Post(author=user, title=f"Photo {i}", slug=f"photo-{size}-{i}", content="x", image_asset_id=pk)
+                for i, pk in enumerate(assets)
+            )
+            totals = page_bytes(client, media_root)
+            original = totals.pop('original')
+            saved = '  '.join(
+                f"{name}={total / 1024:7.0f}KiB (-{100 * (1 - total / original):4.1f}%)" for name, total in totals.items()
+            )
+            command.stdout.write(f"width={size:>5}  page of {PAGE_SIZE}: originals={original / 1024:7.0f}KiB  {saved}")
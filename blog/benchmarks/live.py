@@ -0,0 +1,101 @@
+"""
+Live event fan-out: `size` idle SSE streams on one post, one process.
+
+Opens `size` streams of /api/async/posts/{id}/events/ through Django's
+async handler (`AsyncClient`), all on one event loop, each read by its
+own task like a server would. Then, `repeat` times, a worker thread, as a
+sync view would, publishes a like count and the time until each stream
+has yielded it is recorded. Reports setup time, memory per stream, and
+per event the latency to the first stream, p50, p99 and the last stream
+(the full fan-out).
+
+No ASGI server ships with the project, so the streams are consumed
+in-process: the numbers cover the broker and the handler stack, not
+socket writes.
+
+    python manage.py benchmark live --sizes 1000 10000 --repeat 20
+"""
+import asyncio
+import resource
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.test import AsyncClient
+
+from blog import live
+from blog.benchmarks import percentile
+from blog.models import Post, User
+
+DEFAULT_SIZES = (1000, 10000)
+BASE = 1_000_000  # like counts used as round markers, distinct from the real count
+
+
+async def fan_out(post_id, size, repeat):
+    client = AsyncClient()
+    arrivals = {}  # round -> [perf_counter]
+    opened = 0
+    everyone = asyncio.Event()
+    current = {'round': None}
+
+    async def reader(response):
+        nonlocal opened
+        first = True
+        async for chunk in response.streaming_content:
+            if first:
+                first, opened = False, opened + 1
+                continue
+            stamp = time.perf_counter()
+            round_ = current['round']
+            if round_ is not None and b'"likes":%d' % (BASE + round_) in chunk:
+                arrivals[round_].append(stamp)
+                if len(arrivals[round_]) == size:
+                    everyone.set()
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    readers = []
+    for _ in range(size):
+        response = await client.get(f'/api/async/posts/{post_id}/events/')
+        readers.append(asyncio.create_task(reader(response)))
+    while opened < size:
+        await asyncio.sleep(0.01)
+    setup = time.perf_counter() - start
+    rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    assert live.broker.subscriber_count() == size
+
+    def publish(round_):
+        published = time.perf_counter()
+        live.broker.publish(post_id, 'likes', {'post': post_id, 'likes': BASE + round_})
+        return published
+
+    rounds = []
+    for round_ in range(repeat):
+        current['round'], arrivals[round_] = round_, []
+        everyone.clear()
+        published = await asyncio.get_running_loop().run_in_executor(None, publish, round_)
+        await asyncio.wait_for(everyone.wait(), 60)
+        rounds.append([(stamp - published) * 1000 for stamp in arrivals[round_]])
+
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+    await sync_to_async(connections.close_all)()
+    return setup, rss_kib, rounds
+
+
+def run(command, sizes, repeat):
+    author, _ = User.objects.get_or_create(username='live-bench')
+    post = Post.objects.create(author=author, title="Live", content="x")
+    for size in sizes:
+        setup, rss_kib, rounds = asyncio.run(fan_out(post.pk, size, repeat))
+        assert live.broker.subscriber_count() == 0
+        first = [min(latencies) for latencies in rounds]
+        last = [max(latencies) for latencies in rounds]
+        every = [latency for latencies in rounds for latency in latencies]
+        command.stdout.write(
+            f"streams={size:>6}  setup={setup:6.1f}s  ~{rss_kib / size:5.1f}KiB/stream  "
+            f"first p50={percentile(first, 50):7.2f}ms  "
+            f"all p50={percentile(every, 50):7.2f}ms p99={percentile(every, 99):7.2f}ms  "
+            f"last p50={percentile(last, 50):7.2f}ms max={max(last):7.2f}ms"
+        )
@@ -0,0 +1,42 @@
+"""
+Keyset vs OFFSET paging on the post feed.
+
+Fetches a page from the middle of the archive with both strategies; keyset
+latency should stay flat as the table grows while OFFSET grows linearly.
+
+    python manage.py benchmark pagination --sizes 1000 100000 1000000
+"""
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from blog.benchmarks import measure, seed_posts, summarize
+from blog.models import Post
+from blog.pagination import PostCursorPagination
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+PAGE_SIZE = 20
+
+
+def run(command, sizes, repeat):
+    factory = APIRequestFactory()
+    for size in sorted(sizes):
+        seed_posts(size)
+        queryset = Post.objects.order_by('-created_at', '-id')
+        middle = size // 2
+        anchor = queryset[middle]
+
+        cursor = PostCursorPagination().encode_cursor((anchor.created_at, anchor.pk), reverse=False)
+        request = Request(factory.get('/api/posts/', {'cursor': cursor, 'page_size': PAGE_SIZE}))
+
+        def keyset_page():
+            PostCursorPagination().paginate_queryset(Post.objects.all(), request)
+
+        def offset_page():
+            list(queryset[middle:middle + PAGE_SIZE])
+
+        keyset = summarize(measure(keyset_page, repeat))
+        offset = summarize(measure(offset_page, repeat))
+        command.stdout.write(
+            f"posts={size:>9}  keyset p50={keyset['p50_ms']:.3f}ms p95={keyset['p95_ms']:.3f}ms  "
+            f"offset p50={offset['p50_ms']:.3f}ms p95={offset['p95_ms']:.3f}ms"
+        )
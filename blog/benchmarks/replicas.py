@@ -0,0 +1,102 @@
+"""
+Read throughput against 0..N SQLite read replicas.
+
+Seeds the primary, then for each replica count copies it into that many
+replica files next to it, registers them as database aliases and routes
+reads through blog.routers. READERS worker processes fetch the post list
+and post details anonymously, while WRITERS processes keep toggling likes
+on the primary. The scenario reports read throughput and latency.
+Processes rather than threads, so the GIL does not cap the reads.
+
+    python manage.py benchmark replicas --sizes 0 1 2 4 --repeat 300
+"""
+import multiprocessing
+import os
+import random
+import time
+
+from django.db import connection, connections
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from blog.benchmarks import percentile, seed_posts, without_response_cache
+from blog.models import Post, User
+from blog.routers import get_config, sync_replica
+
+DEFAULT_SIZES = (0, 1, 2, 4)
+READERS = 4
+WRITERS = 2
+POSTS = 5000
+
+
+def client_loop(kind, repeat, post_ids, user_id, seed, queue):
+    connections.close_all()  # never reuse the parent's SQLite handles after fork
+    client = APIClient()
+    if kind == 'write':
+        client.force_authenticate(User.objects.get(pk=user_id))
+    rng = random.Random(seed)
+    latencies, errors = [], 0
+    start = time.perf_counter()
+    for i in range(repeat):
+        post_id = rng.choice(post_ids)
+        began = time.perf_counter()
+        if kind == 'write':
+            response = client.post(f'/api/posts/{post_id}/like/')
+        elif i % 2:
+            response = client.get(f'/api/posts/{post_id}/')
+        else:
+            response = client.get('/api/posts/')
+        errors += response.status_code >= 400
+        latencies.append((time.perf_counter() - began) * 1000)
+    queue.put((kind, latencies, errors, time.perf_counter() - start))
+    connections.close_all()
+
+
+def add_replicas(count):
+    primary = connections.settings['default']
+    folder = os.path.dirname(primary['NAME'])
+    aliases = [f'bench_replica{i}' for i in range(1, count + 1)]
+    for alias in aliases:
+        connections.settings[alias] = {**primary, 'NAME': os.path.join(folder, f'{alias}.sqlite3')}
+        sync_replica(alias)
+    return aliases
+
+
+def run(command, sizes, repeat):
+    if connection.vendor != 'sqlite':
+        command.stdout.write("replicas benchmarks local SQLite replica files only")
+        return
+    seed_posts(POSTS)
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    writers = User.objects.bulk_create(User(username=f"replica-writer-{i}") for i in range(WRITERS))
+    context = multiprocessing.get_context('fork')
+
+    for count in sizes:
+        aliases = add_replicas(count)
+        connections.close_all()
+        replica_config = {**get_config(), 'ALIASES': aliases, 'PATHS': ['/api/posts/']}
+        with without_response_cache(), override_settings(
+            DATABASE_REPLICAS=replica_config, VIEW_COUNTER={'FLUSH_INTERVAL': 0},
+        ):
+            queue = context.Queue()
+            jobs = [('read', None)] * READERS + [('write', user.pk) for user in writers]
+            processes = [
+                context.Process(target=client_loop, args=(kind, repeat, post_ids, user_id, i, queue))
+                for i, (kind, user_id) in enumerate(jobs)
+            ]
+            for process in processes:
+                process.start()
+            results = [queue.get() for _ in processes]
+            for process in processes:
+                process.join()
+
+        reads = [ms for kind, latencies, _, _ in results if kind == 'read' for ms in latencies]
+        read_time = max(elapsed for kind, _, _, elapsed in results if kind == 'read')
+        errors = sum(errors for _, _, errors, _ in results)
+        command.stdout.write(
+            f"replicas={count}  reads/s={len(reads) / read_time:7.0f}  "
+            f"read p50={percentile(reads, 50):6.2f}ms p99={percentile(reads, 99):7.2f}ms  errors={errors}"
+        )
+        for alias in aliases:
+            connections[alias].close()
+            del connections.settings[alias]
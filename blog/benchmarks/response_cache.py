@@ -0,0 +1,71 @@
+"""
+Anonymous read workload with and without the rendered-response cache.
+
+Replays a skewed mix of anonymous post list/detail reads (popular posts
+are hit far more often than the tail) interleaved with comment writes,
+once against a DummyCache and once against the configured `responses`
+cache, and reports hit ratio and latency for each.
+
+    python manage.py benchmark response_cache --sizes 1000 --repeat 5000
+"""
+import random
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from blog import caching
+from blog.benchmarks import measure, seed_posts, summarize, without_response_cache
+from blog.models import Comment, Post
+
+DEFAULT_SIZES = (1000,)
+WRITE_RATIO = 0.02
+LIST_RATIO = 0.3
+
+
+def build_workload(post_ids, count, seed=42):
+    rng = random.Random(seed)
+    ops = []
+    for _ in range(count):
+        roll = rng.random()
+        # Pareto-distributed rank: a handful of posts draw most of the reads
+        post_id = post_ids[min(int(rng.paretovariate(1.2)) - 1, len(post_ids) - 1)]
+        if roll < WRITE_RATIO:
+            ops.append(('comment', post_id))
+        elif roll < WRITE_RATIO + LIST_RATIO:
+            ops.append(('list', None))
+        else:
+            ops.append(('detail', post_id))
+    return ops
+
+
+def replay(ops, author):
+    client = APIClient()
+    ops = iter(ops)
+
+    def step():
+        op, post_id = next(ops)
+        if op == 'comment':
+            Comment.objects.create(post_id=post_id, author=author, text="bench")
+        elif op == 'list':
+            client.get('/api/posts/')
+        else:
+            client.get(f'/api/posts/{post_id}/')
+    return step
+
+
+def run(command, sizes, repeat):
+    for size in sizes:
+        author = seed_posts(size)
+        post_ids = list(Post.objects.order_by('-created_at').values_list('id', flat=True))
+        ops = build_workload(post_ids, repeat)
+
+        for label, cache_override in (('no cache', without_response_cache()), ('cached', override_settings())):
+            with cache_override, override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0}):
+                caching.stats.clear()
+                stats = summarize(measure(replay(ops, author), repeat))
+                lookups = caching.stats['hit'] + caching.stats['miss']
+                ratio = caching.stats['hit'] / lookups if lookups else 0.0
+                command.stdout.write(
+                    f"posts={size}  {label:<8} hit_ratio={ratio:.1%} "
+                    f"p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms p99={stats['p99_ms']:.3f}ms"
+                )
@@ -0,0 +1,55 @@
+"""
+Full-text index vs `icontains` scans.
+
+Builds a corpus of posts with random words drawn from a Zipf-like
+vocabulary, then times /api/posts/search/ against the equivalent
+title/content `icontains` query for common and rare terms.
+
+    python manage.py benchmark search --sizes 10000 100000 500000
+"""
+import random
+
+from django.db.models import Q
+from rest_framework.test import APIClient
+
+from blog.benchmarks import measure, summarize
+from blog.models import Post, User
+from blog.search import rebuild_index
+
+DEFAULT_SIZES = (10000, 100000)
+VOCABULARY = [f"word{i}" for i in range(5000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+TERMS = {'common': 'word1', 'rare': 'word4000'}
+
+
+def seed_corpus(count, batch_size=5000, seed=7):
+    rng = random.Random(seed)
+    author, _ = User.objects.get_or_create(username='bench-author')
+    existing = Post.objects.count()
+    for start in range(existing, count, batch_size):
+        Post.objects.bulk_create(
+            Post(
+                author=author, slug=f"doc-{i}",
+                title=' '.join(rng.choices(VOCABULARY, WEIGHTS, k=6)),
+                content=' '.join(rng.choices(VOCABULARY, WEIGHTS, k=120)),
+            )
+            for i in range(start, min(start + batch_size, count))
+        )
+    rebuild_index()  # bulk_create bypasses the sync signals
+
+
+def run(command, sizes, repeat):
+    client = APIClient()
+    for size in sorted(sizes):
+        seed_corpus(size)
+        for label, term in TERMS.items():
+            fts = summarize(measure(lambda: client.get('/api/posts/search/', {'q': term}), repeat))
+            scan = summarize(measure(
+                lambda: list(Post.objects.filter(Q(title__icontains=term) | Q(content__icontains=term))
+                             .order_by('-created_at').values_list('id', flat=True)[:20]),
+                repeat,
+            ))
+            command.stdout.write(
+                f"posts={size:>7} {label:<6} fts p50={fts['p50_ms']:.2f}ms p95={fts['p95_ms']:.2f}ms  "
+                f"icontains p50={scan['p50_ms']:.2f}ms p95={scan['p95_ms']:.2f}ms"
+            )
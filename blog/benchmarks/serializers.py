@@ -0,0 +1,65 @@
+"""
+Serialize + render cost of list payloads, per 1k rows.
+
+For `size` posts (and as many categories) already fetched into memory,
+times turning them into JSON bytes four ways: the DRF serializer or the
+ValuesSerializer fast path (blog/fastpath.py), each rendered with DRF's
+JSONRenderer or FastJSONRenderer with the stdlib or orjson encoder. Every
+combination is checked to produce the same bytes before it is timed.
+Database time is excluded: instances and `.values_list()` rows are loaded
+once up front.
+
+    python manage.py benchmark serializers --sizes 1000 10000 --repeat 20
+"""
+from django.test import override_settings
+from rest_framework.renderers import JSONRenderer
+
+from blog.benchmarks import measure, seed_posts, summarize
+from blog.fastpath import values_serializer
+from blog.models import Category, Post
+from blog.renderers import FastJSONRenderer
+from blog.serializers import CategorySerializer, PostListSerializer
+from blog.views import with_list_columns
+
+DEFAULT_SIZES = (1000, 10000)
+RENDERERS = {
+    'drf-json': (JSONRenderer, None),
+    'stdlib': (FastJSONRenderer, 'blog.renderers.stdlib_dumps'),
+    'orjson': (FastJSONRenderer, 'blog.renderers.orjson_dumps'),
+}
+
+
+def run(command, sizes, repeat):
+    for size in sizes:
+        seed_posts(size)
+        Category.objects.bulk_create(
+            Category(name=f"Category {i}") for i in range(Category.objects.count(), size)
+        )
+        cases = {
+            'posts': (PostListSerializer, with_list_columns(Post.objects.order_by('-created_at', '-id'))),
+            'categories': (CategorySerializer, Category.objects.order_by('name')),
+        }
+        for label, (serializer_class, queryset) in cases.items():
+            queryset = queryset[:size]
+            instances = list(queryset)
+            fast = values_serializer(serializer_class)
+            rows = list(fast.rows(queryset))
+            serializers = {
+                'drf': lambda: serializer_class(instances, many=True).data,
+                'values': lambda: fast.serialize(rows),
+            }
+            expected = JSONRenderer().render(serializer_class(instances, many=True).data)
+            for serializer_name, serialize in serializers.items():
+                for renderer_name, (renderer_class, encoder) in RENDERERS.items():
+                    renderer = renderer_class()
+                    with override_settings(JSON_ENCODER=encoder or 'blog.renderers.stdlib_dumps'):
+                        body = renderer.render(serialize())
+                        if body != expected:
+                            command.stderr.write(f"{label} {serializer_name}+{renderer_name}: output differs")
+                            continue
+                        stats = summarize(measure(lambda: renderer.render(serialize()), repeat))
+                    per_1k = 1000 / size
+                    command.stdout.write(
+                        f"rows={size:>6}  {label:<10} {serializer_name:>6}+{renderer_name:<8} "
+                        f"p50={stats['p50_ms'] * per_1k:7.2f}ms/1k  p99={stats['p99_ms'] * per_1k:7.2f}ms/1k"
+                    )
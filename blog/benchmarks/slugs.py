@@ -0,0 +1,65 @@
+"""
+Concurrent creation of identically titled posts.
+
+Several threads create `size` "Hello World" posts between them through
+Post.objects.create, recording failures and the number of queries each
+insert needed (retries included).
+
+    python manage.py benchmark slugs --sizes 10000
+"""
+import threading
+import time
+from collections import Counter
+
+from django.db import OperationalError, connection
+from django.test.utils import CaptureQueriesContext
+
+from blog.models import Post, User
+
+DEFAULT_SIZES = (10000,)
+THREADS = 8
+
+
+def run(command, sizes, repeat):
+    author, _ = User.objects.get_or_create(username='bench-author')
+    for size in sizes:
+        Post.objects.all().delete()
+        errors = Counter()
+        query_counts = []
+        lock = threading.Lock()
+
+        def worker(count):
+            local = []
+            try:
+                for _ in range(count):
+                    while True:
+                        try:
+                            with CaptureQueriesContext(connection) as ctx:
+                                Post.objects.create(author=author, title="Hello World", content="x")
+                            local.append(len(ctx.captured_queries))
+                            break
+                        except OperationalError:
+                            errors['locked (retried)'] += 1  # writer lock timeout, not a slug clash
+                        except Exception as exc:
+                            errors[type(exc).__name__] += 1
+                            break
+            finally:
+                connection.close()
+                with lock:
+                    query_counts.extend(local)
+
+        per_thread = [size // THREADS + (1 if i < size % THREADS else 0) for i in range(THREADS)]
+        threads = [threading.Thread(target=worker, args=(n,)) for n in per_thread]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        slugs = Post.objects.count(), Post.objects.values('slug').distinct().count()
+        command.stdout.write(
+            f"posts={size} threads={THREADS} created={slugs[0]} unique_slugs={slugs[1]} "
+            f"inserts/s={slugs[0] / elapsed:.0f} queries/insert max={max(query_counts, default=0)} "
+            f"min={min(query_counts, default=0)} errors={dict(errors) or 0}"
+        )
@@ -0,0 +1,129 @@
+"""
+Concurrent read/write load on SQLite, stock settings versus blog.sqlite.
+
+`size` worker threads share one database file. A quarter of them write,
+alternating like toggles and new comments, and the rest read the post
+list and post details anonymously. Each worker issues `repeat` requests.
+The scenario runs twice:
+
+    stock   rollback journal, synchronous=FULL, deferred transactions,
+            one connection per thread for everything
+    tuned   the OPTIONS configured in settings.DATABASES (WAL, pragmas,
+            IMMEDIATE transactions, read/write split, writer lock)
+
+For each run it reports "database is locked" errors, other failures,
+throughput, and p50/p99 latency for reads and writes.
+
+    python manage.py benchmark sqlite_load --sizes 8 32 --repeat 200
+"""
+import random
+import threading
+import time
+from collections import Counter
+
+from django.db import OperationalError, connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from blog.benchmarks import percentile, seed_posts, without_response_cache
+from blog.models import Post, User
+
+DEFAULT_SIZES = (8, 32)
+WRITER_SHARE = 0.25
+
+STOCK_OPTIONS = {
+    'pragmas': {
+        'journal_mode': None,  # switched once in reconnect(); it needs an exclusive lock
+        'synchronous': 'FULL',
+        'mmap_size': 0,
+        'cache_size': -2000,
+        'busy_timeout': 5000,  # what sqlite3.connect's default timeout sets
+        'temp_store': 'DEFAULT',
+    },
+    'split_reads': False,
+    'serialize_writes': False,
+}
+
+
+def reconnect(options, journal_mode):
+    connection.settings_dict['OPTIONS'] = options  # shared with every thread's wrapper
+    connection.close()
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+
+def worker(kind, user, post_ids, repeat, seed, results, lock):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    rng = random.Random(seed)
+    latencies, errors = [], Counter()
+    try:
+        for i in range(repeat):
+            post_id = rng.choice(post_ids)
+            start = time.perf_counter()
+            try:
+                if kind == 'read' and i % 2:
+                    response = client.get(f'/api/posts/{post_id}/')
+                elif kind == 'read':
+                    response = client.get('/api/posts/')
+                elif i % 2:
+                    response = client.post(f'/api/posts/{post_id}/comment/', {'post': post_id, 'text': "load"}, format='json')
+                else:
+                    response = client.post(f'/api/posts/{post_id}/like/')
+                if response.status_code >= 400:
+                    errors[f'http {response.status_code}'] += 1
+            except OperationalError as exc:
+                errors['locked' if 'locked' in str(exc) else 'operational'] += 1
+            except Exception as exc:
+                errors[type(exc).__name__] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        connection.close()
+        with lock:
+            results[kind].extend(latencies)
+            results['errors'].update(errors)
+
+
+def run_mix(threads, repeat, users, post_ids):
+    results = {'read': [], 'write': [], 'errors': Counter()}
+    lock = threading.Lock()
+    writers = max(1, int(threads * WRITER_SHARE))
+    workers = [
+        threading.Thread(target=worker, args=(
+            'write' if i < writers else 'read', users[i] if i < writers else None,
+            post_ids, repeat, i, results, lock,
+        ))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def run(command, sizes, repeat):
+    if connection.vendor != 'sqlite':
+        command.stdout.write("sqlite_load only applies to SQLite")
+        return
+    seed_posts(200)
+    post_ids = list(Post.objects.values_list('id', flat=True))
+    users = User.objects.bulk_create(User(username=f"load-{i}") for i in range(max(sizes)))
+    tuned_options = connection.settings_dict['OPTIONS']
+
+    with without_response_cache(), override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0}):
+        for threads in sizes:
+            for label, options, journal_mode in (('stock', STOCK_OPTIONS, 'DELETE'), ('tuned', tuned_options, 'WAL')):
+                reconnect(options, journal_mode)
+                results, elapsed = run_mix(threads, repeat, users, post_ids)
+                total = len(results['read']) + len(results['write'])
+                command.stdout.write(
+                    f"threads={threads:>3} {label:<5} req/s={total / elapsed:>7.0f} "
+                    f"locked={results['errors']['locked']:>4} "
+                    f"other_errors={sum(results['errors'].values()) - results['errors']['locked']:>4} "
+                    f"read p50={percentile(results['read'], 50):6.2f}ms p99={percentile(results['read'], 99):7.2f}ms "
+                    f"write p50={percentile(results['write'], 50):6.2f}ms p99={percentile(results['write'], 99):7.2f}ms"
+                )
+    reconnect(tuned_options, 'WAL')
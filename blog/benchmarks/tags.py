@@ -0,0 +1,69 @@
+"""
+Tag-filtered post listing at scale.
+
+Tags every seeded post with a popular tag and a few random tail tags
+(bulk-inserted, with counts recomputed), then times
+/api/posts/?tag=... for a popular tag, a rare tag and an AND of both, and
+prints the SQLite query plan to show the filter runs off
+`posttag_tag_post_idx`.
+
+    python manage.py benchmark tags --sizes 10000 100000 1000000
+"""
+import random
+
+from django.db import connection
+from django.db.models import Count
+from rest_framework.test import APIClient
+
+from blog.benchmarks import measure, seed_posts, summarize, without_response_cache
+from blog.models import Post, PostTag, Tag
+from blog.tagging import filter_by_tags
+
+DEFAULT_SIZES = (10000, 100000)
+TAIL_TAGS = 2000
+
+
+def tag_posts(seed=3):
+    rng = random.Random(seed)
+    Tag.objects.bulk_create(
+        [Tag(name='popular')] + [Tag(name=f"tail-{i}") for i in range(TAIL_TAGS)], ignore_conflicts=True
+    )
+    popular = Tag.objects.get(name='popular').pk
+    tail_ids = list(Tag.objects.exclude(pk=popular).values_list('id', flat=True))
+    untagged = Post.objects.filter(posttag__isnull=True).values_list('id', flat=True).iterator(chunk_size=5000)
+    rows = []
+    for post_id in untagged:
+        if rng.random() < 0.3:
+            rows.append(PostTag(post_id=post_id, tag_id=popular))
+        rows.extend(PostTag(post_id=post_id, tag_id=t) for t in set(rng.sample(tail_ids, 3)))
+    PostTag.objects.bulk_create(rows, batch_size=5000)
+    for tag_id, count in PostTag.objects.values_list('tag_id').annotate(n=Count('id')):
+        Tag.objects.filter(pk=tag_id).update(post_count=count)
+
+
+def run(command, sizes, repeat):
+    client = APIClient()
+    for size in sorted(sizes):
+        seed_posts(size)
+        tag_posts()
+        cases = {
+            'popular': {'tag': 'popular'},
+            'rare': {'tag': 'tail-7'},
+            'popular AND rare': {'tag': ['popular', 'tail-7']},
+        }
+        for label, params in cases.items():
+            with without_response_cache():
+                stats = summarize(measure(lambda: client.get('/api/posts/', params), repeat))
+            command.stdout.write(
+                f"posts={size:>8}  {label:<17} p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms"
+            )
+
+    if connection.vendor == 'sqlite':
+        for label, names in (('rare', ['tail-7']), ('popular', ['popular'])):
+            queryset = filter_by_tags(Post.objects.order_by('-created_at', '-id'), names)[:20]
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                command.stdout.write(f"plan for {label} tag:")
+                for row in cursor.fetchall():
+                    command.stdout.write(f"  {row[-1]}")
@@ -0,0 +1,76 @@
+"""
+Trending feed: materialized scores vs ranking on the fly.
+
+For `size` posts with random counters, times the first and the 51st page of
+GET /api/posts/trending/ (a keyset range scan of `trending_score_idx`)
+against the same ranking computed per request from the Post counters,
+which has to score and sort the whole table. Also times the incremental
+update behind a like.
+
+    python manage.py benchmark trending --sizes 10000 100000 --repeat 50
+"""
+import random
+
+from django.db import connection
+from django.db.models import F, FloatField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Log
+from django.test import Client, RequestFactory
+from rest_framework.request import Request
+
+from blog.benchmarks import measure, seed_posts, summarize, without_response_cache
+from blog.models import Post
+from blog.pagination import TrendingCursorPagination
+from blog.serializers import PostListSerializer
+from blog.trending import COUNTERS, adjust, get_config, recompute, trending_feed
+from blog.views import with_list_columns
+
+DEFAULT_SIZES = (10000, 100000)
+
+
+def on_the_fly(limit):
+    """The same ranking, computed from the counters of every post (SQLite date math)"""
+    config = get_config()
+    weight = sum(
+        (F(counter) * Value(config['WEIGHTS'][key]) for counter, key in COUNTERS.items()), Value(0.0),
+    )
+    base = RawSQL(
+        "(julianday(blog_post.created_at) - julianday('2020-01-01')) * 86400.0 / %s",
+        [config['HALF_LIFE']], output_field=FloatField(),
+    )
+    queryset = with_list_columns(Post.objects.all()).annotate(score=Log(Value(2.0), weight + Value(1.0)) + base)
+    return PostListSerializer(list(queryset.order_by('-score', '-id')[:limit]), many=True).data
+
+
+def run(command, sizes, repeat):
+    client = Client()
+    rng = random.Random(0)
+    for size in sizes:
+        seed_posts(size)
+        ids = list(Post.objects.values_list('id', flat=True))
+        Post.objects.filter(pk__in=rng.sample(ids, min(len(ids), 2000))).update(likes=F('id') % 50, views=F('id') % 997)
+        recompute()
+        deep = {'next': '/api/posts/trending/'}
+        for _ in range(50):  # page 50 of 20
+            deep = client.get(deep['next']).json()
+        deep_url = deep['next']
+
+        with without_response_cache():
+            cases = {
+                'materialized p1': lambda: client.get('/api/posts/trending/'),
+                'materialized p51': lambda: client.get(deep_url),
+                'on the fly p1': lambda: on_the_fly(20),
+            }
+            for label, fn in cases.items():
+                stats = summarize(measure(fn, repeat))
+                command.stdout.write(
+                    f"posts={size:>7}  {label:<16} p50={stats['p50_ms']:8.2f}ms  p99={stats['p99_ms']:8.2f}ms"
+                )
+        like = summarize(measure(lambda: adjust({rng.choice(ids): 1.0}), repeat))
+        command.stdout.write(f"posts={size:>7}  incremental like  p50={like['p50_ms']:8.3f}ms  p99={like['p99_ms']:8.3f}ms")
+        paginator = TrendingCursorPagination()
+        queryset = paginator.get_page_queryset(trending_feed(), Request(RequestFactory().get(deep_url)))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + str(queryset.query))
+            plan = ' / '.join(row[-1] for row in cursor.fetchall())
+        command.stdout.write(f"posts={size:>7}  plan: {plan}")
@@ -0,0 +1,55 @@
+"""
+Cost of counting views on the post detail path.
+
+Times GET /api/posts/{id}/ with view counting disabled, with the buffered
+counter, and with a naive per-request UPDATE, then times one flush.
+
+    python manage.py benchmark views --sizes 1000 --repeat 2000
+"""
+import itertools
+import time
+
+from django.db.models import F
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from blog.benchmarks import measure, seed_posts, summarize, without_response_cache
+from blog.counters import flush_views, get_view_buffer
+from blog.models import Post
+
+DEFAULT_SIZES = (1000,)
+
+
+def run(command, sizes, repeat):
+    client = APIClient()
+    for size in sizes:
+        seed_posts(size)
+        post_ids = itertools.cycle(Post.objects.values_list('id', flat=True)[:size])
+
+        def detail():
+            return client.get(f'/api/posts/{next(post_ids)}/')
+
+        def detail_naive():
+            response = detail()
+            Post.objects.filter(pk=response.data['id']).update(views=F('views') + 1)
+
+        results = {}
+        with without_response_cache(), override_settings(VIEW_COUNTER={'BACKEND': None}):
+            results['uncounted'] = summarize(measure(detail, repeat))
+            results['naive UPDATE'] = summarize(measure(detail_naive, repeat))
+        with without_response_cache(), override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0}):
+            start = time.perf_counter()
+            buffered = measure(detail, repeat)
+            elapsed = time.perf_counter() - start
+            results['buffered'] = summarize(buffered)
+
+            start = time.perf_counter()
+            updated = flush_views(get_view_buffer())
+            flush_ms = (time.perf_counter() - start) * 1000
+
+        for name, stats in results.items():
+            command.stdout.write(f"posts={size}  {name:<13} p50={stats['p50_ms']:.3f}ms p95={stats['p95_ms']:.3f}ms")
+        command.stdout.write(
+            f"buffered throughput={repeat / elapsed:.0f} req/s  "
+            f"flush of {updated} posts took {flush_ms:.2f}ms"
+        )
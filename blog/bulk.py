@@ -0,0 +1,275 @@
+"""
+Streaming JSONL import/export of posts.
+
+Both directions are generator pipelines, so memory stays flat no matter
+how many rows go through:
+
+    lines -> parse_lines -> batched -> import_batch -> bulk_create
+    queryset.iterator(chunk_size) -> post_to_record -> JSON lines
+
+One JSON object per line:
+
+    {"title": "...", "content": "...", "author": "username",
+     "slug": "...", "category": "Tech", "tags": ["a", "b"],
+     "image": null, "created_at": "2025-01-01T00:00:00+00:00"}
+
+Only `title` and `content` are required; `author` falls back to the
+importing user.
+"""
+import json
+from collections import Counter
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.utils.dateparse import parse_datetime
+
+from .caching import invalidate
+from .denorm import bump
+from .feeds import fan_out
+from .models import Category, Post, PostTag, Tag, User, highest_slug_suffix, normalize_tags, slug_base
+from .search import index_new_posts
+from .trending import track_posts
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+
+
+# -----------------------------
+# IMPORT
+# -----------------------------
+def parse_lines(lines):
+    """Yield `(line_number, record, error)` for every non-blank line"""
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield number, None, f"invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "expected a JSON object"
+            continue
+        yield number, record, None
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def fits(model, name, value):
+    """True if the string `value` passes the validators of `model.name` (format, max_length)"""
+    try:
+        model._meta.get_field(name).run_validators(value)
+    except ValidationError:
+        return False
+    return True
+
+
+def parses_as_datetime(value):
+    try:
+        return parse_datetime(value) is not None
+    except ValueError:  # well-formed but out of range, e.g. month 13
+        return False
+
+
+def validate(record):
+    """Why `record` cannot be imported, or None; import_batch relies on these checks"""
+    title, content = record.get('title'), record.get('content')
+    if not isinstance(title, str) or not title.strip():
+        return "title is required"
+    if len(title) > Post._meta.get_field('title').max_length:
+        return "title is too long"
+    if not isinstance(content, str):
+        return "content is required"
+    if not isinstance(record.get('tags', []), list):
+        return "tags must be a list"
+    # Optional fields: absent, null or empty means "use the default"
+    slug, author, category = record.get('slug'), record.get('author'), record.get('category')
+    if slug and not (isinstance(slug, str) and fits(Post, 'slug', slug)):
+        max_length = Post._meta.get_field('slug').max_length
+        return f"slug must be at most {max_length} letters, numbers, hyphens or underscores"
+    if author and not isinstance(author, str):
+        return "author must be a username"
+    if category and not (isinstance(category, str) and fits(Category, 'name', category)):
+        return f"category must be a name of at most {Category._meta.get_field('name').max_length} characters"
+    image = record.get('image')
+    if image is not None and not (isinstance(image, str) and fits(Post, 'image', image)):
+        return f"image must be a URL of at most {Post._meta.get_field('image').max_length} characters"
+    created_at = record.get('created_at')
+    if created_at and not (isinstance(created_at, str) and parses_as_datetime(created_at)):
+        return "created_at must be an ISO 8601 datetime"
+    return None
+
+
+class SlugAllocator:
+    """
+    Hands out unique slugs for an import: one query per batch, plus one per
+    slug base that is already taken. Suffix counters outlive the batch, so
+    a title repeated throughout a file costs a single suffix lookup.
+    """
+
+    def __init__(self):
+        self.taken = set()
+        self.last_suffix = {}
+
+    def start_batch(self, records):
+        # The title base too when a slug is given: allocate() falls back to it
+        # if the explicit slug is taken
+        wanted = {slug_base(record['title']) for record in records}
+        wanted.update(record['slug'] for record in records if record.get('slug'))
+        self.taken = set(Post.objects.filter(slug__in=wanted).values_list('slug', flat=True))
+
+    def allocate(self, record):
+        slug = record.get('slug')
+        if slug and slug not in self.taken:
+            self.taken.add(slug)
+            return slug
+        base = slug_base(record['title'])
+        if base not in self.taken and base not in self.last_suffix:
+            self.taken.add(base)
+            return base
+        if base not in self.last_suffix:
+            self.last_suffix[base] = highest_slug_suffix(base) or 0
+        while True:
+            self.last_suffix[base] += 1
+            slug = f"{base}-{self.last_suffix[base]}"
+            if slug not in self.taken:
+                self.taken.add(slug)
+                return slug
+
+
+def import_batch(rows, default_author, slugs):
+    """Insert one batch of `(line_number, record)`; returns (created, errors)"""
+    errors = []
+    usernames = {r['author'] for _, r in rows if r.get('author')}
+    authors = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    category_names = {r['category'] for _, r in rows if r.get('category')}
+    Category.objects.bulk_create([Category(name=n) for n in category_names], ignore_conflicts=True)
+    categories = dict(Category.objects.filter(name__in=category_names).values_list('name', 'id'))
+
+    accepted = []
+    for number, record in rows:
+        author_id = authors.get(record['author']) if record.get('author') else default_author.pk
+        if author_id is None:
+            errors.append((number, f"unknown author {record['author']!r}"))
+            continue
+        accepted.append((record, author_id))
+
+    slugs.start_batch([record for record, _ in accepted])
+    posts = [
+        Post(
+            author_id=author_id,
+            title=record['title'],
+            slug=slugs.allocate(record),
+            content=record['content'],
+            image=record.get('image'),
+            category_id=categories.get(record.get('category')),
+        )
+        for record, author_id in accepted
+    ]
+    with transaction.atomic():
+        Post.objects.bulk_create(posts)
+        bump(User, 'post_count', Counter(post.author_id for post in posts))  # bulk_create sends no post_save
+        restore_timestamps(posts, [record for record, _ in accepted])
+        tag_names = [normalize_tags(record.get('tags', [])) for record, _ in accepted]
+        attach_tags(posts, tag_names)
+        index_new_posts([(p.pk, p.title, p.content) for p in posts])
+        # After restore_timestamps: both read created_at back from the table
+        track_posts([post.pk for post in posts])
+        fan_out([post.pk for post in posts])
+    return len(posts), errors
+
+
+def restore_timestamps(posts, records):
+    """bulk_create stamps created_at with now(); put exported values back"""
+    stamps = [(parse_datetime(r['created_at']), post.pk) for post, r in zip(posts, records) if r.get('created_at')]
+    stamps = [(connection.ops.adapt_datetimefield_value(stamp), pk) for stamp, pk in stamps if stamp is not None]
+    if stamps:
+        with connection.cursor() as cursor:
+            cursor.executemany(f"UPDATE {Post._meta.db_table} SET created_at = %s WHERE id = %s", stamps)
+
+
+def attach_tags(posts, tag_names):
+    """Bulk-insert PostTag rows and bump usage counts (bulk_create skips the signals)"""
+    wanted = {name for names in tag_names for name in names}
+    if not wanted:
+        return
+    Tag.objects.bulk_create([Tag(name=name) for name in wanted], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.filter(name__in=wanted).values_list('name', 'id'))
+    PostTag.objects.bulk_create(
+        [PostTag(post_id=post.pk, tag_id=tag_ids[name]) for post, names in zip(posts, tag_names) for name in names]
+    )
+    usage = Counter(tag_ids[name] for names in tag_names for name in names)
+    Tag.objects.filter(pk__in=usage).update(
+        post_count=F('post_count') + Case(
+            *[When(pk=pk, then=Value(n)) for pk, n in usage.items()],
+            default=Value(0),
+            output_field=PositiveIntegerField(),
+        )
+    )
+
+
+def import_posts(lines, default_author, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import JSONL `lines` (any iterable of str/bytes) in batches.
+    Returns `{'created': n, 'skipped': n, 'errors': [(line, message), ...]}`.
+    """
+    created, skipped, errors = 0, 0, []
+    slugs = SlugAllocator()
+
+    def valid_rows():
+        nonlocal skipped
+        for number, record, error in parse_lines(lines):
+            error = error or validate(record)
+            if error:
+                skipped += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append((number, error))
+                continue
+            yield number, record
+
+    for batch in batched(valid_rows(), batch_size):
+        count, batch_errors = import_batch(batch, default_author, slugs)
+        created += count
+        skipped += len(batch_errors)
+        errors.extend(batch_errors[:MAX_REPORTED_ERRORS - len(errors)])
+
+    if created:
+        invalidate('posts')
+    return {'created': created, 'skipped': skipped, 'errors': errors}
+
+
+# -----------------------------
+# EXPORT
+# -----------------------------
+def post_to_record(post):
+    return {
+        'title': post.title,
+        'slug': post.slug,
+        'content': post.content,
+        'image': post.image,
+        'author': post.author.username,
+        'category': post.category.name if post.category_id else None,
+        'tags': [tag.name for tag in post.tags.all()],
+        'created_at': post.created_at,
+        'updated_at': post.updated_at,
+    }
+
+
+def export_posts(queryset=None, chunk_size=DEFAULT_BATCH_SIZE):
+    """Yield one JSON line per post, reading `chunk_size` rows at a time"""
+    queryset = (queryset if queryset is not None else Post.objects.all()).order_by('pk')
+    queryset = queryset.select_related('author', 'category').prefetch_related('tags').only(
+        'title', 'slug', 'content', 'image', 'created_at', 'updated_at', 'author__username', 'category__name',
+    )
+    for post in queryset.iterator(chunk_size=chunk_size):
+        yield json.dumps(post_to_record(post), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
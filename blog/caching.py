@@ -0,0 +1,260 @@
+"""
+Rendered-response cache for anonymous post reads.
+
+Responses are stored as rendered bytes in the `responses` cache alias,
+keyed by path, query string, media type and the current *generation* of
+every scope the response depends on. Writes never delete entries; signal
+handlers bump the generations of the scopes they touch, so stale entries
+simply stop being addressed and age out of the cache.
+
+Scopes:
+    posts        any post list page
+    post:<id>    one post's detail
+    categories   category names embedded in post detail
+    authors      author fields embedded in list and detail
+
+With the in-process `ByteLRUCache` backend invalidation only reaches the
+worker that handled the write; run a single worker or use a shared backend
+(`FileBasedCache`, Redis) when serving from several processes.
+"""
+import hashlib
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, quote_etag
+
+from .models import Category, Comment, Post, User
+
+# Hit/miss counters for benchmarks and ad-hoc inspection
+stats = Counter()
+
+
+# -----------------------------
+# BYTE-BOUNDED LRU BACKEND
+# -----------------------------
+class ByteLRUCache(BaseCache):
+    """
+    Process-local LRU cache evicting by total pickled size instead of
+    entry count. `OPTIONS['MAX_BYTES']` sets the budget (default 64 MiB).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._data = OrderedDict()  # key -> (pickled, expires_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at <= time.time()
+
+    def _remove(self, key):
+        pickled, _ = self._data.pop(key)
+        self._bytes -= len(pickled)
+
+    def _store(self, key, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) > self.max_bytes:
+            return False
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (pickled, self.get_backend_timeout(timeout))
+        self._bytes += len(pickled)
+        while self._bytes > self.max_bytes:
+            self._remove(next(iter(self._data)))
+        return True
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry[1]):
+            self._remove(key)
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            return self._store(key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entry = self._live(key)
+        if entry is None:
+            return default
+        return pickle.loads(entry[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            self._store(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return False
+            self._data[key] = (entry[0], self.get_backend_timeout(timeout))
+            return True
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if key not in self._data:
+                return False
+            self._remove(key)
+            return True
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            return self._live(key) is not None
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+
+# -----------------------------
+# GENERATIONS
+# -----------------------------
+def response_cache():
+    return caches[getattr(settings, 'RESPONSE_CACHE_ALIAS', 'responses')]
+
+
+def get_generations(scopes):
+    """
+    Current generation tokens for `scopes`. A missing token gets a fresh
+    random one, so an evicted generation can never resurrect old entries.
+    """
+    cache = response_cache()
+    keys = [f'gen:{scope}' for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            token = uuid.uuid4().hex
+            cache.add(key, token, timeout=None)
+            found[key] = cache.get(key) or token
+    return [found[key] for key in keys]
+
+
+def invalidate(*scopes):
+    response_cache().set_many({f'gen:{scope}': uuid.uuid4().hex for scope in scopes}, timeout=None)
+
+
+# -----------------------------
+# VIEW DECORATOR
+# -----------------------------
+def make_cache_key(request, generations):
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    raw = '|'.join([request.path, query, request.accepted_media_type, *generations])
+    return 'resp:' + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+# Headers replayed with a cached body; the ETag and Last-Modified come
+# from blog/conditional.py when the action sets them
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+def conditional_response(request, headers):
+    """A 304 carrying `headers` if the request's preconditions hold for them, else None"""
+    last_modified = parse_http_date_safe(headers.get('Last-Modified'))
+    response = get_conditional_response(request, etag=headers['ETag'], last_modified=last_modified)
+    if response is not None:
+        for name, value in headers.items():
+            response[name] = value
+    return response
+
+
+def cache_anonymous(get_scopes):
+    """
+    Serve a viewset action from the response cache for anonymous requests.
+
+    `get_scopes(view)` names the invalidation scopes the response depends
+    on. Only 200 responses are stored; hits never touch the ORM or the
+    serializers, and `If-None-Match` / `If-Modified-Since` are answered
+    with a 304. A response without an ETag of its own gets one hashed
+    from its body.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.user and request.user.is_authenticated:
+                return method(self, request, *args, **kwargs)
+
+            cache = response_cache()
+            key = make_cache_key(request, get_generations(get_scopes(self)))
+            cached = cache.get(key)
+            if cached is not None:
+                stats['hit'] += 1
+                body, content_type, headers = cached
+                return conditional_response(request, headers) or HttpResponse(
+                    body, content_type=content_type, headers=headers,
+                )
+
+            stats['miss'] += 1
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response = self.finalize_response(request, response, *args, **kwargs)
+            response.render()
+            if not response.has_header('ETag'):
+                response['ETag'] = quote_etag(hashlib.md5(response.content).hexdigest())
+            headers = {name: response[name] for name in VALIDATOR_HEADERS if response.has_header(name)}
+            cache.set(key, (response.content, response['Content-Type'], headers))
+            return conditional_response(request, headers) or response
+        return wrapper
+    return decorator
+
+
+# -----------------------------
+# INVALIDATION SIGNALS
+# -----------------------------
+# likes/saves/views are not rendered by the cached endpoints, so their
+# many-to-many changes and F() counter updates deliberately invalidate nothing.
+
+@receiver([post_save, post_delete], sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    invalidate('posts', f'post:{instance.pk}')
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def invalidate_post_tags(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate('posts')  # tag-filtered list pages
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment(sender, instance, **kwargs):
+    invalidate('posts', f'post:{instance.post_id}')
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category(sender, instance, **kwargs):
+    invalidate('posts', 'categories')
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_author(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # every login saves last_login; nothing we render changes
+    invalidate('posts', 'authors')
@@ -0,0 +1,211 @@
+"""
+Write-behind view counting for posts.
+
+Detail reads call `record_view(post_id)`, which only bumps an in-memory
+counter. Increments are coalesced per post and written back periodically
+with one `UPDATE ... SET views = views + CASE id WHEN ... END` per batch
+(plus the matching trending score update, see blog/trending.py), so
+reads never queue behind the SQLite writer lock. Views buffered in a
+process that dies before its next flush are lost, so the loss is bounded
+by FLUSH_INTERVAL.
+
+Configured through `settings.VIEW_COUNTER`:
+
+    VIEW_COUNTER = {
+        'BACKEND': 'blog.counters.LocalViewBuffer',  # or RedisViewBuffer, or None
+        'OPTIONS': {},           # passed to the backend, e.g. {'url': 'redis://...'}
+        'FLUSH_INTERVAL': 5,     # seconds between background flushes; 0 disables the thread
+        'BATCH_SIZE': 500,       # posts per UPDATE statement
+    }
+"""
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BACKEND': 'blog.counters.LocalViewBuffer',
+    'OPTIONS': {},
+    'FLUSH_INTERVAL': 5,
+    'BATCH_SIZE': 500,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'VIEW_COUNTER', {})}
+
+
+# -----------------------------
+# BUFFERS
+# -----------------------------
+class LocalViewBuffer:
+    """Per-process buffer; each worker flushes its own increments"""
+
+    def __init__(self, **options):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, post_id, amount=1):
+        with self._lock:
+            self._counts[post_id] += amount
+
+    def drain(self):
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return dict(counts)
+
+    def restore(self, counts):
+        """Put back increments that could not be written"""
+        with self._lock:
+            self._counts.update(counts)
+
+
+class RedisViewBuffer:
+    """
+    Buffer shared by every worker through a Redis-compatible server.
+
+    Increments go into one hash with HINCRBY; draining atomically renames
+    the hash away so no increment is lost between read and delete.
+    """
+    key = 'blog:post-views'
+
+    def __init__(self, url='redis://localhost:6379/0', key=None):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("RedisViewBuffer requires the 'redis' package")
+        self.client = redis.Redis.from_url(url)
+        self.key = key or self.key
+        self.response_error = redis.ResponseError
+
+    def incr(self, post_id, amount=1):
+        self.client.hincrby(self.key, post_id, amount)
+
+    def drain(self):
+        draining = f'{self.key}:draining'
+        try:
+            self.client.rename(self.key, draining)
+        except self.response_error:
+            return {}  # nothing buffered: RENAME fails on a missing key
+        pipe = self.client.pipeline()
+        pipe.hgetall(draining)
+        pipe.delete(draining)
+        counts, _ = pipe.execute()
+        return {int(k): int(v) for k, v in counts.items()}
+
+    def restore(self, counts):
+        pipe = self.client.pipeline()
+        for post_id, amount in counts.items():
+            pipe.hincrby(self.key, post_id, amount)
+        pipe.execute()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+_flusher = None
+
+
+def get_view_buffer():
+    """Return the configured buffer, or None when view counting is disabled"""
+    global _buffer
+    if _buffer is None:
+        config = get_config()
+        if not config['BACKEND']:
+            return None
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = import_string(config['BACKEND'])(**config['OPTIONS'])
+    return _buffer
+
+
+@receiver(setting_changed)
+def reset_view_buffer(setting, **kwargs):
+    global _buffer
+    if setting == 'VIEW_COUNTER':
+        _buffer = None
+
+
+# -----------------------------
+# RECORD / FLUSH
+# -----------------------------
+def record_view(post_id):
+    buffer = get_view_buffer()
+    if buffer is None:
+        return
+    buffer.incr(post_id)
+    ensure_flusher()
+
+
+def flush_views(buffer=None, batch_size=None):
+    """Write buffered increments to Post.views; returns the number of posts updated"""
+    from .models import Post
+    from .trending import adjust, get_config as trending_config
+
+    buffer = buffer or get_view_buffer()
+    if buffer is None:
+        return 0
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    pending = buffer.drain()
+    items = list(pending.items())
+    written = 0
+    try:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            delta = Case(
+                *[When(pk=post_id, then=Value(amount)) for post_id, amount in batch],
+                default=Value(0),
+                output_field=PositiveIntegerField(),
+            )
+            view_weight = trending_config()['WEIGHTS']['views']
+            with transaction.atomic():
+                Post.objects.filter(pk__in=[post_id for post_id, _ in batch]).update(views=F('views') + delta)
+                adjust({post_id: amount * view_weight for post_id, amount in batch})
+            written += len(batch)
+    except Exception:
+        buffer.restore(dict(items[written:]))
+        raise
+    return written
+
+
+class ViewFlusher(threading.Thread):
+    """Daemon thread that flushes the buffer every `interval` seconds"""
+
+    def __init__(self, interval):
+        super().__init__(name='view-flusher', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        try:
+            flush_views()
+        except Exception:
+            logger.exception("Flushing post views failed; increments kept for the next run")
+        finally:
+            close_old_connections()
+
+
+def ensure_flusher():
+    """Start the flusher lazily, so forked workers each get their own thread"""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    interval = get_config()['FLUSH_INTERVAL']
+    if not interval:
+        return
+    with _buffer_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = ViewFlusher(interval)
+            _flusher.start()
@@ -0,0 +1,209 @@
+"""
+Denormalized counters, kept current by signal handlers.
+
+    Post.comment_count   comments on the post
+    Post.likes           users in Post.liked_by
+    Post.save_count      users in Post.saved_by
+    User.post_count      posts by the user
+    User.total_likes     sum of Post.likes over the user's posts
+    User.follower_count  Follow rows pointing at the user
+    User.following_count Follow rows from the user
+
+Every change is a single `UPDATE ... SET col = col + delta` issued in the
+same transaction as the row change that caused it, so concurrent writers
+never lose increments. Paths that skip signals (bulk_create, raw SQL,
+QuerySet.update) can still drift; `manage.py recount` repairs every
+counter with set-based UPDATEs (see `recount()`).
+
+Likes and saves live in auto-created through tables, which never send
+post_save/post_delete, so all changes arrive through m2m_changed.
+`toggle_relation` in views.py writes the through table directly and
+sends the matching m2m_changed itself; so does deleting a user, whose
+links go with the cascade.
+"""
+from collections import Counter
+
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import Comment, Follow, Post, PostTag, Tag, User
+
+
+def bump(model, field, deltas):
+    """Add `deltas` ({pk: n}) to `field` in one UPDATE, never going below zero"""
+    deltas = {pk: n for pk, n in deltas.items() if n}
+    if not deltas:
+        return
+    if len(set(deltas.values())) == 1:
+        delta = Value(next(iter(deltas.values())))
+    else:
+        delta = Case(*[When(pk=pk, then=Value(n)) for pk, n in deltas.items()],
+                     default=Value(0), output_field=IntegerField())
+    model.objects.filter(pk__in=deltas).update(**{field: Greatest(F(field) + delta, Value(0))})
+
+
+def deleted_with(origin, model):
+    """True when a delete cascades from `model` rows, which take these counters along"""
+    return isinstance(origin, model) or getattr(origin, 'model', None) is model
+
+
+# -----------------------------
+# COMMENTS / POSTS
+# -----------------------------
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(Post, 'comment_count', {instance.post_id: 1})
+
+
+@receiver(post_delete, sender=Comment)
+def count_removed_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, Post):
+        bump(Post, 'comment_count', {instance.post_id: -1})
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(User, 'post_count', {instance.author_id: 1})
+
+
+@receiver(pre_delete, sender=Post)
+def count_removed_post(sender, instance, origin=None, **kwargs):
+    if deleted_with(origin, User):
+        return
+    # Read likes in the UPDATE itself; the instance may be stale
+    likes = Post.objects.filter(pk=instance.pk).values('likes')
+    User.objects.filter(pk=instance.author_id).update(
+        post_count=Greatest(F('post_count') - 1, Value(0)),
+        total_likes=Greatest(F('total_likes') - Subquery(likes), Value(0)),
+    )
+
+
+# -----------------------------
+# FOLLOWS
+# -----------------------------
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        bump(User, 'follower_count', {instance.followee_id: 1})
+        bump(User, 'following_count', {instance.follower_id: 1})
+
+
+@receiver(post_delete, sender=Follow)
+def count_removed_follow(sender, instance, **kwargs):
+    # Also on cascades from either user: the other side's count must drop
+    bump(User, 'follower_count', {instance.followee_id: -1})
+    bump(User, 'following_count', {instance.follower_id: -1})
+
+
+# -----------------------------
+# LIKES / SAVES
+# -----------------------------
+def relation_deltas(instance, reverse, pk_set, sign):
+    """{post_id: delta} for a liked_by/saved_by change"""
+    if not reverse:
+        return {instance.pk: sign * len(pk_set)}
+    return {post_id: sign for post_id in pk_set}
+
+
+def existing(through, instance, reverse, pk_set=None):
+    """The pks on the other side that `instance` is currently linked to"""
+    mine, theirs = ('user_id', 'post_id') if reverse else ('post_id', 'user_id')
+    rows = through.objects.filter(**{mine: instance.pk})
+    if pk_set is not None:
+        rows = rows.filter(**{f'{theirs}__in': pk_set})
+    return set(rows.values_list(theirs, flat=True))
+
+
+def count_relation(through, field, action, instance, reverse, pk_set):
+    if action == 'pre_remove':
+        # pk_set is what the caller asked to remove, members or not. Narrow
+        # it in place: the same set reaches the DELETE and post_remove, all
+        # inside the remove()'s transaction.
+        pk_set.intersection_update(existing(through, instance, reverse, pk_set))
+        return
+    if action == 'pre_clear':
+        pk_set, sign = existing(through, instance, reverse), -1
+    elif action == 'post_add':
+        sign = 1
+    elif action == 'post_remove':
+        sign = -1
+    else:
+        return
+    if not pk_set:
+        return
+    deltas = relation_deltas(instance, reverse, pk_set, sign)
+    bump(Post, field, deltas)
+    if field == 'likes':
+        authors = Counter()
+        for post_id, author_id in Post.objects.filter(pk__in=deltas).values_list('pk', 'author_id'):
+            authors[author_id] += deltas[post_id]
+        bump(User, 'total_likes', authors)
+
+
+@receiver(m2m_changed, sender=Post.liked_by.through)
+def count_likes(sender, action, instance, reverse, pk_set, **kwargs):
+    count_relation(sender, 'likes', action, instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Post.saved_by.through)
+def count_saves(sender, action, instance, reverse, pk_set, **kwargs):
+    count_relation(sender, 'save_count', action, instance, reverse, pk_set)
+
+
+@receiver(pre_delete, sender=User)
+def clear_removed_user_relations(sender, instance, using, **kwargs):
+    # The user's like/save rows are fast-deleted by the cascade without any
+    # m2m_changed; announce them as a clear so counters and trending follow
+    for through in (Post.liked_by.through, Post.saved_by.through):
+        m2m_changed.send(sender=through, instance=instance, action='pre_clear', reverse=True,
+                         model=Post, pk_set=None, using=using)
+
+
+# -----------------------------
+# REPAIR
+# -----------------------------
+def correlated_count(queryset, column):
+    return Coalesce(Subquery(
+        queryset.filter(**{column: OuterRef('pk')}).order_by().values(column)
+        .annotate(n=Count('*')).values('n')
+    ), 0)
+
+
+def repair(queryset, **truth):
+    """UPDATE only the rows whose counters differ from `truth`; returns how many"""
+    annotated = queryset.annotate(**{f'true_{name}': value for name, value in truth.items()})
+    drifted = Q()
+    for name in truth:
+        drifted |= ~Q(**{name: F(f'true_{name}')})
+    return queryset.filter(pk__in=annotated.filter(drifted).values('pk')).update(**truth)
+
+
+def recount():
+    """Recompute every denormalized counter; returns {table: rows fixed}"""
+    liked, saved = Post.liked_by.through.objects, Post.saved_by.through.objects
+    fixed = {
+        'post': repair(
+            Post.objects.all(),
+            comment_count=correlated_count(Comment.objects, 'post'),
+            likes=correlated_count(liked, 'post'),
+            save_count=correlated_count(saved, 'post'),
+        ),
+        'tag': repair(Tag.objects.all(), post_count=correlated_count(PostTag.objects, 'tag')),
+    }
+    # Users last: total_likes sums the Post.likes just repaired
+    total_likes = Coalesce(Subquery(
+        Post.objects.filter(author=OuterRef('pk')).order_by().values('author')
+        .annotate(n=Sum('likes')).values('n')
+    ), 0)
+    fixed['user'] = repair(
+        User.objects.all(),
+        post_count=correlated_count(Post.objects, 'author'),
+        total_likes=total_likes,
+        follower_count=correlated_count(Follow.objects, 'followee'),
+        following_count=correlated_count(Follow.objects, 'follower'),
+    )
+    return fixed
@@ -0,0 +1,194 @@
+"""
+The "following" feed: posts by the authors a user follows, newest first.
+
+Two strategies, plus a hybrid, chosen by `settings.FEED['MODE']`:
+
+'push'    Fan-out-on-write. Creating a post inserts one FeedEntry per
+          follower with a single INSERT ... SELECT over the followee
+          index; reading a feed is a keyset range scan of the reader's
+          inbox. Writes cost one row per follower.
+'pull'    Fan-out-on-read. Nothing is written; the feed is one query over
+          the followed authors' timelines (`post_author_created_idx`),
+          cut at the cursor and merged by (created_at, id). Reads cost
+          grows with the number of followees.
+'hybrid'  Push for authors with fewer than CELEBRITY_FOLLOWERS followers,
+          pull for the rest: a read merges the inbox with the timelines of
+          the few celebrities the reader follows.
+
+Inboxes are bounded: every fan-out trims a random 1/TRIM_EVERY of the
+inboxes it wrote to back to INBOX_SIZE entries, so an inbox runs over the
+cap by about TRIM_EVERY entries at most, on average, at a fraction of the
+cost of trimming every inbox on every post. Following an author copies
+their latest posts into the inbox; unfollowing removes them. Deleted
+posts take their entries with them.
+
+Switching a running site to 'push' only fans out posts created after the
+switch. An author crossing CELEBRITY_FOLLOWERS downwards is only fanned
+out for new posts as well.
+
+    FEED = {
+        'MODE': 'hybrid',             # or 'push', 'pull'
+        'INBOX_SIZE': 500,            # entries kept per inbox
+        'CELEBRITY_FOLLOWERS': 10000, # hybrid: pull authors with this many followers
+        'TRIM_EVERY': 20,             # a fan-out trims ~1/TRIM_EVERY of its inboxes
+    }
+"""
+import random
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import Mod, RowNumber
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FeedEntry, Follow, Post, User
+from .serializers import LIST_COLUMNS, LIST_RELATIONS
+
+PUSH = 'push'
+PULL = 'pull'
+HYBRID = 'hybrid'
+
+DEFAULTS = {
+    'MODE': HYBRID,
+    'INBOX_SIZE': 500,
+    'CELEBRITY_FOLLOWERS': 10000,
+    'TRIM_EVERY': 20,
+}
+
+# Rows written by fan-out in this process, for benchmarks and ad-hoc inspection
+stats = {'fanned_out': 0, 'trimmed': 0}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'FEED', {})}
+
+
+def is_pushed(author_id, config=None):
+    """Whether the author's posts are fanned out on write under the current mode"""
+    config = config or get_config()
+    if config['MODE'] == HYBRID:
+        return User.objects.filter(pk=author_id, follower_count__lt=config['CELEBRITY_FOLLOWERS']).exists()
+    return config['MODE'] == PUSH
+
+
+# -----------------------------
+# FAN-OUT ON WRITE
+# -----------------------------
+def fan_out(post_ids):
+    """Deliver posts to their authors' followers' inboxes; returns the rows written"""
+    config = get_config()
+    if config['MODE'] == PULL:
+        return 0
+    if config['MODE'] == HYBRID:
+        # Decided up front, so a celebrity's post never walks its follower index
+        post_ids = list(
+            Post.objects.filter(pk__in=post_ids, author__follower_count__lt=config['CELEBRITY_FOLLOWERS'])
+            .values_list('pk', flat=True)
+        )
+    if not post_ids:
+        return 0
+    entry, follow, post = FeedEntry._meta.db_table, Follow._meta.db_table, Post._meta.db_table
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    sql = (
+        f"INSERT INTO {entry} (user_id, post_id, author_id, created_at) "
+        f"SELECT f.follower_id, p.id, p.author_id, p.created_at FROM {post} p "
+        f"JOIN {follow} f ON f.followee_id = p.author_id WHERE p.id IN ({placeholders})"
+    )
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, post_ids)
+        written = cursor.rowcount
+        if written:
+            stats['fanned_out'] += written
+            authors = Post.objects.filter(pk__in=post_ids).values('author_id')
+            trim_every = config['TRIM_EVERY']
+            sampled = (
+                Follow.objects.filter(followee_id__in=authors)
+                .alias(bucket=Mod('follower_id', trim_every)).filter(bucket=random.randrange(trim_every))
+                .values('follower_id')
+            )
+            trim(sampled, config['INBOX_SIZE'])
+    return written
+
+
+def trim(users, size):
+    """Cut the inboxes of `users` (ids or a subquery) to their newest `size` entries"""
+    ranked = (
+        FeedEntry.objects.filter(user_id__in=users)
+        .annotate(rank=Window(RowNumber(), partition_by=[F('user_id')],
+                              order_by=[F('created_at').desc(), F('post_id').desc()]))
+        .filter(rank__gt=size)
+        .values('pk')
+    )
+    deleted, _ = FeedEntry.objects.filter(pk__in=ranked).delete()
+    stats['trimmed'] += deleted
+    return deleted
+
+
+def backfill(follower_id, followee_id):
+    """Copy a newly followed author's latest posts into the follower's inbox"""
+    config = get_config()
+    if not is_pushed(followee_id, config):
+        return
+    posts = Post.objects.filter(author_id=followee_id).order_by('-created_at', '-id')[:config['INBOX_SIZE']]
+    FeedEntry.objects.bulk_create(
+        FeedEntry(user_id=follower_id, post_id=post_id, author_id=followee_id, created_at=created_at)
+        for post_id, created_at in posts.values_list('id', 'created_at')
+    )
+    trim([follower_id], config['INBOX_SIZE'])
+
+
+@receiver(post_save, sender=Post)
+def fan_out_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fan_out([instance.pk])
+
+
+@receiver(post_save, sender=Follow)
+def fill_inbox(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        backfill(instance.follower_id, instance.followee_id)
+
+
+@receiver(post_delete, sender=Follow)
+def empty_inbox(sender, instance, **kwargs):
+    FeedEntry.objects.filter(user_id=instance.follower_id, author_id=instance.followee_id).delete()
+
+
+# -----------------------------
+# READ
+# -----------------------------
+def list_columns(prefix=''):
+    """PostListSerializer's columns, optionally under a relation"""
+    return [prefix + name for name in LIST_COLUMNS]
+
+
+def list_relations(prefix=''):
+    return [prefix + name for name in LIST_RELATIONS]
+
+
+def timeline(authors):
+    """Posts by `authors` (a subquery), along `post_author_created_idx`"""
+    posts = Post.objects.filter(author_id__in=authors).select_related(*list_relations()).only(*list_columns())
+    return posts, ('-created_at', '-id'), lambda post: post
+
+
+def inbox(user):
+    entries = (
+        FeedEntry.objects.filter(user_id=user.pk)
+        .select_related(*list_relations('post__'))
+        .only('created_at', 'post_id', *list_columns('post__'))
+    )
+    return entries, ('-created_at', '-post_id'), lambda entry: entry.post
+
+
+def feed_sources(user):
+    """`FeedPagination.paginate_sources` input for `user`'s feed under the current mode"""
+    config = get_config()
+    followees = Follow.objects.filter(follower_id=user.pk)
+    if config['MODE'] == PULL:
+        return [timeline(followees.values('followee_id'))]
+    if config['MODE'] == PUSH:
+        return [inbox(user)]
+    celebrities = followees.filter(followee__follower_count__gte=config['CELEBRITY_FOLLOWERS'])
+    return [inbox(user), timeline(celebrities.values('followee_id'))]
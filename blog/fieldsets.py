@@ -0,0 +1,81 @@
+"""
+Sparse fieldsets (`?fields=`) and expansion control (`?expand=`).
+
+    /api/posts/?fields=id,title
+    /api/posts/12/?fields=id,title,author&expand=author
+    /api/posts/12/?expand=            nothing expanded
+
+`fields` names the top-level fields to render; `expand` names which of
+the serializer's `Meta.expandable` relations to nest. A relation left
+unexpanded renders as its primary key, or not at all for to-many ones
+(a post's comments). Without `expand` every expandable relation is
+nested, as before these parameters existed.
+
+The narrowing reaches the database: `narrow()` derives `.only()` and
+`select_related()` from the fields the trimmed serializer still has, so an
+unrequested relation costs no join and no extra query, and unrequested
+columns (a post's `content`) are never read.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse(request, param, allowed):
+    """The names in `?param=a,b` (None when absent), all of which must be in `allowed`"""
+    if param not in request.query_params:
+        return None
+    names = [name.strip() for name in request.query_params[param].split(',') if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValidationError({param: [f"Unknown: {', '.join(unknown)}. Choose from: {', '.join(allowed)}."]})
+    return names
+
+
+def sparse_options(request, serializer_class):
+    """Keyword arguments for SparseFieldsMixin serializers, from the query string"""
+    options = {}
+    fields = parse(request, FIELDS_PARAM, list(serializer_class.Meta.fields))
+    if fields is not None:
+        options['fields'] = fields
+    expandable = getattr(serializer_class.Meta, 'expandable', ())
+    if expandable:
+        expand = parse(request, EXPAND_PARAM, list(expandable))
+        if expand is not None:
+            options['expand'] = expand
+    return options
+
+
+def columns(serializer, prefix=''):
+    """(only() columns, select_related() paths) for what `serializer` renders"""
+    only, related = [], []
+    method_columns = getattr(serializer.Meta, 'method_columns', {})
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            only += [prefix + column for column in method_columns.get(name, ())]
+            continue
+        if isinstance(field, serializers.ListSerializer) or field.source == '*':
+            continue  # to-many relations are loaded by the view
+        path = prefix + '__'.join(field.source_attrs)
+        if isinstance(field, serializers.BaseSerializer):
+            related.append(path)
+            nested_only, nested_related = columns(field, prefix=path + '__')
+            only += nested_only
+            related += nested_related
+            continue
+        only.append(path)
+        if len(field.source_attrs) > 1:
+            related.append(prefix + '__'.join(field.source_attrs[:-1]))
+    return only, related
+
+
+def narrow(queryset, serializer, keep=()):
+    """`queryset` reduced to the columns and joins `serializer` needs, plus `keep`"""
+    only, related = columns(serializer)
+    if related:  # select_related() without arguments would follow every non-null foreign key
+        queryset = queryset.select_related(*dict.fromkeys(related))
+    return queryset.only(*dict.fromkeys([*only, *keep]))
@@ -0,0 +1,248 @@
+"""
+Image uploads for Post.image_asset and User.avatar_asset.
+
+POST /api/images/ validates the upload with Pillow (format, byte and
+pixel limits), stores the original under MEDIA_ROOT and answers at once
+with an ImageAsset in the 'pending' state. Resizing happens off the
+request path: once the upload's transaction commits, the original is
+handed to a process pool (blog/imaging.py), which writes one variant per
+(format, width) and reports back; the asset then turns 'ready' and its
+`variants` map gains the variant URLs and `srcset` strings.
+
+Every stored file is named after its content, so media URLs never change
+meaning and can be served with `Cache-Control: immutable`. Uploading the
+same bytes twice returns the existing asset.
+
+    IMAGES = {
+        'WIDTHS': [320, 640, 1280],          # variant widths, never upscaled
+        'FORMATS': ['webp', 'jpeg'],
+        'QUALITY': {'webp': 80, 'jpeg': 82},
+        'MAX_BYTES': 10 * 1024 * 1024,
+        'MAX_PIXELS': 40_000_000,
+        'WORKERS': 2,                        # pool processes; 0 resizes inline
+        'PREFIX': 'images',                  # under MEDIA_ROOT / MEDIA_URL
+        'SERVE': DEBUG,                      # serve PREFIX from Django, with immutable caching
+    }
+
+Assets left 'pending' by a process that died mid-resize are picked up by
+`manage.py process_images`.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import IntegrityError, connection, transaction
+from django.dispatch import receiver
+from PIL import Image
+
+from . import imaging
+from .caching import invalidate
+from .models import ImageAsset
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': {'webp': 80, 'jpeg': 82},
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'WORKERS': 2,
+    'PREFIX': 'images',
+    'SERVE': None,  # None: follow DEBUG
+}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'IMAGES', {})}
+    if config['SERVE'] is None:
+        config['SERVE'] = settings.DEBUG
+    return config
+
+
+def media_url(name):
+    return f"{settings.MEDIA_URL}{name}"
+
+
+def variant_map(original, width, height, names=None):
+    """What ImageAsset.variants holds: URLs by format and width, plus srcset strings"""
+    data = {'original': media_url(original), 'width': width, 'height': height, 'srcset': {}}
+    for fmt, by_width in (names or {}).items():
+        urls = {str(w): media_url(name) for w, name in sorted(by_width.items())}
+        data[fmt] = urls
+        data['srcset'][fmt] = ', '.join(f"{url} {w}w" for w, url in urls.items())
+    return data
+
+
+# -----------------------------
+# UPLOAD
+# -----------------------------
+Upload = namedtuple('Upload', 'data format width height')
+
+
+def probe(data, config=None):
+    """
+    Check that `data` is an image we accept; returns an Upload.
+    Raises ValueError with a user-facing message otherwise.
+    """
+    config = config or get_config()
+    if len(data) > config['MAX_BYTES']:
+        raise ValueError(f"Images may not exceed {config['MAX_BYTES']} bytes.")
+    invalid = ValueError("Upload a valid image.")
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            fmt, (width, height) = image.format, image.size
+    except (OSError, Image.DecompressionBombError):
+        raise invalid
+    if fmt not in imaging.UPLOAD_FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}.")
+    # Before anything is decoded: a small file can declare a huge canvas
+    if width * height > config['MAX_PIXELS']:
+        raise ValueError(f"Images may not exceed {config['MAX_PIXELS']} pixels.")
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+        with Image.open(io.BytesIO(data)) as image:  # verify() leaves the image unusable
+            width, height = imaging.oriented_size(image)
+    except (OSError, SyntaxError, ValueError):
+        raise invalid
+    return Upload(data, fmt, width, height)
+
+
+def store_upload(upload, user):
+    """
+    Store an Upload from `probe` and schedule its variants; returns
+    (asset, created). Known content returns the existing asset.
+    """
+    config = get_config()
+    data, fmt, width, height = upload
+    digest = hashlib.sha256(data).hexdigest()
+    asset = ImageAsset.objects.filter(digest=digest).first()
+    if asset is not None:
+        return asset, False
+    original = imaging.content_name(f"{config['PREFIX']}/originals", data, imaging.UPLOAD_FORMATS[fmt])
+    imaging.write_once(settings.MEDIA_ROOT, original, data)
+    try:
+        with transaction.atomic():
+            asset = ImageAsset.objects.create(
+                digest=digest, original=original, width=width, height=height, size=len(data),
+                variants=variant_map(original, width, height), uploaded_by=user,
+            )
+    except IntegrityError:
+        # The same bytes, uploaded concurrently
+        return ImageAsset.objects.get(digest=digest), False
+    transaction.on_commit(partial(schedule, asset.pk, original))
+    return asset, True
+
+
+# -----------------------------
+# RESIZING
+# -----------------------------
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = set()
+
+
+def get_executor(workers):
+    """The shared process pool; spawned, so workers never inherit Django state"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+@receiver(setting_changed)
+def reset_executor(setting, **kwargs):
+    if setting == 'IMAGES':
+        shutdown()
+
+
+def resize_args(original, config):
+    root = str(settings.MEDIA_ROOT)
+    return (
+        os.path.join(root, original), root,
+        config['PREFIX'], config['WIDTHS'], config['FORMATS'], config['QUALITY'],
+    )
+
+
+def resize(asset_id, original, config):
+    """Resize in this process and record the result"""
+    try:
+        names = imaging.make_variants(*resize_args(original, config))
+    except Exception:
+        logger.exception("Resizing image asset %s failed", asset_id)
+        names = None
+    finish(asset_id, names)
+
+
+def schedule(asset_id, original):
+    """Resize in the pool, or right here when WORKERS is 0"""
+    config = get_config()
+    if not config['WORKERS']:
+        resize(asset_id, original, config)
+        return
+    future = get_executor(config['WORKERS']).submit(imaging.make_variants, *resize_args(original, config))
+    _in_flight.add(future)
+    future.add_done_callback(partial(collect, asset_id))
+
+
+def collect(asset_id, future):
+    """Done-callback of a pool job; runs on the executor's management thread"""
+    try:
+        try:
+            names = future.result()
+        except Exception:
+            logger.exception("Resizing image asset %s failed", asset_id)
+            names = None
+        finish(asset_id, names)
+    finally:
+        connection.close()  # this thread's own connection
+        _in_flight.discard(future)
+
+
+def finish(asset_id, names):
+    """Record a resize result (None: failed) and drop the responses showing the asset"""
+    asset = ImageAsset.objects.filter(pk=asset_id).only('original', 'width', 'height').first()
+    if asset is None:
+        return
+    if names is None:
+        ImageAsset.objects.filter(pk=asset_id).update(status=ImageAsset.FAILED)
+        return
+    ImageAsset.objects.filter(pk=asset_id).update(
+        status=ImageAsset.READY, variants=variant_map(asset.original, asset.width, asset.height, names),
+    )
+    invalidate('posts', 'authors')  # posts are rendered with their image, authors with their avatar
+
+
+def wait():
+    """Block until every submitted resize has been recorded (tests, benchmarks)"""
+    while _in_flight:
+        time.sleep(0.001)
+
+
+def process_pending(include_failed=False):
+    """Resize assets still pending (or failed) in this process; returns how many were processed"""
+    config = get_config()
+    statuses = [ImageAsset.PENDING] + ([ImageAsset.FAILED] if include_failed else [])
+    pending = list(ImageAsset.objects.filter(status__in=statuses).values_list('pk', 'original'))
+    for asset_id, original in pending:
+        resize(asset_id, original, config)
+    return len(pending)
@@ -0,0 +1,98 @@
+"""
+Resized variants of uploaded images, with Pillow.
+
+Nothing here imports Django: `make_variants` runs in the worker processes
+of blog/images.py, which are spawned without a configured Django. It
+reads one original, writes every (format, width) variant and returns
+their storage names, relative to the media root.
+
+Variant names are derived from their own bytes
+(`<prefix>/<aa>/<sha256[:32]>.<ext>`), so a URL always denotes the same
+content and can be cached forever; re-encoding with other settings yields
+new names instead of overwriting old ones.
+"""
+import hashlib
+import io
+import os
+import tempfile
+
+from PIL import Image, ImageOps
+
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+UPLOAD_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+ORIENTATION = 0x0112  # EXIF tag
+
+
+def content_name(prefix, data, extension):
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return f"{prefix}/{digest[:2]}/{digest}.{extension}"
+
+
+def write_once(root, name, data):
+    """Write `data` under `root/name` unless it exists; atomic via rename"""
+    path = os.path.join(root, name)
+    if os.path.exists(path):
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def encode(image, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        if image.mode == 'RGBA':
+            # JPEG has no alpha: flatten onto white rather than whatever the transparent pixels hold
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, 'WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def oriented_size(image):
+    """(width, height) as displayed, after the EXIF orientation is applied"""
+    if image.getexif().get(ORIENTATION) in (5, 6, 7, 8):
+        return image.height, image.width
+    return image.size
+
+
+def make_variants(source, root, prefix, widths, formats, quality):
+    """
+    Write the variants of the image at `source` under `root`; returns
+    `{format: {width: name}}`. Widths at or above the original's are
+    skipped: never upscale.
+    """
+    variants = {fmt: {} for fmt in formats}
+    with Image.open(source) as image:
+        width, height = oriented_size(image)
+        wanted = sorted((w for w in set(widths) if w < width), reverse=True)
+        if not wanted:
+            return variants
+        if image.format == 'JPEG':
+            # Decode at a reduced scale straight from the DCT coefficients
+            scale = wanted[0] / width
+            image.draft('RGB', (round(image.width * scale), round(image.height * scale)))
+        current = ImageOps.exif_transpose(image)
+        if current.mode not in ('RGB', 'RGBA'):
+            # Palette and 1-bit images would only resample with NEAREST
+            current = current.convert('RGBA' if 'transparency' in current.info or 'A' in current.getbands() else 'RGB')
+        # Largest first, each resized from the previous: less work per step
+        for target in wanted:
+            current = current.resize((target, max(1, round(height * target / width))), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                data = encode(current, fmt, quality[fmt])
+                name = content_name(prefix, data, EXTENSIONS[fmt])
+                write_once(root, name, data)
+                variants[fmt][target] = name
+    return variants
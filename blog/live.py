@@ -0,0 +1,210 @@
+"""
+Live like counts and new comments as server-sent events.
+
+    GET /api/async/posts/{id}/events/
+
+    event: likes
+    data: {"post":12,"likes":41}
+
+    event: comment
+    data: {"post":12,"id":903,"author":4,"author_username":"ana","text":"...","created_at":"..."}
+
+A stream opens with a `likes` event carrying the current count. After
+that it carries whatever the like and comment endpoints publish once
+their transaction commits: PostViewSet.like and .comment, the async like
+toggle and /api/batch/. Clients keep the post they rendered and apply
+events to it instead of polling /api/posts/{id}/.
+
+The broker is in-process, one channel per post. Streams live on the
+ASGI server's event loop (blog_api/asgi.py). Writes publish from worker
+threads, so delivery hops onto the loop with `call_soon_threadsafe`.
+Each event is encoded once, however many streams receive it. Publishing
+to a post nobody watches is a dict lookup.
+
+Each stream holds at most:
+
+    likes      one pending event; a newer count replaces an unsent one
+               (coalescing)
+    comments   LIVE['MAX_PENDING'] pending events
+
+A stream that falls further behind, e.g. a client that stopped reading
+while its socket buffer filled up, drops its pending comments and is sent
+one `resync` event instead, telling it to refetch the post. That
+backpressure bounds memory per stream and never slows down a publisher.
+Idle streams get a comment line every LIVE['KEEPALIVE'] seconds, so
+proxies keep them open.
+
+Like ByteLRUCache, this only reaches streams served by the process that
+handled the write. Run one ASGI worker, or put a shared bus such as
+Redis pub/sub behind `publish`.
+"""
+import asyncio
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Post
+from .renderers import FastJSONRenderer
+from .serializers import PostCommentSerializer
+
+DEFAULTS = {
+    'MAX_PENDING': 100,  # comments buffered per stream before it is told to resync
+    'KEEPALIVE': 15,  # seconds between keepalive comments on an idle stream
+    'RETRY': 3000,  # reconnect delay suggested to EventSource clients, ms
+}
+RESYNC = b'event: resync\ndata: {}\n\n'
+KEEPALIVE = b': keepalive\n\n'
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LIVE', {})}
+
+
+def encode(kind, data):
+    return b'event: ' + kind.encode() + b'\ndata: ' + FastJSONRenderer().render(data) + b'\n\n'
+
+
+# -----------------------------
+# BROKER
+# -----------------------------
+class Subscriber:
+    """One stream's pending events; touched only on its event loop"""
+
+    def __init__(self, post_id, max_pending):
+        self.post_id = post_id
+        self.max_pending = max_pending
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.likes = None
+        self.comments = deque()
+        self.overflowed = False
+        self.dropped = 0
+
+    def push(self, kind, payload):
+        if kind == 'likes':
+            self.likes = payload
+        elif self.overflowed:
+            self.dropped += 1  # the resync refetch will include it
+        elif len(self.comments) >= self.max_pending:
+            self.dropped += len(self.comments) + 1
+            self.comments.clear()
+            self.overflowed = True
+        else:
+            self.comments.append(payload)
+        self.wakeup.set()
+
+    def keepalive(self):
+        self.wakeup.set()  # drain() finds nothing and sends a keepalive
+
+    def drain(self):
+        """Pending events as one chunk, oldest first; a keepalive when there are none"""
+        parts = [RESYNC] if self.overflowed else list(self.comments)
+        if self.likes is not None:
+            parts.append(self.likes)
+        self.comments.clear()
+        self.likes, self.overflowed = None, False
+        self.wakeup.clear()
+        return b''.join(parts) or KEEPALIVE
+
+
+class Broker:
+    """Per-post channels of subscribers, publishable from any thread"""
+
+    def __init__(self):
+        self.channels = {}  # post_id -> set of Subscriber
+        self.lock = threading.Lock()
+
+    def subscribe(self, post_id, max_pending=None):
+        subscriber = Subscriber(post_id, max_pending or get_config()['MAX_PENDING'])
+        with self.lock:
+            self.channels.setdefault(post_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            channel = self.channels.get(subscriber.post_id)
+            if channel is not None:
+                channel.discard(subscriber)
+                if not channel:
+                    del self.channels[subscriber.post_id]
+
+    def listening(self, post_id):
+        return post_id in self.channels
+
+    def subscriber_count(self):
+        with self.lock:
+            return sum(len(channel) for channel in self.channels.values())
+
+    def publish(self, post_id, kind, data):
+        """Queue an event on every stream of `post_id`; returns how many there are"""
+        if post_id not in self.channels:
+            return 0
+        with self.lock:
+            subscribers = list(self.channels.get(post_id, ()))
+        if not subscribers:
+            return 0
+        payload = encode(kind, data)
+        by_loop = {}
+        for subscriber in subscribers:
+            by_loop.setdefault(subscriber.loop, []).append(subscriber)
+        for loop, group in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver, group, kind, payload)
+            except RuntimeError:
+                pass  # loop closed; its streams are gone
+        return len(subscribers)
+
+
+def deliver(subscribers, kind, payload):
+    for subscriber in subscribers:
+        subscriber.push(kind, payload)
+
+
+broker = Broker()
+
+
+# -----------------------------
+# PUBLISHING
+# -----------------------------
+def publish_likes(post_id, likes):
+    """Send `post_id`'s like count to its streams once the transaction commits"""
+    transaction.on_commit(lambda: broker.publish(post_id, 'likes', {'post': post_id, 'likes': likes}))
+
+
+def publish_comments(comments):
+    """Send new comments to their posts' streams once the transaction commits"""
+    def send():
+        for comment in comments:
+            if broker.listening(comment.post_id):
+                data = {'post': comment.post_id, **PostCommentSerializer(comment).data}
+                broker.publish(comment.post_id, 'comment', data)
+    transaction.on_commit(send)
+
+
+# -----------------------------
+# STREAM
+# -----------------------------
+async def stream(post_id):
+    """SSE body for `post_id`: the current like count, then live events"""
+    config = get_config()
+    subscriber = broker.subscribe(post_id)
+    try:
+        # Read after subscribing, so no count committed in between is missed
+        try:
+            likes = await Post.objects.values_list('likes', flat=True).aget(pk=post_id)
+        except Post.DoesNotExist:
+            return
+        yield f"retry: {config['RETRY']}\n\n".encode() + encode('likes', {'post': post_id, 'likes': likes})
+        while True:
+            # A timer handle rather than wait_for(): no task per wait, which
+            # adds up with thousands of idle streams
+            timer = subscriber.loop.call_later(config['KEEPALIVE'], subscriber.keepalive)
+            try:
+                await subscriber.wakeup.wait()
+            finally:
+                timer.cancel()
+            yield subscriber.drain()
+    finally:
+        broker.unsubscribe(subscriber)
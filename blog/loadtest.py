@@ -0,0 +1,373 @@
+"""
+Load generation for `manage.py loadtest`.
+
+A run has three parts:
+
+Dataset   `seed()` bulk-inserts users, categories, tags, posts, comments
+          and likes, then repairs the denormalized counters, trending scores
+          and search index the way a real write path would have left them.
+Workload  A list of `Operation`s: method, path template, weight and body.
+          `{post}`, `{tag}` and `{word}` in paths and bodies are filled
+          from the dataset per request. DEFAULT_MIX approximates a read-
+          heavy blog; a JSONL file of operations (one per line,
+          `{"method": "GET", "path": "/api/posts/{post}/", "weight": 5}`)
+          replaces it, either sampled by weight or replayed line by line.
+Target    Every worker process sends its share of requests either
+          in-process through Django's test client, which also counts the
+          queries behind each request, or over HTTP to a running server.
+
+`run_worker()` returns raw samples and `report()` merges the workers'
+samples into the JSON document the command prints, so runs on different
+commits can be diffed.
+"""
+import http.client
+import json
+import random
+import re
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from urllib.parse import quote, urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from .benchmarks import percentile
+from .denorm import recount
+from .models import Category, Comment, Post, PostTag, Tag, User
+from .search import rebuild_index
+from .trending import recompute as recompute_trending
+
+USER_PREFIX = 'load-user-'
+PASSWORD = 'load-password'
+WORDS = (
+    'django', 'python', 'sqlite', 'cache', 'query', 'index', 'async', 'server',
+    'latency', 'throughput', 'design', 'travel', 'coffee', 'music', 'garden', 'notes',
+)
+
+
+@dataclass
+class Operation:
+    name: str
+    method: str
+    path: str
+    weight: float = 1
+    auth: bool = False
+    body: dict = None
+
+
+DEFAULT_MIX = [
+    Operation('post-list', 'GET', '/api/posts/', 30),
+    Operation('post-list-tag', 'GET', '/api/posts/?tag={tag}', 5),
+    Operation('post-detail', 'GET', '/api/posts/{post}/', 25),
+    Operation('post-comments', 'GET', '/api/posts/{post}/comments/', 10),
+    Operation('post-trending', 'GET', '/api/posts/trending/', 5),
+    Operation('post-search', 'GET', '/api/posts/search/?q={word}', 4),
+    Operation('category-list', 'GET', '/api/categories/', 4),
+    Operation('tag-list', 'GET', '/api/tags/', 2),
+    Operation('post-saved', 'GET', '/api/posts/saved/', 3, auth=True),
+    Operation('post-like', 'POST', '/api/posts/{post}/like/', 8, auth=True),
+    Operation('post-comment', 'POST', '/api/posts/{post}/comment/', 5, auth=True,
+              body={'post': '{post}', 'text': "Load test comment about {word}"}),
+    Operation('post-create', 'POST', '/api/posts/', 1, auth=True,
+              body={'title': "Load test {word}", 'content': "Generated by manage.py loadtest", 'tags': ['{tag}']}),
+]
+
+
+def load_workload(lines):
+    """Operations from JSONL lines; raises ValueError naming the bad line"""
+    operations = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+            method = data.get('method', 'GET').upper()
+            operations.append(Operation(
+                name=data.get('name') or f"{method} {data['path']}",
+                method=method,
+                path=data['path'],
+                weight=float(data.get('weight', 1)),
+                auth=bool(data.get('auth', False)),
+                body=data.get('body'),
+            ))
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            raise ValueError(f"line {number}: {exc!r}") from None
+        if operations[-1].weight < 0:
+            raise ValueError(f"line {number}: negative weight")
+    if not operations:
+        raise ValueError("no operations")
+    return operations
+
+
+# -----------------------------
+# DATASET
+# -----------------------------
+def seed(users, posts, comments, likes, rng, batch_size=2000):
+    """
+    Grow the load users, posts and comments to the given counts with bulk
+    inserts, add `likes` random likes, and bring counters and search up to
+    date, with trending scores. Returns the resulting table sizes.
+    """
+    password = make_password(PASSWORD)  # hashed once, it is the slow part
+    with transaction.atomic():
+        start = User.objects.filter(username__startswith=USER_PREFIX).count()
+        User.objects.bulk_create(
+            (User(username=f"{USER_PREFIX}{i}", email=f"{USER_PREFIX}{i}@example.com", password=password)
+             for i in range(start, users)),
+            batch_size=batch_size,
+        )
+        Category.objects.bulk_create(
+            [Category(name=f"Category {i}") for i in range(10)], ignore_conflicts=True,
+        )
+        Tag.objects.bulk_create([Tag(name=word) for word in WORDS], ignore_conflicts=True)
+        user_ids = list(User.objects.filter(username__startswith=USER_PREFIX).values_list('id', flat=True))
+        category_ids = list(Category.objects.values_list('id', flat=True))
+        tag_ids = list(Tag.objects.filter(name__in=WORDS).values_list('id', flat=True))
+
+        start = Post.objects.filter(slug__startswith='load-post-').count()
+        for first in range(start, posts, batch_size):
+            created = Post.objects.bulk_create(
+                Post(
+                    author_id=rng.choice(user_ids), category_id=rng.choice(category_ids),
+                    title=f"Load post {i} {rng.choice(WORDS)}", slug=f"load-post-{i}",
+                    content=' '.join(rng.choices(WORDS, k=60)),
+                )
+                for i in range(first, min(first + batch_size, posts))
+            )
+            PostTag.objects.bulk_create(
+                (PostTag(post_id=post.pk, tag_id=tag_id) for post in created for tag_id in rng.sample(tag_ids, 2)),
+                ignore_conflicts=True,
+            )
+        post_ids = list(Post.objects.values_list('id', flat=True))
+
+        for first in range(Comment.objects.count(), comments, batch_size):
+            Comment.objects.bulk_create(
+                Comment(post_id=rng.choice(post_ids), author_id=rng.choice(user_ids),
+                        text=' '.join(rng.choices(WORDS, k=12)))
+                for _ in range(first, min(first + batch_size, comments))
+            )
+        through = Post.liked_by.through
+        through.objects.bulk_create(
+            (through(post_id=rng.choice(post_ids), user_id=rng.choice(user_ids)) for _ in range(likes)),
+            batch_size=batch_size, ignore_conflicts=True,
+        )
+        recount()
+        recompute_trending()
+    rebuild_index()
+    return dataset_size()
+
+
+def dataset_size():
+    return {
+        'users': User.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'likes': Post.liked_by.through.objects.count(),
+    }
+
+
+def dataset_keys(max_users):
+    """What workers need to fill templates: post ids, tags, and JWTs for the load users"""
+    from .views import CustomTokenObtainPairSerializer
+
+    users = User.objects.filter(username__startswith=USER_PREFIX).order_by('id')[:max_users]
+    return {
+        'post': list(Post.objects.values_list('id', flat=True)),
+        'tag': list(Tag.objects.values_list('name', flat=True)) or ['none'],
+        'word': list(WORDS),
+        'tokens': [str(CustomTokenObtainPairSerializer.get_token(user).access_token) for user in users],
+    }
+
+
+# -----------------------------
+# TARGETS
+# -----------------------------
+class InProcessTarget:
+    """Django's test client in this process; counts queries per request"""
+
+    def __init__(self):
+        from django.test import Client
+
+        self.client = Client()
+        self.queries = 0
+
+    def count(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def send(self, method, path, body, headers):
+        self.queries = 0
+        extra = {f"HTTP_{name.upper().replace('-', '_')}": value for name, value in headers.items()}
+        with connection.execute_wrapper(self.count):
+            if body is None:
+                response = self.client.generic(method, path, **extra)
+            else:
+                response = self.client.generic(method, path, json.dumps(body), 'application/json', **extra)
+            # Streaming bodies are only produced (and queried) once consumed
+            b''.join(response) if response.streaming else response.content
+        return response.status_code, self.queries
+
+    def close(self):
+        pass
+
+
+def connect(parts, timeout):
+    """An HTTP(S) connection to the host of the split URL `parts`"""
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    return connection_class(parts.netloc, timeout=timeout)
+
+
+class HTTPTarget:
+    """One keep-alive HTTP connection to a running server"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.prefix = parts.path.rstrip('/')
+        self.connection = connect(parts, timeout=30)
+
+    def send(self, method, path, body, headers):
+        headers = dict(headers)
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status, None
+        except (OSError, http.client.HTTPException):
+            self.connection.close()  # reconnects on the next request
+            return 0, None
+
+    def close(self):
+        self.connection.close()
+
+
+def server_query_totals(url):
+    """Summed (queries, requests) from the server's /metrics, or None if unreachable"""
+    parts = urlsplit(url)
+    conn = connect(parts, timeout=10)
+    try:
+        conn.request('GET', parts.path.rstrip('/') + '/metrics')
+        response = conn.getresponse()
+        text = response.read().decode()
+        if response.status != 200:
+            return None
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        conn.close()
+    totals = {'sum': 0.0, 'count': 0.0}
+    for match in re.finditer(r'^blog_db_queries_(sum|count)\{[^}]*\} (\S+)$', text, re.M):
+        totals[match[1]] += float(match[2])
+    return totals['sum'], totals['count']
+
+
+# -----------------------------
+# WORKERS
+# -----------------------------
+def fill(template, values):
+    if isinstance(template, str):
+        return template.format_map(values)
+    if isinstance(template, list):
+        return [fill(item, values) for item in template]
+    if isinstance(template, dict):
+        return {key: fill(item, values) for key, item in template.items()}
+    return template
+
+
+def new_samples():
+    return {'latencies': [], 'errors': 0, 'queries': 0, 'statuses': {}}
+
+
+def merge(into, samples):
+    into['latencies'] += samples['latencies']
+    into['errors'] += samples['errors']
+    into['queries'] += samples['queries']
+    for status, hits in samples['statuses'].items():
+        into['statuses'][status] = into['statuses'].get(status, 0) + hits
+
+
+def plan(operations, count, rng, replay=False, offset=0):
+    """`count` operations: weighted samples, or the workload in order from `offset`"""
+    if replay:
+        return [operations[(offset + i) % len(operations)] for i in range(count)]
+    return rng.choices(operations, weights=[op.weight for op in operations], k=count)
+
+
+def run_worker(target, operations, keys, count, seed=0, replay=False, offset=0):
+    """Send `count` requests; returns {operation name: samples} and the elapsed time"""
+    rng = random.Random(seed)
+    samples = {}
+    started = time.perf_counter()
+    for op in plan(operations, count, rng, replay, offset):
+        values = {name: str(rng.choice(keys[name])) for name in ('post', 'tag', 'word')}
+        headers = {}
+        if op.auth and keys['tokens']:
+            headers['Authorization'] = f"Bearer {rng.choice(keys['tokens'])}"
+        body = fill(op.body, values)
+        path = fill(op.path, {name: quote(value) for name, value in values.items()})
+        began = time.perf_counter()
+        status, queries = target.send(op.method, path, body, headers)
+        latency = (time.perf_counter() - began) * 1000
+        merge(samples.setdefault(op.name, new_samples()), {
+            'latencies': [latency],
+            'errors': not 200 <= status < 400,
+            'queries': queries or 0,
+            'statuses': {str(status): 1},
+        })
+    target.close()
+    return samples, time.perf_counter() - started
+
+
+# -----------------------------
+# REPORT
+# -----------------------------
+def latency_stats(latencies):
+    return {
+        'mean_ms': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p90_ms': round(percentile(latencies, 90), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(max(latencies, default=0.0), 3),
+    }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def report(results, elapsed, config, dataset, operations, count_queries=True):
+    """Merge per-worker `run_worker()` results into one JSON-ready report"""
+    merged, total = {}, new_samples()
+    for samples, _ in results:
+        for name, entry in samples.items():
+            merge(merged.setdefault(name, new_samples()), entry)
+            merge(total, entry)
+
+    def summary(entry):
+        requests = len(entry['latencies'])
+        return {
+            'requests': requests,
+            'errors': entry['errors'],
+            'error_rate': round(entry['errors'] / requests, 4) if requests else 0.0,
+            'throughput_rps': round(requests / elapsed, 1) if elapsed else 0.0,
+            'queries_per_request': round(entry['queries'] / requests, 2) if count_queries and requests else None,
+            'latency': latency_stats(entry['latencies']),
+            'statuses': dict(sorted(entry['statuses'].items())),
+        }
+
+    return {
+        'commit': git_commit(),
+        'config': {**config, 'operations': [asdict(op) for op in operations]},
+        'dataset': dataset,
+        'elapsed_s': round(elapsed, 3),
+        'totals': summary(total),
+        'operations': {name: summary(entry) for name, entry in sorted(merged.items())},
+    }
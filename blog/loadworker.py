@@ -0,0 +1,29 @@
+"""
+Entry point of the `manage.py loadtest` worker processes.
+
+Workers are spawned, not forked, so they inherit no Django state or
+database handles and run on every platform. The child unpickles its
+arguments before Django is set up, so this module and the arguments
+(plain dicts, lists and strings) must not import the models; `run()`
+sets Django up first and imports the rest afterwards.
+"""
+from contextlib import nullcontext
+
+import django
+
+
+def run(target_url, database, no_response_cache, operations, keys, count, seed, replay, offset, queue):
+    """Run one worker's share and put its `run_worker()` result on `queue`"""
+    django.setup()
+    from django.db import connections
+
+    from blog import loadtest
+    from blog.benchmarks import without_response_cache
+
+    if database:  # the parent's throwaway database, in-process runs only
+        connections['default'].settings_dict['NAME'] = database
+    operations = [loadtest.Operation(**op) for op in operations]
+    with without_response_cache() if no_response_cache else nullcontext():
+        target = loadtest.HTTPTarget(target_url) if target_url else loadtest.InProcessTarget()
+        queue.put(loadtest.run_worker(target, operations, keys, count, seed, replay, offset))
+    connections.close_all()
@@ -0,0 +1,26 @@
+import importlib
+import pkgutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog import benchmarks
+from blog.benchmarks import bench_database
+
+
+class Command(BaseCommand):
+    help = "Run a benchmark scenario from blog/benchmarks against a throwaway database"
+
+    def add_arguments(self, parser):
+        scenarios = sorted(m.name for m in pkgutil.iter_modules(benchmarks.__path__))
+        parser.add_argument('scenario', choices=scenarios)
+        parser.add_argument('--sizes', type=int, nargs='+', help="Dataset sizes to run the scenario at")
+        parser.add_argument('--repeat', type=int, default=50, help="Timed iterations per measurement")
+
+    def handle(self, *args, **options):
+        module = importlib.import_module(f"blog.benchmarks.{options['scenario']}")
+        sizes = options['sizes'] or module.DEFAULT_SIZES
+        if options['repeat'] <= 0:
+            raise CommandError("--repeat must be positive")
+
+        with bench_database():
+            module.run(self, sizes, options['repeat'])
@@ -0,0 +1,23 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.bulk import DEFAULT_BATCH_SIZE, export_posts
+
+
+class Command(BaseCommand):
+    help = "Export all posts as JSONL (one post per line; '-' writes to stdout)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] <= 0:
+            raise CommandError("--chunk-size must be positive")
+        if options['path'] == '-':
+            sys.stdout.writelines(export_posts(chunk_size=options['chunk_size']))
+            return
+        with open(options['path'], 'w', encoding='utf-8') as out:
+            out.writelines(export_posts(chunk_size=options['chunk_size']))
+        self.stderr.write(self.style.SUCCESS(f"Exported posts to {options['path']}"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from blog.counters import LocalViewBuffer, flush_views, get_view_buffer
+
+
+class Command(BaseCommand):
+    help = "Write buffered post view increments to the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help="Posts per UPDATE statement")
+
+    def handle(self, *args, **options):
+        buffer = get_view_buffer()
+        if buffer is None:
+            self.stdout.write("View counting is disabled (VIEW_COUNTER['BACKEND'] is None)")
+            return
+        if isinstance(buffer, LocalViewBuffer):
+            self.stderr.write(
+                "LocalViewBuffer lives inside each server process; use a shared backend "
+                "such as RedisViewBuffer to flush from a separate command."
+            )
+        updated = flush_views(buffer, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Flushed views for {updated} post(s)"))
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.bulk import DEFAULT_BATCH_SIZE, import_posts
+from blog.models import User
+
+
+class Command(BaseCommand):
+    help = "Import posts from a JSONL file (one post per line; '-' reads stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--author', required=True, help="Username used for rows without an author")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            author = User.objects.get(username=options['author'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['author']!r} does not exist")
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size must be positive")
+
+        if options['path'] == '-':
+            result = import_posts(sys.stdin, author, options['batch_size'])
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                result = import_posts(lines, author, options['batch_size'])
+
+        for line, message in result['errors']:
+            self.stderr.write(f"line {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(f"Imported {result['created']} post(s), skipped {result['skipped']}"))
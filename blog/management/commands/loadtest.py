@@ -0,0 +1,124 @@
+import json
+import multiprocessing
+import random
+from dataclasses import asdict
+from queue import Empty
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from blog import loadtest, loadworker
+from blog.benchmarks import bench_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset and drive the API with a weighted request mix from "
+        "several processes, in-process (throwaway database) or against --url; prints a JSON report"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--likes', type=int, default=10000)
+        parser.add_argument('--requests', type=int, default=2000, help="Total requests, split across workers")
+        parser.add_argument('--workers', type=int, default=4, help="Worker processes")
+        parser.add_argument('--workload', help="JSONL file of operations replacing the default mix")
+        parser.add_argument('--replay', action='store_true', help="Send --workload lines in order instead of by weight")
+        parser.add_argument('--url', help="Base URL of a running server (e.g. http://127.0.0.1:8000)")
+        parser.add_argument('--seed-db', action='store_true',
+                            help="With --url: seed the configured database, which the server must share")
+        parser.add_argument('--no-response-cache', action='store_true', help="In-process: bypass blog/caching.py")
+        parser.add_argument('--random-seed', type=int, default=0)
+        parser.add_argument('--output', help="Write the report here instead of stdout")
+
+    def handle(self, *args, **options):
+        for name in ('users', 'posts', 'comments', 'likes'):
+            if options[name] < 0:
+                raise CommandError(f"--{name} must not be negative")
+        if options['requests'] <= 0 or options['workers'] <= 0:
+            raise CommandError("--requests and --workers must be positive")
+        if options['replay'] and not options['workload']:
+            raise CommandError("--replay needs --workload")
+
+        operations = loadtest.DEFAULT_MIX
+        if options['workload']:
+            try:
+                with open(options['workload'], encoding='utf-8') as lines:
+                    operations = loadtest.load_workload(lines)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"{options['workload']}: {exc}")
+
+        if options['url']:
+            report = self.run_load(options, operations)
+        else:
+            with bench_database():
+                report = self.run_load(options, operations)
+
+        document = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as out:
+                out.write(document + '\n')
+            totals = report['totals']
+            self.stdout.write(self.style.SUCCESS(
+                f"{totals['requests']} requests, {totals['throughput_rps']} req/s, "
+                f"p99 {totals['latency']['p99_ms']}ms, error rate {totals['error_rate']}: "
+                f"report written to {options['output']}"
+            ))
+        else:
+            self.stdout.write(document)
+
+    def run_load(self, options, operations):
+        rng = random.Random(options['random_seed'])
+        if options['url'] and not options['seed_db']:
+            dataset = loadtest.dataset_size()
+        else:
+            dataset = loadtest.seed(options['users'], options['posts'], options['comments'], options['likes'], rng)
+        keys = loadtest.dataset_keys(options['users'] or 1)
+        if not keys['post']:
+            raise CommandError("No posts to request: seed the database first (--seed-db)")
+
+        workers = options['workers']
+        shares = [options['requests'] // workers + (i < options['requests'] % workers) for i in range(workers)]
+        before = loadtest.server_query_totals(options['url']) if options['url'] else None
+        # Spawned, like the image workers (blog/images.py); see blog/loadworker.py
+        context = multiprocessing.get_context('spawn')
+        database = None if options['url'] else connections['default'].settings_dict['NAME']
+        no_response_cache = options['no_response_cache'] and not options['url']
+        queue = context.Queue()
+        processes = [
+            context.Process(target=loadworker.run, args=(
+                options['url'], database, no_response_cache, [asdict(op) for op in operations], keys, count,
+                options['random_seed'] + i, options['replay'], sum(shares[:i]), queue,
+            ))
+            for i, count in enumerate(shares)
+        ]
+        for process in processes:
+            process.start()
+        results = []
+        while len(results) < len(processes):
+            try:
+                results.append(queue.get(timeout=1))
+            except Empty:
+                if any(process.exitcode not in (None, 0) for process in processes):
+                    raise CommandError("A worker process failed; see its traceback above")
+        for process in processes:
+            process.join()
+
+        config = {
+            name: options[name]
+            for name in ('users', 'posts', 'comments', 'likes', 'requests', 'workers',
+                         'workload', 'replay', 'url', 'no_response_cache', 'random_seed')
+        }
+        elapsed = max(seconds for _, seconds in results)
+        report = loadtest.report(results, elapsed, config, dataset, operations, count_queries=not options['url'])
+        if options['url']:
+            after = loadtest.server_query_totals(options['url']) if before is not None else None
+            if before is None or after is None:
+                report['totals']['queries_per_request'] = 'n/a'  # /metrics unreachable
+            else:
+                served = after[1] - before[1]
+                # Server-side, over everything it served meanwhile (one server process assumed)
+                report['totals']['queries_per_request'] = round((after[0] - before[0]) / served, 2) if served else None
+        return report
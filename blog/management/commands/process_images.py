@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.images import process_pending
+
+
+class Command(BaseCommand):
+    help = "Resize image assets left pending (e.g. by a worker that was restarted mid-resize)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true', help="Also retry assets whose resize failed")
+
+    def handle(self, *args, **options):
+        processed = process_pending(include_failed=options['retry_failed'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} image(s)"))
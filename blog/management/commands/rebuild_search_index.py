@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from blog.search import backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Repopulate the SQLite full-text search tables from posts and comments"
+
+    def handle(self, *args, **options):
+        if backend() != 'sqlite':
+            self.stdout.write("Nothing to do: only the SQLite backend keeps a separate search index")
+            return
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from blog.trending import recompute
+
+
+class Command(BaseCommand):
+    help = "Rebuild every trending score from the post counters (after changing TRENDING, or to fix drift)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size must be positive")
+        with transaction.atomic():
+            written = recompute(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Rescored {written} post(s)"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.caching import invalidate
+from blog.denorm import recount
+
+
+class Command(BaseCommand):
+    help = "Recompute denormalized post/user/tag counters, fixing any drift"
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount()
+        invalidate('posts', 'authors')
+        for table, rows in fixed.items():
+            self.stdout.write(f"{table}: {rows} row(s) fixed")
+        self.stdout.write(self.style.SUCCESS("Counters are consistent"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from blog.routers import get_config, sync_replica
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database over every configured replica (local replica setup)"
+
+    def handle(self, *args, **options):
+        aliases = get_config()['ALIASES']
+        if not aliases:
+            self.stdout.write("No replicas configured; set BLOG_SQLITE_REPLICAS=N")
+            return
+        if any(connections[alias].vendor != 'sqlite' for alias in ['default', *aliases]):
+            raise CommandError("sync_replicas only copies SQLite files; use real replication elsewhere")
+        for alias in aliases:
+            sync_replica(alias)
+            self.stdout.write(f"{alias}: synced from {connections['default'].settings_dict['NAME']}")
+        self.stdout.write(self.style.SUCCESS(f"{len(aliases)} replica(s) synced"))
@@ -0,0 +1,385 @@
+"""
+Per-request performance metrics, in-process.
+
+`MetricsMiddleware` times every request and files it under the resolved
+URL name (`post-list`, `post-like`, `async-post-detail`, ...):
+
+    blog_requests_total                  by view and status code
+    blog_request_duration_seconds        wall time through the middleware stack
+    blog_db_queries                      queries per request
+    blog_db_duration_seconds             time spent executing them
+    blog_serializer_duration_seconds     DRF `.data` and ValuesSerializer time
+    blog_response_bytes                  rendered body size (not for streams)
+    blog_slow_queries_total              queries over SLOW_QUERY_MS
+
+Histograms are fixed-bucket counters behind one lock, so recording a
+request costs a few microseconds. Queries are counted by an execute
+wrapper installed on every new connection; request state lives in a
+ContextVar, so queries run by the async ORM in worker threads are still
+attributed to their request. Serializer time comes from wrapping DRF's
+`BaseSerializer.data`, done by BlogConfig.ready() only when ENABLED.
+
+Everything is exposed as Prometheus text at `/metrics` and can be dumped
+to a file periodically. Each worker process keeps its own registry; scrape
+or dump every worker. Slow queries are logged to `blog.slow_queries`
+with the innermost project frames that issued them.
+
+Configured through `settings.METRICS`:
+
+    METRICS = {
+        'ENABLED': True,
+        'ALLOWED_IPS': ['127.0.0.1', '::1'],  # who may read /metrics; None: anyone
+        'DUMP_PATH': None,                    # file rewritten every DUMP_INTERVAL seconds
+        'DUMP_INTERVAL': 60,
+        'SLOW_QUERY_MS': 100,
+        'SLOW_QUERY_SAMPLE': 1.0,             # fraction of slow queries logged
+    }
+"""
+import logging
+import os
+import random
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger('blog.slow_queries')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'DUMP_PATH': None,
+    'DUMP_INTERVAL': 60,
+    'SLOW_QUERY_MS': 100,
+    'SLOW_QUERY_SAMPLE': 1.0,
+}
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'blog_request_duration_seconds': ("Request wall time", SECONDS_BUCKETS),
+    'blog_db_queries': ("Database queries per request", QUERY_BUCKETS),
+    'blog_db_duration_seconds': ("Database time per request", SECONDS_BUCKETS),
+    'blog_serializer_duration_seconds': ("Serializer time per request", SECONDS_BUCKETS),
+    'blog_response_bytes': ("Response body size", BYTES_BUCKETS),
+}
+COUNTERS = {
+    'blog_requests_total': "Requests served",
+    'blog_slow_queries_total': "Queries slower than SLOW_QUERY_MS",
+}
+
+# Project code, for attributing slow queries to the frames that issued them
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+_config = None
+
+
+def get_config():
+    # Read on every request, so merged once and reset when settings change
+    global _config
+    if _config is None:
+        _config = {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+    return _config
+
+
+@receiver(setting_changed)
+def reset_config(setting, **kwargs):
+    global _config
+    if setting == 'METRICS':
+        _config = None
+
+
+# -----------------------------
+# REGISTRY
+# -----------------------------
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.histograms = {}  # (metric, view) -> Histogram
+        self.counters = {}    # (metric, labels) -> int
+
+    def observe(self, view, values):
+        """Record one request: `values` maps histogram names to observations"""
+        with self.lock:
+            for metric, value in values.items():
+                histogram = self.histograms.get((metric, view))
+                if histogram is None:
+                    histogram = self.histograms[metric, view] = Histogram(HISTOGRAMS[metric][1])
+                histogram.observe(value)
+
+    def inc(self, metric, labels):
+        with self.lock:
+            self.counters[metric, labels] = self.counters.get((metric, labels), 0) + 1
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self.lock:
+            histograms = {
+                key: (list(h.counts), h.sum, h.count) for key, h in self.histograms.items()
+            }
+            counters = dict(self.counters)
+        lines = []
+        for metric, help_text in COUNTERS.items():
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} counter']
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f'{metric}{format_labels(labels)} {value}')
+        for metric, (help_text, buckets) in HISTOGRAMS.items():
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+            for (name, view), (counts, total, count) in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, n in zip([*buckets, '+Inf'], counts):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{format_labels((("view", view), ("le", str(bound))))} {cumulative}')
+                lines.append(f'{metric}_sum{format_labels((("view", view),))} {total:g}')
+                lines.append(f'{metric}_count{format_labels((("view", view),))} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+registry = Registry()
+
+
+# -----------------------------
+# PER-REQUEST STATE
+# -----------------------------
+class RequestStats:
+    __slots__ = ('request', 'start', 'queries', 'db_time', 'serializer_time', 'serializing',
+                 'slow_seconds', 'slow_sample')
+
+    def __init__(self, request, config):
+        self.request = request
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+        self.slow_seconds = config['SLOW_QUERY_MS'] / 1000
+        self.slow_sample = config['SLOW_QUERY_SAMPLE']
+
+
+_request_stats = ContextVar('request_stats', default=None)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+# -----------------------------
+# QUERIES
+# -----------------------------
+def record_query(execute, sql, params, many, context):
+    stats = _request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += elapsed
+        if elapsed >= stats.slow_seconds:
+            slow_query(stats, sql, elapsed, context['connection'].alias)
+
+
+def slow_query(stats, sql, elapsed, alias):
+    view = view_name(stats.request)
+    registry.inc('blog_slow_queries_total', (('view', view),))
+    if random.random() >= stats.slow_sample:
+        return
+    frames = [
+        f'{os.path.relpath(frame.filename, PROJECT_ROOT)}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(PROJECT_ROOT) and frame.filename != __file__
+    ]
+    slow_query_logger.warning(
+        "Slow query (%.1f ms on %s) in %s: %s\n  %s",
+        elapsed * 1000, alias, view, sql, '\n  '.join(frames[-5:]) or '(no project frames)',
+    )
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+# -----------------------------
+# SERIALIZERS
+# -----------------------------
+class serializer_timer:
+    """Count the enclosed block as serializer time of the current request"""
+    __slots__ = ('stats', 'start')
+
+    def __enter__(self):
+        self.stats = _request_stats.get()
+        if self.stats is not None and self.stats.serializing:
+            self.stats = None  # nested: the outer serializer is already timed
+        if self.stats is not None:
+            self.stats.serializing = True
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.stats is not None:
+            self.stats.serializer_time += time.perf_counter() - self.start
+            self.stats.serializing = False
+
+
+def instrument_serializers():
+    """Time `BaseSerializer.data`, which Serializer and ListSerializer both build on"""
+    original = BaseSerializer.data
+    if getattr(original.fget, 'instrumented', False):
+        return
+
+    def data(self):
+        with serializer_timer():
+            return original.fget(self)
+
+    data.instrumented = True
+    BaseSerializer.data = property(data)
+
+
+# -----------------------------
+# MIDDLEWARE
+# -----------------------------
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats(request, get_config())
+        token = _request_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request, get_config())
+        token = _request_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_stats.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        view = view_name(request)
+        values = {
+            'blog_request_duration_seconds': time.perf_counter() - stats.start,
+            'blog_db_queries': stats.queries,
+            'blog_db_duration_seconds': stats.db_time,
+            'blog_serializer_duration_seconds': stats.serializer_time,
+        }
+        if not response.streaming:
+            values['blog_response_bytes'] = len(response.content)
+        registry.observe(view, values)
+        registry.inc('blog_requests_total', (('view', view), ('status', str(response.status_code))))
+        ensure_dumper()
+        return response
+
+
+# -----------------------------
+# EXPOSITION
+# -----------------------------
+def metrics_view(request):
+    allowed = get_config()['ALLOWED_IPS']
+    if allowed is not None and request.META.get('REMOTE_ADDR') not in allowed:
+        raise PermissionDenied
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def dump_metrics(path):
+    """Write the current metrics to `path` atomically"""
+    tmp = f'{path}.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+class MetricsDumper(threading.Thread):
+    """Daemon thread that rewrites DUMP_PATH every `interval` seconds"""
+
+    def __init__(self, path, interval):
+        super().__init__(name='metrics-dumper', daemon=True)
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                dump_metrics(self.path)
+            except OSError:
+                logger.exception("Dumping metrics to %s failed", self.path)
+
+
+_dumper = None
+_dumper_lock = threading.Lock()
+
+
+def ensure_dumper():
+    """Start the dumper lazily, so forked workers each get their own thread"""
+    global _dumper
+    if _dumper is not None and _dumper.is_alive():
+        return
+    config = get_config()
+    if not config['DUMP_PATH'] or not config['DUMP_INTERVAL']:
+        return
+    with _dumper_lock:
+        if _dumper is None or not _dumper.is_alive():
+            _dumper = MetricsDumper(config['DUMP_PATH'], config['DUMP_INTERVAL'])
+            _dumper.start()
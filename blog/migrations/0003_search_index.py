@@ -0,0 +1,47 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5(title, content, tags, tokenize='porter unicode61')",
+    "INSERT INTO blog_post_fts (blog_post_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')",
+    "CREATE VIRTUAL TABLE blog_comment_fts USING fts5(text, post_id UNINDEXED, tokenize='porter unicode61')",
+    "INSERT INTO blog_post_fts (rowid, title, content, tags) "
+    "SELECT id, title, content, (SELECT group_concat(value, ' ') FROM json_each(blog_post.tags)) FROM blog_post",
+    "INSERT INTO blog_comment_fts (rowid, text, post_id) SELECT id, text, post_id FROM blog_comment",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE blog_post_fts",
+    "DROP TABLE blog_comment_fts",
+]
+
+# Must match the expressions in blog/search.py for the planner to use them
+POSTGRES_FORWARD = [
+    "CREATE INDEX blog_post_fts_idx ON blog_post USING GIN ("
+    "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '') || ' ' || coalesce(tags::text, '')))",
+    "CREATE INDEX blog_comment_fts_idx ON blog_comment USING GIN (to_tsvector('english', coalesce(text, '')))",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX blog_post_fts_idx",
+    "DROP INDEX blog_comment_fts_idx",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for sql in statements.get(vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_post_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+    ]
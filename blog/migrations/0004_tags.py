@@ -0,0 +1,120 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The post search index covered the JSON tags column; rebuild it without
+# (see blog/search.py, which must use the same expression)
+POSTGRES_FTS = (
+    "CREATE INDEX blog_post_fts_idx ON blog_post USING GIN ("
+    "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '')))"
+)
+POSTGRES_FTS_WITH_TAGS = (
+    "CREATE INDEX blog_post_fts_idx ON blog_post USING GIN ("
+    "to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, '') || ' ' || coalesce(tags::text, '')))"
+)
+
+
+def run_on_postgres(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return apply
+
+
+def normalize(names):
+    seen = []
+    for name in names if isinstance(names, list) else []:
+        name = str(name).strip().lower()[:50]
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
+
+def copy_json_tags(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Tag = apps.get_model('blog', 'Tag')
+    PostTag = apps.get_model('blog', 'PostTag')
+
+    post_names = {}
+    for post_id, names in Post.objects.values_list('id', 'tags').iterator(chunk_size=2000):
+        names = normalize(names)
+        if names:
+            post_names[post_id] = names
+    all_names = {name for names in post_names.values() for name in names}
+    Tag.objects.bulk_create([Tag(name=name) for name in all_names], ignore_conflicts=True)
+    tag_ids = dict(Tag.objects.values_list('name', 'id'))
+
+    PostTag.objects.bulk_create(
+        (PostTag(post_id=post_id, tag_id=tag_ids[name]) for post_id, names in post_names.items() for name in names),
+        batch_size=2000,
+    )
+    for tag_id, count in PostTag.objects.values_list('tag_id').annotate(n=models.Count('id')):
+        Tag.objects.filter(pk=tag_id).update(post_count=count)
+
+
+def restore_json_tags(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    PostTag = apps.get_model('blog', 'PostTag')
+
+    names = {}
+    for post_id, name in PostTag.objects.values_list('post_id', 'tag__name').order_by('id'):
+        names.setdefault(post_id, []).append(name)
+    for post_id, tags in names.items():
+        Post.objects.filter(pk=post_id).update(tags=tags)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-post_count', 'name'], name='tag_popularity_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PostTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='blog.post')),
+                ('tag', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='blog.tag')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='posttag',
+            index=models.Index(fields=['tag', 'post'], name='posttag_tag_post_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posttag',
+            constraint=models.UniqueConstraint(fields=('post', 'tag'), name='unique_post_tag'),
+        ),
+        migrations.RunPython(copy_json_tags, restore_json_tags),
+        migrations.RunPython(
+            run_on_postgres(["DROP INDEX IF EXISTS blog_post_fts_idx"]),
+            run_on_postgres([POSTGRES_FTS_WITH_TAGS]),
+        ),
+        migrations.RemoveField(
+            model_name='post',
+            name='tags',
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='posts', through='blog.PostTag', to='blog.tag'),
+        ),
+        migrations.RunPython(
+            run_on_postgres([POSTGRES_FTS]),
+            run_on_postgres(["DROP INDEX IF EXISTS blog_post_fts_idx"]),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:51
+
+from django.db import migrations, models
+
+# Backfill with plain correlated subqueries (valid on SQLite and PostgreSQL).
+# Post.likes is recomputed too: it used to be maintained by hand in the view.
+BACKFILL = [
+    """
+    UPDATE blog_post SET
+        comment_count = (SELECT COUNT(*) FROM blog_comment WHERE blog_comment.post_id = blog_post.id),
+        likes = (SELECT COUNT(*) FROM blog_post_liked_by WHERE blog_post_liked_by.post_id = blog_post.id),
+        save_count = (SELECT COUNT(*) FROM blog_post_saved_by WHERE blog_post_saved_by.post_id = blog_post.id)
+    """,
+    """
+    UPDATE blog_user SET
+        post_count = (SELECT COUNT(*) FROM blog_post WHERE blog_post.author_id = blog_user.id),
+        total_likes = (SELECT COALESCE(SUM(likes), 0) FROM blog_post WHERE blog_post.author_id = blog_user.id)
+    """,
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_comment_post_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='save_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='total_likes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(BACKFILL, migrations.RunSQL.noop),
+    ]
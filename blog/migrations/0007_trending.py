@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 04:22
+
+import math
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The scoring rules as of this migration, with the default settings (see
+# blog/trending.py). Custom TRENDING settings are applied afterwards by
+# `manage.py recompute_trending`.
+HALF_LIFE = 43200
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+WEIGHTS = {'likes': 1.0, 'comment_count': 2.0, 'save_count': 3.0, 'views': 0.05}
+
+
+def backfill(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    TrendingScore = apps.get_model('blog', 'TrendingScore')
+    rows = []
+    for post_id, created_at, *counts in Post.objects.values_list('id', 'created_at', *WEIGHTS).iterator():
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        weight = sum(w * n for w, n in zip(WEIGHTS.values(), counts))
+        base = (created_at - EPOCH).total_seconds() / HALF_LIFE
+        rows.append(TrendingScore(post_id=post_id, weight=weight, base=base, score=math.log2(1 + weight) + base))
+    TrendingScore.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='blog.post')),
+                ('weight', models.FloatField(default=0)),
+                ('base', models.FloatField()),
+                ('score', models.FloatField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score', '-post'], name='trending_score_idx')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# Tag names leave the SQLite post index, matching the PostgreSQL document
+# (title and content, see blog/search.py). FTS5 tables cannot drop a
+# column, so the table is rebuilt.
+SQLITE_FORWARD = [
+    "DROP TABLE blog_post_fts",
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5(title, content, tokenize='porter unicode61')",
+    "INSERT INTO blog_post_fts (blog_post_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    "INSERT INTO blog_post_fts (rowid, title, content) SELECT id, title, content FROM blog_post",
+]
+SQLITE_BACKWARD = [
+    "DROP TABLE blog_post_fts",
+    "CREATE VIRTUAL TABLE blog_post_fts USING fts5(title, content, tags, tokenize='porter unicode61')",
+    "INSERT INTO blog_post_fts (blog_post_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0, 5.0)')",
+    "INSERT INTO blog_post_fts (rowid, title, content, tags) "
+    "SELECT id, title, content, (SELECT group_concat(blog_tag.name, ' ') FROM blog_posttag "
+    "JOIN blog_tag ON blog_tag.id = blog_posttag.tag_id WHERE blog_posttag.post_id = blog_post.id) "
+    "FROM blog_post",
+]
+
+
+def run_on_sqlite(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(SQLITE_FORWARD), run_on_sqlite(SQLITE_BACKWARD)),
+    ]
@@ -1,6 +1,11 @@
 # users/models.py
+import re
+
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Max, Q, Value, When
+from django.db.models.functions import Cast, Substr
+from django.utils.crypto import get_random_string
 from django.utils.text import slugify
 from django.conf import settings
 
@@ -9,12 +14,34 @@ class User(AbstractUser):
     bio = models.TextField(blank=True, null=True)
     joined_at = models.DateTimeField(auto_now_add=True)
     theme = models.CharField(max_length=10, choices=[("light", "Light"), ("dark", "Dark")], default="light")
+    # Denormalized, maintained by blog/denorm.py
+    post_count = models.PositiveIntegerField(default=0)
+    total_likes = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    avatar_asset = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Profile edits; the counters above are updated in place and do not touch it
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.username
     
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    post_count = models.PositiveIntegerField(default=0)  # maintained by blog/tagging.py
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-post_count', 'name'], name='tag_popularity_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -26,38 +53,205 @@ class Post(models.Model):
     slug = models.SlugField(unique=True, blank=True)
     content = models.TextField()
     image = models.URLField(blank=True, null=True)
+    image_asset = models.ForeignKey('ImageAsset', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
-    tags = models.JSONField(default=list, blank=True)  # ["tech", "uzb"]
+    tags = models.ManyToManyField(Tag, through='PostTag', related_name='posts', blank=True)
     views = models.PositiveIntegerField(default=0)
+    # Denormalized, maintained by blog/denorm.py
     likes = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    save_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     saved_by = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='saved_posts', blank=True)
     liked_by = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='liked_posts', blank=True)
 
+    class Meta:
+        indexes = [
+            # Backs keyset pagination on (-created_at, -id)
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            # Per-author timelines, merged by the fan-out-on-read feed (blog/feeds.py)
+            models.Index(fields=['author', '-created_at', '-id'], name='post_author_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
-        if not self.slug:
-            base = slugify(self.title)
-            slug = base
-            counter = 1
-            while Post.objects.filter(slug=slug).exists():
-                slug = f"{base}-{counter}"
-                counter += 1
-            self.slug = slug
-        super().save(*args, **kwargs)
+        if self.slug:
+            return super().save(*args, **kwargs)
+
+        # Another insert can claim the same slug between allocation and
+        # INSERT; the unique index catches it and we allocate again.
+        for attempt in range(SLUG_MAX_ATTEMPTS):
+            self.slug = next_free_slug(self.title, randomize=attempt == SLUG_MAX_ATTEMPTS - 1)
+            try:
+                with transaction.atomic():
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if not Post.objects.filter(slug=self.slug).exists():
+                    raise  # some other constraint failed
+        raise IntegrityError(f"Could not allocate a unique slug for {self.title!r}")
+
+    def set_tags(self, names):
+        """Replace this post's tags with `names`, creating missing tags"""
+        names = normalize_tags(names)
+        Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True)
+        self.tags.set(Tag.objects.filter(name__in=names))
 
     def __str__(self):
         return self.title
 
 
+SLUG_MAX_ATTEMPTS = 5
+
+
+def slug_base(title):
+    """Slugified title, leaving room in the field for a `-N` suffix"""
+    max_length = Post._meta.get_field('slug').max_length
+    return slugify(title)[:max_length - 11].strip('-') or 'post'
+
+
+def highest_slug_suffix(base):
+    """
+    Highest N among `base-N` slugs in use (0 if only `base` is taken, None
+    if neither is), found with one aggregate over the slug index range of
+    `base-...` plus `base` itself. The regex only filters the rows that
+    range returns; `startswith` would compile to LIKE, which SQLite cannot
+    serve from the index.
+    """
+    numbered = (
+        Q(slug__gte=f'{base}-', slug__lt=f'{base}-\U0010ffff')
+        & Q(slug__regex=rf'^{re.escape(base)}-[0-9]+$')
+    )
+    suffix = Case(
+        When(slug=base, then=Value(0)),
+        default=Cast(Substr('slug', len(base) + 2), models.BigIntegerField()),
+        output_field=models.BigIntegerField(),
+    )
+    return Post.objects.filter(Q(slug=base) | numbered).aggregate(top=Max(suffix))['top']
+
+
+def next_free_slug(title, randomize=False):
+    """
+    Return `base` or `base-N` with N one past the highest suffix in use.
+    `randomize` appends a random token instead, as a last resort under
+    heavy contention.
+    """
+    base = slug_base(title)
+    if randomize:
+        return f"{base}-{get_random_string(8, 'abcdefghijklmnopqrstuvwxyz')}"
+    top = highest_slug_suffix(base)
+    if top is None:
+        return base
+    return f"{base}-{top + 1}"
+
+
+class PostTag(models.Model):
+    # Both directions are covered by the composite indexes below
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, db_index=False)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'tag'], name='unique_post_tag'),
+        ]
+        indexes = [
+            # Covering index for tag -> posts filtering
+            models.Index(fields=['tag', 'post'], name='posttag_tag_post_idx'),
+        ]
+
+
+def normalize_tags(names):
+    """Strip, lowercase and de-duplicate tag names, keeping their order"""
+    seen = []
+    for name in names:
+        name = str(name).strip().lower()[:50]
+        if name and name not in seen:
+            seen.append(name)
+    return seen
+
+
 # blog/models.py (below Post)
 class Comment(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
+    # Lookups by post are served by comment_post_created_idx below
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False)
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     text = models.TextField()
     likes = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Backs per-post keyset pagination and comment counts
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.author.username} on {self.post.title}"
+
+
+class TrendingScore(models.Model):
+    """A post's materialized trending rank, maintained by blog/trending.py"""
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    weight = models.FloatField(default=0)
+    base = models.FloatField()  # creation time in half-lives
+    score = models.FloatField()
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of /api/posts/trending/
+            models.Index(fields=['-score', '-post'], name='trending_score_idx'),
+        ]
+
+
+class Follow(models.Model):
+    """`follower` follows `followee`"""
+    # follower -> followees is served by the unique constraint's index
+    follower = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                 related_name='following_links', db_index=False)
+    followee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                 related_name='follower_links', db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followee'], name='unique_follow'),
+            models.CheckConstraint(condition=~models.Q(follower=models.F('followee')), name='no_self_follow'),
+        ]
+        indexes = [
+            # Fan-out reads every follower of an author
+            models.Index(fields=['followee', 'follower'], name='follow_followee_idx'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """A post delivered to a follower's inbox by fan-out-on-write (blog/feeds.py)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                             related_name='feed_entries', db_index=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_entries')
+    # Always deleted along with `post`; DO_NOTHING spares a scan on user delete
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, related_name='+',
+                               db_index=False)
+    created_at = models.DateTimeField()  # the post's, copied so inbox pages never join to sort
+
+    class Meta:
+        indexes = [
+            # Backs keyset pagination of one user's inbox
+            models.Index(fields=['user', '-created_at', '-post'], name='feed_user_created_idx'),
+        ]
+
+
+class ImageAsset(models.Model):
+    """An uploaded image and its resized variants (blog/images.py)"""
+    PENDING, READY, FAILED = 'pending', 'ready', 'failed'
+
+    digest = models.CharField(max_length=64, unique=True)  # sha256 of the original
+    original = models.CharField(max_length=255)  # storage name under MEDIA_ROOT
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size = models.PositiveIntegerField()  # bytes
+    status = models.CharField(max_length=10, default=PENDING,
+                              choices=[(PENDING, "Pending"), (READY, "Ready"), (FAILED, "Failed")])
+    # What serializers expose: URLs of the original and of every variant, plus srcset strings
+    variants = models.JSONField(default=dict)
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
@@ -0,0 +1,258 @@
+import base64
+import heapq
+import math
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# -----------------------------
+# KEYSET (CURSOR) PAGINATION
+# -----------------------------
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor pagination over a composite, unique ordering.
+
+    Each page is fetched with a single index range scan
+    (`WHERE (created_at, id) < (:c, :i) ORDER BY ... LIMIT n`), so the cost
+    of a page does not depend on how deep into the archive it is, and rows
+    inserted while a client is paging never shift or duplicate results.
+    """
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 20
+    max_page_size = 100
+    page_size_setting = 'POST_PAGE_SIZE'
+    max_page_size_setting = 'POST_MAX_PAGE_SIZE'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, fetching through the async ORM"""
+        queryset = self.get_page_queryset(queryset, request)
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request):
+        """The page's rows plus one, which tells whether another page follows"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        ordering = self.get_ordering(self.reverse)
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.build_keyset_filter(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+
+        # In reverse mode the extra row tells us whether a previous page
+        # exists; the page we came from always exists after this one.
+        if self.reverse:
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    # -----------------------------
+    # PAGE SIZE
+    # -----------------------------
+    def get_page_size(self, request):
+        page_size = getattr(settings, self.page_size_setting, self.page_size)
+        max_page_size = getattr(settings, self.max_page_size_setting, self.max_page_size)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        if requested <= 0:
+            return page_size
+        return min(requested, max_page_size)
+
+    # -----------------------------
+    # ORDERING / FILTERING
+    # -----------------------------
+    def get_ordering(self, reverse, ordering=None):
+        ordering = ordering or self.ordering
+        if not reverse:
+            return ordering
+        return tuple(f[1:] if f.startswith('-') else '-' + f for f in ordering)
+
+    def build_keyset_filter(self, ordering, position):
+        """
+        Lexicographic "comes after `position`" filter for `ordering`.
+
+        The redundant bound on the leading column turns the OR into an index
+        range scan on SQLite, which does not optimize row-value OR chains.
+        """
+        first = ordering[0]
+        bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        condition = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f'{name}__{lookup}': position[index]})
+            for prev_field, prev_value in zip(ordering[:index], position[:index]):
+                term &= Q(**{prev_field.lstrip('-'): prev_value})
+            condition |= term
+        return bound & condition
+
+    # -----------------------------
+    # CURSOR ENCODING
+    # -----------------------------
+    def get_position(self, obj):
+        # By attribute name, so `.values_list(named=True)` rows page too
+        return tuple(getattr(obj, field.lstrip('-')) for field in self.ordering)
+
+    def format_key(self, value):
+        """The leading ordering value as cursor text"""
+        return value.isoformat()
+
+    def parse_key(self, text):
+        """Inverse of `format_key`; None or ValueError for a bad cursor"""
+        return parse_datetime(text)
+
+    def encode_cursor(self, position, reverse):
+        key, pk = position
+        raw = f"{'r' if reverse else 'f'}|{self.format_key(key)}|{pk}"
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def get_cursor_link(self, obj, reverse):
+        token = self.encode_cursor(self.get_position(obj), reverse)
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            raw = base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii')
+            direction, key, pk = raw.split('|')
+            key = self.parse_key(key)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if direction not in ('f', 'r') or key is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (key, pk), direction == 'r'
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.get_cursor_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.get_cursor_link(self.page[0], reverse=True)
+
+
+class PostCursorPagination(KeysetPagination):
+    """Newest-first paging for post feeds, backed by `post_created_id_idx`"""
+    ordering = ('-created_at', '-id')
+
+
+class FeedPagination(KeysetPagination):
+    """
+    Newest-first paging over several timelines merged into one, e.g. a
+    follower's inbox plus the posts of the authors it does not receive.
+    Cursors are PostCursorPagination's (created_at, post id).
+    """
+    ordering = ('-created_at', '-id')
+
+    def paginate_sources(self, sources, request):
+        """
+        `sources` are `(queryset, ordering, to_post)`: each queryset is cut
+        at the cursor and page size along its own (created_at, post id)
+        index ordering, `to_post` maps its rows to posts, and the slices are
+        merged into one page. A post found in several sources shows once.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        slices = []
+        for queryset, ordering, to_post in sources:
+            ordering = self.get_ordering(self.reverse, ordering)
+            queryset = queryset.order_by(*ordering)
+            if self.position is not None:
+                queryset = queryset.filter(self.build_keyset_filter(ordering, self.position))
+            slices.append([to_post(row) for row in queryset[:self.page_size + 1]])
+
+        results, seen = [], set()
+        merged = heapq.merge(*slices, key=lambda post: (post.created_at, post.pk), reverse=not self.reverse)
+        for post in merged:
+            if post.pk not in seen:
+                seen.add(post.pk)
+                results.append(post)
+            if len(results) > self.page_size:
+                break
+        return self.set_page(results)
+
+
+class TrendingCursorPagination(KeysetPagination):
+    """
+    Highest-score-first paging over TrendingScore rows (blog/trending.py),
+    backed by `trending_score_idx`. Scores are floats; `repr` round-trips
+    them exactly.
+    """
+    ordering = ('-score', '-post_id')
+
+    def format_key(self, value):
+        return repr(value)
+
+    def parse_key(self, text):
+        value = float(text)
+        return value if math.isfinite(value) else None
+
+
+class CommentCursorPagination(KeysetPagination):
+    """
+    Oldest-first paging through one post's comments. The view filters on
+    post_id, so each page is a range scan on `comment_post_created_idx`.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    max_page_size = 200
+    page_size_setting = 'COMMENT_PAGE_SIZE'
+    max_page_size_setting = 'COMMENT_MAX_PAGE_SIZE'
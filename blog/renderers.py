@@ -0,0 +1,84 @@
+"""
+JSON rendering through a pluggable encoder.
+
+`FastJSONRenderer` produces the same bytes as DRF's JSONRenderer, but
+hands compact renders to the encoder named by `settings.JSON_ENCODER`:
+
+    'blog.renderers.stdlib_dumps'   the stdlib C encoder, reusing one
+                                    configured encoder instead of building
+                                    a new one per response (default)
+    'blog.renderers.orjson_dumps'   orjson, when installed
+
+An encoder is `dumps(data, ensure_ascii, allow_nan, separators)` returning
+str or bytes. Indented renders (`Accept: application/json; indent=4`, the
+browsable API) always go through DRF's own path.
+"""
+from functools import cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.compat import LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+DEFAULT_ENCODER = 'blog.renderers.stdlib_dumps'
+
+
+# -----------------------------
+# ENCODERS
+# -----------------------------
+@cache
+def stdlib_encoder(ensure_ascii, allow_nan, separators):
+    return encoders.JSONEncoder(ensure_ascii=ensure_ascii, allow_nan=allow_nan, separators=separators)
+
+
+def stdlib_dumps(data, ensure_ascii, allow_nan, separators):
+    return stdlib_encoder(ensure_ascii, allow_nan, separators).encode(data)
+
+
+_drf_default = encoders.JSONEncoder().default
+
+
+def orjson_dumps(data, ensure_ascii, allow_nan, separators):
+    """
+    orjson for the compact, non-ASCII-escaping case; anything else falls
+    back to the stdlib. Datetimes and dataclasses go through DRF's encoder
+    so they format identically. Floats are written in
+    shortest form (`1e16`, not `1e+16`) and NaN as null, which this API
+    never renders.
+    """
+    try:
+        import orjson
+    except ImportError:
+        raise ImproperlyConfigured("orjson_dumps requires the 'orjson' package")
+    if ensure_ascii or separators != SHORT_SEPARATORS:
+        return stdlib_dumps(data, ensure_ascii, allow_nan, separators)
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    )
+    return orjson.dumps(data, default=_drf_default, option=options)
+
+
+@cache
+def get_encoder(path):
+    return import_string(path)
+
+
+# -----------------------------
+# RENDERER
+# -----------------------------
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        dumps = get_encoder(getattr(settings, 'JSON_ENCODER', DEFAULT_ENCODER))
+        separators = SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+        ret = dumps(data, ensure_ascii=self.ensure_ascii, allow_nan=not self.strict, separators=separators)
+        # Same \u2028/\u2029 escaping as JSONRenderer, so output stays a JS subset
+        if isinstance(ret, bytes):
+            return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+        return ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
@@ -0,0 +1,182 @@
+"""
+Read replicas with read-your-writes stickiness.
+
+`ReplicaRouter` sends reads made while serving a safe (GET/HEAD/OPTIONS)
+request under one of `DATABASE_REPLICAS['PATHS']` to a replica alias.
+Everything else goes to `default`: writes, reads inside a transaction,
+reads outside a request (commands, the view flusher) and reads by a
+client that wrote recently. One replica is picked per request, so a
+single response never mixes two replicas' snapshots.
+
+Stickiness: after a successful unsafe request, `PrimaryStickinessMiddleware`
+pins the client to the primary for `STICKY_SECONDS`, long enough for the
+replicas to catch up. The pin is kept in two places:
+
+- a `COOKIE_NAME` cookie holding the pin's expiry, for browsers;
+- a cache entry keyed by the JWT's user id claim, for API clients that
+  do not keep cookies. The claim is read without verifying the token. A
+  forged token can only force reads onto the primary, and the entry is
+  written only after the write itself has been authenticated by DRF.
+
+Configured through `settings.DATABASE_REPLICAS`:
+
+    DATABASE_REPLICAS = {
+        'ALIASES': ['replica1', 'replica2'],  # empty: the router is a no-op
+        'PATHS': ['/api/posts/', ...],        # URL prefixes served from replicas
+        'STICKY_SECONDS': 5,
+        'COOKIE_NAME': 'db_primary_until',
+    }
+"""
+import base64
+import json
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+DEFAULTS = {
+    'ALIASES': [],
+    'PATHS': ['/api/'],
+    'STICKY_SECONDS': 5,
+    'COOKIE_NAME': 'db_primary_until',
+}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias serving reads for the current request; None means the primary
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'DATABASE_REPLICAS', {})}
+
+
+# -----------------------------
+# ROUTER
+# -----------------------------
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Replicas are copies of the primary, refreshed by sync_replicas
+        return db not in get_config()['ALIASES']
+
+
+# -----------------------------
+# STICKINESS
+# -----------------------------
+def jwt_user_id(request):
+    """User id claim of a bearer token, unverified (routing only)"""
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    if scheme not in jwt_settings.AUTH_HEADER_TYPES or token.count('.') != 2:
+        return None
+    payload = token.split('.')[1]
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+    except (ValueError, UnicodeError):
+        return None
+    return claims.get(jwt_settings.USER_ID_CLAIM) if isinstance(claims, dict) else None
+
+
+def pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def is_pinned(request, config):
+    try:
+        if float(request.COOKIES.get(config['COOKIE_NAME'], 0)) > time.time():
+            return True
+    except ValueError:
+        pass
+    user_id = jwt_user_id(request)
+    return user_id is not None and cache.get(pin_key(user_id)) is not None
+
+
+def pin(request, response, config):
+    seconds = config['STICKY_SECONDS']
+    response.set_cookie(
+        config['COOKIE_NAME'], f'{time.time() + seconds:.3f}',
+        max_age=seconds, httponly=True, samesite='Lax',
+    )
+    user_id = jwt_user_id(request)
+    if user_id is not None:
+        cache.set(pin_key(user_id), 1, timeout=seconds)
+
+
+def choose_read_alias(request, config):
+    if not config['ALIASES'] or request.method not in SAFE_METHODS:
+        return None
+    if not request.path.startswith(tuple(config['PATHS'])):
+        return None
+    if is_pinned(request, config):
+        return None
+    return random.choice(config['ALIASES'])
+
+
+class PrimaryStickinessMiddleware:
+    """Pick the request's read alias, and pin the client to the primary after writes"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = get_config()
+        token = _read_alias.set(choose_read_alias(request, config))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.finish(request, response, config)
+
+    async def __acall__(self, request):
+        # The alias is a ContextVar, so it follows the request into the
+        # threads the async ORM runs queries on
+        config = get_config()
+        token = _read_alias.set(choose_read_alias(request, config))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.finish(request, response, config)
+
+    def finish(self, request, response, config):
+        if config['ALIASES'] and request.method not in SAFE_METHODS and response.status_code < 400:
+            pin(request, response, config)
+        return response
+
+
+# -----------------------------
+# LOCAL SQLITE REPLICAS
+# -----------------------------
+def sync_replica(alias):
+    """Overwrite a SQLite replica with an online backup of the primary"""
+    connections[alias].close()
+    source = sqlite3.connect(connections[DEFAULT_DB_ALIAS].settings_dict['NAME'])
+    target = sqlite3.connect(connections[alias].settings_dict['NAME'])
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
@@ -0,0 +1,216 @@
+"""
+Full-text search over posts and their comments.
+
+SQLite:      FTS5 tables `blog_post_fts` (rowid = post id) and
+             `blog_comment_fts` (rowid = comment id), kept in sync by the
+             signal handlers below.
+PostgreSQL:  GIN expression indexes on `to_tsvector(...)` of the post and
+             comment columns; the index maintains itself, no sync needed.
+
+Other backends fall back to `icontains` filtering without ranking.
+
+Every backend searches titles, contents and comments, not tag names:
+tags are filtered on exactly with `?tag=` (blog/tagging.py).
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Comment, Post
+
+SNIPPET_START = '<mark>'
+SNIPPET_END = '</mark>'
+COMMENT_WEIGHT = 0.5  # comment matches rank below equally good post matches
+
+PG_CONFIG = 'english'
+PG_POST_DOCUMENT = (
+    f"to_tsvector('{PG_CONFIG}', coalesce(blog_post.title, '') || ' ' || coalesce(blog_post.content, ''))"
+)
+PG_COMMENT_DOCUMENT = f"to_tsvector('{PG_CONFIG}', coalesce(blog_comment.text, ''))"
+
+
+def backend():
+    return connection.vendor if connection.vendor in ('sqlite', 'postgresql') else None
+
+
+def fts5_query(text):
+    """Quote every term so user input can never be parsed as FTS5 syntax"""
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+# -----------------------------
+# QUERIES
+# -----------------------------
+# Each side uses FTS5's native `ORDER BY rank LIMIT n` so bm25 ordering
+# happens inside the index and snippets are built only for the top rows.
+# Post columns are weighted by the 'rank' option set in migration 0003.
+# A post whose best hit is a comment can be missed if several other posts'
+# comments fill the comment window; fine for a relevance-ordered search box.
+SQLITE_SEARCH = f"""
+    SELECT post_id, MIN(score) AS score, snippet FROM (
+        SELECT * FROM (
+            SELECT rowid AS post_id, rank AS score,
+                   snippet(blog_post_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet
+              FROM blog_post_fts WHERE blog_post_fts MATCH %s ORDER BY rank LIMIT %s
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT post_id, rank * {COMMENT_WEIGHT} AS score,
+                   snippet(blog_comment_fts, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet
+              FROM blog_comment_fts WHERE blog_comment_fts MATCH %s ORDER BY rank LIMIT %s
+        )
+    )
+    GROUP BY post_id ORDER BY score LIMIT %s OFFSET %s
+"""
+
+PG_SEARCH = f"""
+    WITH q AS (SELECT websearch_to_tsquery('{PG_CONFIG}', %s) AS query)
+    SELECT post_id, score, ts_headline('{PG_CONFIG}', body, q.query,
+           'StartSel={SNIPPET_START}, StopSel={SNIPPET_END}, MaxWords=16, MinWords=8') AS snippet
+      FROM (
+        SELECT DISTINCT ON (post_id) post_id, score, body FROM (
+            SELECT blog_post.id AS post_id, ts_rank({PG_POST_DOCUMENT}, q.query) AS score,
+                   blog_post.content AS body
+              FROM blog_post, q WHERE {PG_POST_DOCUMENT} @@ q.query
+            UNION ALL
+            SELECT blog_comment.post_id, ts_rank({PG_COMMENT_DOCUMENT}, q.query) * {COMMENT_WEIGHT},
+                   blog_comment.text
+              FROM blog_comment, q WHERE {PG_COMMENT_DOCUMENT} @@ q.query
+        ) matches ORDER BY post_id, score DESC
+      ) best, q
+     ORDER BY score DESC LIMIT %s OFFSET %s
+"""
+
+
+def search_posts(text, limit=20, offset=0):
+    """Return `[(post_id, snippet), ...]` best match first"""
+    engine = backend()
+    if engine == 'sqlite':
+        query = fts5_query(text)
+        if not query:
+            return []
+        window = limit + offset
+        sql, params = SQLITE_SEARCH, [query, window, query, window, limit, offset]
+    elif engine == 'postgresql':
+        sql, params = PG_SEARCH, [text, limit, offset]
+    else:
+        ids = (
+            Post.objects.filter(Q(title__icontains=text) | Q(content__icontains=text))
+            .order_by('-created_at').values_list('id', flat=True)[offset:offset + limit]
+        )
+        return [(post_id, '') for post_id in ids]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(post_id, snippet) for post_id, _, snippet in cursor.fetchall()]
+
+
+def matching_posts_filter(text):
+    """A `Q` selecting every post that matches `text`, for admin search"""
+    engine = backend()
+    if engine == 'sqlite':
+        query = fts5_query(text)
+        if not query:
+            return Q(pk__in=[])
+        return Q(pk__in=RawSQL(
+            "SELECT rowid FROM blog_post_fts WHERE blog_post_fts MATCH %s "
+            "UNION SELECT post_id FROM blog_comment_fts WHERE blog_comment_fts MATCH %s",
+            [query, query],
+        ))
+    if engine == 'postgresql':
+        return Q(pk__in=RawSQL(
+            f"SELECT id FROM blog_post WHERE {PG_POST_DOCUMENT} @@ websearch_to_tsquery('{PG_CONFIG}', %s) "
+            f"UNION SELECT post_id FROM blog_comment "
+            f"WHERE {PG_COMMENT_DOCUMENT} @@ websearch_to_tsquery('{PG_CONFIG}', %s)",
+            [text, text],
+        ))
+    return Q(title__icontains=text) | Q(content__icontains=text)
+
+
+# -----------------------------
+# INDEX MAINTENANCE (SQLite)
+# -----------------------------
+def index_post(post, created=False):
+    with connection.cursor() as cursor:
+        if not created:  # a brand-new post has no index row yet
+            cursor.execute("DELETE FROM blog_post_fts WHERE rowid = %s", [post.pk])
+        cursor.execute(
+            "INSERT INTO blog_post_fts (rowid, title, content) VALUES (%s, %s, %s)",
+            [post.pk, post.title, post.content],
+        )
+
+
+def index_new_posts(rows):
+    """Index freshly bulk-inserted posts: `rows` of (id, title, content)"""
+    if backend() != 'sqlite' or not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany("INSERT INTO blog_post_fts (rowid, title, content) VALUES (%s, %s, %s)", rows)
+
+
+def index_new_comments(comments):
+    """Index freshly bulk-inserted comments"""
+    if backend() != 'sqlite' or not comments:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO blog_comment_fts (rowid, text, post_id) VALUES (%s, %s, %s)",
+            [(comment.pk, comment.text, comment.post_id) for comment in comments],
+        )
+
+
+def index_comment(comment):
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM blog_comment_fts WHERE rowid = %s", [comment.pk])
+        cursor.execute(
+            "INSERT INTO blog_comment_fts (rowid, text, post_id) VALUES (%s, %s, %s)",
+            [comment.pk, comment.text, comment.post_id],
+        )
+
+
+def rebuild_index():
+    """Repopulate the SQLite FTS tables from scratch"""
+    if backend() != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM blog_post_fts")
+        cursor.execute("DELETE FROM blog_comment_fts")
+        cursor.execute("INSERT INTO blog_post_fts (rowid, title, content) SELECT id, title, content FROM blog_post")
+        cursor.execute(
+            "INSERT INTO blog_comment_fts (rowid, text, post_id) SELECT id, text, post_id FROM blog_comment"
+        )
+
+
+@receiver(post_save, sender=Post)
+def sync_post(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    if backend() != 'sqlite' or raw:
+        return
+    if update_fields and not {'title', 'content'} & set(update_fields):
+        return
+    index_post(instance, created=created)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    if backend() == 'sqlite':
+        with connection.cursor() as cursor:
+            # Cascaded comments fire their own post_delete below
+            cursor.execute("DELETE FROM blog_post_fts WHERE rowid = %s", [instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def sync_comment(sender, instance, raw=False, **kwargs):
+    if backend() == 'sqlite' and not raw:
+        index_comment(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    if backend() == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM blog_comment_fts WHERE rowid = %s", [instance.pk])
@@ -1,5 +1,41 @@
 from rest_framework import serializers
-from .models import User, Category, Post, Comment
+from . import images
+from .models import User, Category, Post, Comment, Tag, ImageAsset
+
+
+# -----------------------------
+# SPARSE FIELDSETS
+# -----------------------------
+class SparseFieldsMixin:
+    """
+    `fields=[...]` keeps only the named fields; `expand=[...]` keeps only the
+    named `Meta.expandable` relations nested, rendering the others by primary
+    key (to-many ones are dropped). See blog/fieldsets.py.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None:
+            for name in set(getattr(self.Meta, 'expandable', ())) - set(expand):
+                field = self.fields.get(name)
+                if isinstance(field, serializers.ListSerializer):
+                    self.fields.pop(name)
+                elif field is not None:  # replaced in place, keeping the field order
+                    source = {} if field.source == name else {'source': field.source}
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, **source)
+
+
+def limit_to_own_assets(fields, name, context):
+    """Only the requesting user's own uploads may be attached through `name`"""
+    field = fields.get(name)
+    if field is not None and not field.read_only:
+        user = getattr(context.get('request'), 'user', None)
+        owned = user is not None and user.is_authenticated
+        field.queryset = ImageAsset.objects.filter(uploaded_by=user) if owned else ImageAsset.objects.none()
+    return fields
 
 
 # -----------------------------
@@ -10,13 +46,44 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name']
 
+# -----------------------------
+# TAG SERIALIZER
+# -----------------------------
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ['id', 'name', 'post_count']
+
+
+class TagListField(serializers.ListField):
+    """Tags as a plain list of names, e.g. ["tech", "uzb"]"""
+    child = serializers.CharField(max_length=50)
+
+    def to_representation(self, data):
+        return [tag.name for tag in data.all()]
+
 # -----------------------------
 # USER SERIALIZER
 # -----------------------------
 class UserSerializer(serializers.ModelSerializer):
+    avatar_variants = serializers.JSONField(source='avatar_asset.variants', read_only=True, allow_null=True)
+
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'avatar', 'bio']
+        fields = ['id', 'username', 'email', 'avatar', 'avatar_variants', 'bio']
+
+
+class UserProfileSerializer(UserSerializer):
+    """A user with their activity counters (read from stored columns)"""
+
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + [
+            'avatar_asset', 'post_count', 'total_likes', 'follower_count', 'following_count',
+        ]
+        read_only_fields = ['post_count', 'total_likes', 'follower_count', 'following_count']
+
+    def get_fields(self):
+        return limit_to_own_assets(super().get_fields(), 'avatar_asset', self.context)
 
 # -----------------------------
 # COMMENT SERIALIZER
@@ -39,13 +106,29 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['author', 'created_at']
 
 
+class BatchCommentSerializer(CommentSerializer):
+    """CommentSerializer for /api/batch/, where the post is looked up once for the whole batch"""
+
+    class Meta(CommentSerializer.Meta):
+        read_only_fields = CommentSerializer.Meta.read_only_fields + ['post']
+
+
+class PostCommentSerializer(serializers.ModelSerializer):
+    """A comment listed under its post; the post itself is implied"""
+    author_username = serializers.CharField(source='author.username', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'author', 'author_username', 'text', 'created_at']
+
+
 # -----------------------------
 # POST SERIALIZER (List View)
 # -----------------------------
-class PostListSerializer(serializers.ModelSerializer):
+class PostListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
-    comment_count = serializers.IntegerField(source='comments.count', read_only=True)
+    image_variants = serializers.JSONField(source='image_asset.variants', read_only=True, allow_null=True)
 
     class Meta:
         model = Post
@@ -54,20 +137,50 @@ class PostListSerializer(serializers.ModelSerializer):
             'title',
             'author_username',
             'category_name',
+            'image_variants',
             'comment_count',
             'created_at',
         ]
 
 
+# Columns and relations PostListSerializer reads, for .only() / select_related()
+LIST_COLUMNS = (
+    'id', 'title', 'comment_count', 'created_at', 'author__username', 'category__name', 'image_asset__variants',
+)
+LIST_RELATIONS = ('author', 'category', 'image_asset')
+
+
+# -----------------------------
+# POST SERIALIZER (Search Results)
+# -----------------------------
+class PostSearchSerializer(PostListSerializer):
+    snippet = serializers.CharField(read_only=True)  # highlighted match, set by the view
+
+    class Meta(PostListSerializer.Meta):
+        fields = PostListSerializer.Meta.fields + ['snippet']
+
+
+# -----------------------------
+# POST SERIALIZER (Trending Feed)
+# -----------------------------
+class TrendingPostSerializer(PostListSerializer):
+    trending_score = serializers.FloatField(read_only=True)  # set by the view
+
+    class Meta(PostListSerializer.Meta):
+        fields = PostListSerializer.Meta.fields + ['trending_score']
+
+
 # -----------------------------
 # POST SERIALIZER (Detailed View)
 # -----------------------------
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     category = CategorySerializer(read_only=True)
-    comments = CommentSerializer(many=True, read_only=True)
+    # Only the first few comments; the rest are paged via /posts/{id}/comments/
+    comments = PostCommentSerializer(source='first_comments', many=True, read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     time_since_created = serializers.SerializerMethodField()
+    image_variants = serializers.JSONField(source='image_asset.variants', read_only=True, allow_null=True)
 
     class Meta:
         model = Post
@@ -77,11 +190,15 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'content',
             'author',
             'category',
+            'image_variants',
             'comments',
+            'comment_count',
             'created_at',
             'time_since_created',
         ]
         read_only_fields = ['author', 'created_at']
+        expandable = ['author', 'category', 'comments']
+        method_columns = {'time_since_created': ['created_at']}
 
     def get_time_since_created(self, obj):
         from django.utils.timesince import timesince
@@ -92,16 +209,52 @@ class PostDetailSerializer(serializers.ModelSerializer):
 # POST CREATE / UPDATE SERIALIZER
 # -----------------------------
 class PostCreateUpdateSerializer(serializers.ModelSerializer):
+    tags = TagListField(required=False)
+
     class Meta:
         model = Post
-        fields = ['title', 'content', 'category', 'image', 'tags']
+        fields = ['title', 'content', 'category', 'image', 'image_asset', 'tags']
         read_only_fields = ['author', 'views', 'likes', 'slug', 'created_at', 'updated_at']
 
+    def get_fields(self):
+        return limit_to_own_assets(super().get_fields(), 'image_asset', self.context)
+
     def create(self, validated_data):
-        return Post.objects.create(**validated_data)
+        tags = validated_data.pop('tags', [])
+        post = Post.objects.create(**validated_data)
+        post.set_tags(tags)
+        return post
 
     def update(self, instance, validated_data):
+        tags = validated_data.pop('tags', None)
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
-        return instance
\ No newline at end of file
+        if tags is not None:
+            instance.set_tags(tags)
+        return instance
+
+
+# -----------------------------
+# IMAGE SERIALIZERS
+# -----------------------------
+class ImageAssetSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImageAsset
+        fields = ['id', 'status', 'width', 'height', 'size', 'variants', 'created_at']
+        read_only_fields = fields
+
+
+class ImageUploadSerializer(serializers.Serializer):
+    """A multipart `file` field, checked with Pillow before anything is stored"""
+    file = serializers.FileField()
+
+    def validate_file(self, upload):
+        max_bytes = images.get_config()['MAX_BYTES']
+        if upload.size > max_bytes:
+            raise serializers.ValidationError(f"Images may not exceed {max_bytes} bytes.")
+        try:
+            return images.probe(upload.read())
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+
@@ -0,0 +1,217 @@
+"""
+SQLite backend tuned for a web workload.
+
+A drop-in replacement for `django.db.backends.sqlite3`
+(`'ENGINE': 'blog.sqlite'`) that adds, on top of the stock backend:
+
+- Pragmas applied to every new connection: WAL journaling,
+  `synchronous=NORMAL`, a memory-mapped read path, a larger page cache and
+  a busy timeout. Override or extend them with `OPTIONS['pragmas']`.
+- Read/write split: SELECTs issued outside a transaction go to a second,
+  `query_only` connection. Under WAL they never wait on the writer.
+  Everything else, including every statement inside `atomic()`, uses the
+  normal connection, so a request always reads its own writes. Django
+  keeps one wrapper per thread, so with persistent connections
+  (`CONN_MAX_AGE`) the reader connections form a per-process pool of
+  one per worker thread.
+- Serialized writes: write transactions and autocommit writes take a
+  process-wide lock per database file before touching SQLite. Writers
+  queue on the lock in order instead of racing on SQLite's sleep-and-retry
+  busy handler. Together with `transaction_mode='IMMEDIATE'`, a
+  transaction can never fail half-way with "database is locked" when it
+  upgrades from reading to writing.
+
+OPTIONS (everything else is passed to `sqlite3.connect` as usual):
+
+    'pragmas': {...}            merged over PRAGMAS below; None skips one
+    'split_reads': True         use the query_only reader connection
+    'serialize_writes': True    take the process-wide writer lock
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',      # fsync at checkpoints only; safe with WAL
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,     # negative = KiB, i.e. 64 MiB per connection
+    'busy_timeout': 5000,         # ms
+    'temp_store': 'MEMORY',
+}
+
+READ_STATEMENTS = ('SELECT',)
+
+_writer_locks = {}
+_writer_locks_guard = threading.Lock()
+
+
+def writer_lock(name):
+    """The lock serializing writers to database file `name` in this process"""
+    with _writer_locks_guard:
+        return _writer_locks.setdefault(str(name), threading.Lock())
+
+
+def is_read(sql):
+    return sql.lstrip(' \n\t(').upper().startswith(READ_STATEMENTS)
+
+
+class ReadWriteCursor:
+    """
+    DB-API cursor that sends each statement to the reader or the writer
+    connection and reads results back from whichever ran it.
+    """
+
+    def __init__(self, wrapper):
+        self.wrapper = wrapper
+        self.writer = wrapper.connection.cursor(factory=base.SQLiteCursorWrapper)
+        self.reader = None
+        self.active = self.writer
+
+    def route(self, sql):
+        if self.wrapper.in_atomic_block or not self.wrapper.autocommit:
+            return self.writer, False
+        if is_read(sql) and self.wrapper.split_reads:
+            if self.reader is None:
+                self.reader = self.wrapper.get_reader().cursor(factory=base.SQLiteCursorWrapper)
+            return self.reader, False
+        return self.writer, self.wrapper.serialize_writes
+
+    def execute(self, sql, params=None):
+        self.active, locked = self.route(sql)
+        if not locked:
+            return self.active.execute(sql, params)
+        with self.wrapper.write_lock():
+            return self.active.execute(sql, params)
+
+    def executemany(self, sql, param_list):
+        self.active, locked = self.route(sql)
+        if not locked:
+            return self.active.executemany(sql, param_list)
+        with self.wrapper.write_lock():
+            return self.active.executemany(sql, param_list)
+
+    def close(self):
+        self.writer.close()
+        if self.reader is not None:
+            self.reader.close()
+
+    def __iter__(self):
+        return iter(self.active)
+
+    def __getattr__(self, name):
+        # fetchone/fetchmany/fetchall, description, rowcount, lastrowid, ...
+        return getattr(self.active, name)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reader = None
+        self.holds_write_lock = False
+        self.pragmas = PRAGMAS
+        self.split_reads = self.serialize_writes = False  # set on connect
+
+    # -----------------------------
+    # CONNECTIONS
+    # -----------------------------
+    def get_connection_params(self):
+        options = dict(self.settings_dict['OPTIONS'])
+        self.pragmas = {**PRAGMAS, **options.pop('pragmas', {})}
+        self.split_reads = options.pop('split_reads', True) and not self.is_in_memory_db()
+        self.serialize_writes = options.pop('serialize_writes', True)
+        settings_dict = self.settings_dict
+        self.settings_dict = {**settings_dict, 'OPTIONS': options}
+        try:
+            return super().get_connection_params()
+        finally:
+            self.settings_dict = settings_dict
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        self.apply_pragmas(conn)
+        return conn
+
+    def apply_pragmas(self, conn, read_only=False):
+        for name, value in self.pragmas.items():
+            if value is None:
+                continue  # leave SQLite's default
+            if name == 'journal_mode' and (read_only or self.is_in_memory_db()):
+                continue  # persistent in the file; set by the writer
+            conn.execute(f'PRAGMA {name} = {value}')
+        if read_only:
+            conn.execute('PRAGMA query_only = ON')
+
+    def get_reader(self):
+        if self.reader is None:
+            # The stock setup (functions, foreign_keys, init_command) as for
+            # the writer, then our pragmas with query_only last
+            self.reader = super().get_new_connection(self.get_connection_params())
+            self.apply_pragmas(self.reader, read_only=True)
+        return self.reader
+
+    def create_cursor(self, name=None):
+        if not (self.split_reads or self.serialize_writes):
+            return super().create_cursor(name)
+        return ReadWriteCursor(self)
+
+    def _close(self):
+        try:
+            if self.reader is not None:
+                self.reader.close()
+        finally:
+            self.reader = None
+            self.release_write_lock()
+            super()._close()
+
+    # -----------------------------
+    # WRITER LOCK
+    # -----------------------------
+    @contextmanager
+    def write_lock(self):
+        """Hold the writer lock for one statement, unless a transaction already does"""
+        if self.holds_write_lock:
+            yield
+            return
+        self.acquire_write_lock()
+        try:
+            yield
+        finally:
+            self.release_write_lock()
+
+    def acquire_write_lock(self):
+        if self.holds_write_lock:
+            return
+        busy_timeout = self.pragmas['busy_timeout']
+        timeout = (PRAGMAS['busy_timeout'] if busy_timeout is None else busy_timeout) / 1000
+        if not writer_lock(self.settings_dict['NAME']).acquire(timeout=timeout):
+            raise OperationalError('database is locked (timed out waiting for the writer lock)')
+        self.holds_write_lock = True
+
+    def release_write_lock(self):
+        if self.holds_write_lock:
+            self.holds_write_lock = False
+            writer_lock(self.settings_dict['NAME']).release()
+
+    def _start_transaction_under_autocommit(self):
+        if self.serialize_writes:
+            self.acquire_write_lock()
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            self.release_write_lock()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_write_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_write_lock()
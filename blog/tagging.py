@@ -0,0 +1,83 @@
+"""
+Tag usage counts and tag filtering.
+
+`Tag.post_count` is kept current from the signals below, so `/api/tags/`
+reads counts straight off the `tag_popularity_idx` index:
+
+    m2m_changed post_add  +1 per tag actually added (Post.tags.add/set)
+    PostTag post_save     +1 for rows created directly (admin inline)
+    PostTag post_delete   -1 for every removed row, including remove(),
+                          clear(), set() and cascades from Post/Tag deletes
+"""
+from django.db.models import Exists, F, OuterRef
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Post, PostTag, Tag, normalize_tags
+
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+
+# Up to this many tagged posts, drive the query from the tag side
+DRIVING_TAG_LIMIT = 2000
+
+
+def filter_by_tags(queryset, names, match=MATCH_ALL):
+    """
+    Restrict a Post queryset to posts carrying all (or any) of `names`.
+
+    The precomputed usage counts pick the access path. A rare tag drives
+    the query from the (tag_id, post_id) index and sorts the few matches;
+    a popular tag is cheaper to test per post with an EXISTS probe on the
+    (post_id, tag_id) unique index while walking posts newest-first, which
+    stops as soon as a page is filled.
+    """
+    names = normalize_tags(names)
+    if not names:
+        return queryset
+    tags = sorted(Tag.objects.filter(name__in=names).values_list('post_count', 'id'))
+    if not tags or (match == MATCH_ALL and len(tags) < len(names)):
+        return queryset.none()
+
+    def tagged(tag_ids):
+        return PostTag.objects.filter(post=OuterRef('pk'), tag_id__in=tag_ids)
+
+    if match == MATCH_ANY:
+        tag_ids = [tag_id for _, tag_id in tags]
+        if sum(count for count, _ in tags) <= DRIVING_TAG_LIMIT:
+            return queryset.filter(pk__in=PostTag.objects.filter(tag_id__in=tag_ids).values('post_id'))
+        return queryset.filter(Exists(tagged(tag_ids)))
+
+    (rarest_count, rarest_id), others = tags[0], tags[1:]
+    if rarest_count <= DRIVING_TAG_LIMIT:
+        queryset = queryset.filter(pk__in=PostTag.objects.filter(tag_id=rarest_id).values('post_id'))
+    else:
+        others = tags
+    for _, tag_id in others:
+        queryset = queryset.filter(Exists(tagged([tag_id])))
+    return queryset
+
+
+# -----------------------------
+# USAGE COUNTS
+# -----------------------------
+@receiver(m2m_changed, sender=Post.tags.through)
+def count_added_tags(sender, action, reverse, pk_set, instance, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        # tag.posts.add(*posts): one tag gained len(pk_set) posts
+        Tag.objects.filter(pk=instance.pk).update(post_count=F('post_count') + len(pk_set))
+    else:
+        Tag.objects.filter(pk__in=pk_set).update(post_count=F('post_count') + 1)
+
+
+@receiver(post_save, sender=PostTag)
+def count_created_tag(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Tag.objects.filter(pk=instance.tag_id).update(post_count=F('post_count') + 1)
+
+
+@receiver(post_delete, sender=PostTag)
+def count_removed_tag(sender, instance, **kwargs):
+    Tag.objects.filter(pk=instance.tag_id, post_count__gt=0).update(post_count=F('post_count') - 1)
@@ -1,3 +1,1839 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db import OperationalError, close_old_connections, connection
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import images, live, loadtest
+from .authentication import user_cache
+from .bulk import export_posts, import_posts
+from .caching import ByteLRUCache, response_cache
+from .counters import flush_views, get_view_buffer
+from .denorm import recount
+from .fastpath import ValuesSerializer, values_serializer
+from .metrics import dump_metrics, registry
+from .models import (
+    Category, Comment, FeedEntry, Follow, ImageAsset, Post, Tag, TrendingScore, User, highest_slug_suffix,
+)
+from .routers import PrimaryStickinessMiddleware, ReplicaRouter
+from .search import matching_posts_filter
+from .serializers import PostDetailSerializer, PostListSerializer
+from .sqlite.base import DatabaseWrapper
+from .tagging import filter_by_tags
+from .trending import recompute as recompute_trending
+
+# Keep the background view flusher out of test runs; tests flush explicitly
+NO_VIEW_FLUSHER = override_settings(VIEW_COUNTER={'FLUSH_INTERVAL': 0})
+
+# The threaded tests can cross SLOW_QUERY_MS on a busy machine; keep those
+# warnings out of the test output (assertLogs still captures them)
+logging.getLogger('blog.slow_queries').addHandler(logging.NullHandler())
+
+
+# =============================================================
+# PAGINATION
+# =============================================================
+
+@override_settings(POST_PAGE_SIZE=3, POST_MAX_PAGE_SIZE=5)
+class PostPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='pass')
+        cls.posts = [Post.objects.create(author=cls.author, title=f"Post {i}", content="x") for i in range(8)]
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def collect(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            ids.extend(row['id'] for row in data['results'])
+            url = data['next']
+        return ids
+
+    def test_pages_cover_archive_newest_first(self):
+        expected = [p.id for p in sorted(self.posts, key=lambda p: (p.created_at, p.id), reverse=True)]
+        self.assertEqual(self.collect('/api/posts/'), expected)
+
+    def test_inserts_do_not_shift_pages(self):
+        first = self.client.get('/api/posts/').json()
+        Post.objects.create(author=self.author, title="Fresh", content="x")
+        second = self.client.get(first['next']).json()
+        seen = {row['id'] for row in first['results']}
+        self.assertFalse(seen & {row['id'] for row in second['results']})
+        self.assertEqual(len(second['results']), 3)
+
+    def test_previous_link_returns_same_page(self):
+        first = self.client.get('/api/posts/').json()
+        self.assertIsNone(first['previous'])
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(back['previous'])
+
+    def test_page_size_is_capped(self):
+        data = self.client.get('/api/posts/', {'page_size': 50}).json()
+        self.assertEqual(len(data['results']), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/posts/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_saved_is_paginated(self):
+        user = User.objects.create_user(username='reader', password='pass')
+        user.saved_posts.add(*self.posts[:4])
+        self.client.force_authenticate(user)
+        ids = self.collect('/api/posts/saved/')
+        self.assertEqual(sorted(ids), sorted(p.id for p in self.posts[:4]))
+
+
+# =============================================================
+# QUERY REGRESSIONS
+# =============================================================
+
+class RowCounter:
+    """DB-API cursor proxy counting the rows read back through it"""
+
+    def __init__(self, cursor, counter):
+        self.cursor, self.counter = cursor, counter
+
+    @classmethod
+    def counting(cls):
+        """An execute_wrapper counting fetched rows in its `fetched` attribute"""
+        def wrapper(execute, sql, params, many, context):
+            cursor = context['cursor']
+            if not isinstance(cursor.cursor, cls):
+                cursor.cursor = cls(cursor.cursor, wrapper)
+            return execute(sql, params, many, context)
+        wrapper.fetched = 0
+        return wrapper
+
+    def counted(self, rows):
+        self.counter.fetched += len(rows)
+        return rows
+
+    def fetchone(self):
+        row = self.cursor.fetchone()
+        self.counter.fetched += row is not None
+        return row
+
+    def fetchmany(self, *args):
+        return self.counted(self.cursor.fetchmany(*args))
+
+    def fetchall(self):
+        return self.counted(self.cursor.fetchall())
+
+    def __iter__(self):
+        for row in self.cursor:
+            self.counter.fetched += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+@NO_VIEW_FLUSHER
+class PostQueryCountTests(TestCase):
+    """SQL per request must not grow with the number of related rows"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', password='pass')
+        cls.reader = User.objects.create_user(username='reader', password='pass')
+        cls.post = Post.objects.create(author=cls.author, title="Hot", content="x")
+        Post.objects.create(author=cls.author, title="Quiet", content="x")
+        cls.reader.saved_posts.add(cls.post)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def grow_relations(self, count):
+        users = User.objects.bulk_create(User(username=f"fan-{i}") for i in range(count))
+        Comment.objects.bulk_create(Comment(post=self.post, author=u, text="hi") for u in users)
+        self.post.liked_by.add(*users)
+        self.post.saved_by.add(*users)
+        recount()  # bulk_create skips the counter signals
+
+    def capture(self, url):
+        rows = RowCounter.counting()
+        with CaptureQueriesContext(connection) as ctx, connection.execute_wrapper(rows):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.rows = rows.fetched
+        return [q['sql'] for q in ctx.captured_queries]
+
+    def assert_flat(self, url):
+        before = self.capture(url)
+        self.grow_relations(50)
+        after = self.capture(url)
+        self.assertEqual(len(before), len(after))
+        for sql in after:
+            # No many-to-many prefetch of likers/savers on read endpoints
+            self.assertNotIn('_prefetch_related_val', sql)
+        return after
+
+    def test_list_is_flat(self):
+        queries = self.assert_flat('/api/posts/')
+        self.assertEqual(len(queries), 2)  # conditional GET validator, page
+        self.assertEqual(self.rows, 1 + 2)  # the validator's aggregate, both posts; no likers or savers
+        self.assertNotIn('"blog_post"."content"', queries[-1])
+        data = self.client.get('/api/posts/').json()
+        counts = {row['id']: row['comment_count'] for row in data['results']}
+        self.assertEqual(counts[self.post.id], 50)
+
+    def test_saved_is_flat(self):
+        self.assertEqual(len(self.assert_flat('/api/posts/saved/')), 1)
+        self.assertEqual(self.rows, 1)
+
+    @override_settings(POST_DETAIL_COMMENTS=5)
+    def test_retrieve_is_flat(self):
+        queries = self.assert_flat(f'/api/posts/{self.post.id}/')
+        self.assertEqual(len(queries), 3)  # validator, post, first comments
+        self.assertEqual(self.rows, 1 + 1 + 5)  # validator, post, first 5 of the 50 comments
+
+
+# =============================================================
+# COMMENTS
+# =============================================================
+
+@NO_VIEW_FLUSHER
+@override_settings(POST_DETAIL_COMMENTS=3)
+class PostCommentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, title="Busy", content="x")
+        cls.comments = Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.author, text=f"c{i}") for i in range(10)
+        )
+        recount()  # bulk_create skips the counter signals
+        other = Post.objects.create(author=cls.author, title="Other", content="x")
+        Comment.objects.create(post=other, author=cls.author, text="elsewhere")
+
+    def test_detail_embeds_first_comments_and_count(self):
+        data = self.client.get(f'/api/posts/{self.post.id}/').json()
+        self.assertEqual(data['comment_count'], 10)
+        self.assertEqual([c['text'] for c in data['comments']], ['c0', 'c1', 'c2'])
+        self.assertNotIn('post_title', data['comments'][0])
+
+    def test_comments_endpoint_pages_forward_and_back(self):
+        url, seen, pages = f'/api/posts/{self.post.id}/comments/?page_size=4', [], []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                data = self.client.get(url).json()
+            pages.append(len(ctx.captured_queries))
+            seen += [c['id'] for c in data['results']]
+            last, url = data, data['next']
+        self.assertEqual(seen, [c.id for c in self.comments])
+        self.assertEqual(set(pages), {2})  # the post, then one page of comments
+
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual([c['id'] for c in previous['results']], seen[4:8])
+
+    def test_comments_endpoint_errors(self):
+        self.assertEqual(self.client.get('/api/posts/999999/comments/').status_code, 404)
+        response = self.client.get(f'/api/posts/{self.post.id}/comments/?cursor=junk')
+        self.assertEqual(response.status_code, 404)
+
+    def test_new_comment_invalidates_cached_page(self):
+        url = f'/api/posts/{self.post.id}/comments/?page_size=50'
+        self.assertEqual(len(self.client.get(url).json()['results']), 10)
+        Comment.objects.create(post=self.post, author=self.author, text="late")
+        self.assertEqual(len(self.client.get(url).json()['results']), 11)
+
+
+# =============================================================
+# LIKE / SAVE TOGGLES
+# =============================================================
+
+class PostToggleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, title="Hot", content="x")
+        fans = User.objects.bulk_create(User(username=f"fan-{i}") for i in range(100))
+        cls.post.liked_by.add(*fans)
+        cls.post.saved_by.add(*fans)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def test_like_toggles_without_loading_relation(self):
+        url = f'/api/posts/{self.post.id}/like/'
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(url)
+        self.assertEqual(response.json(), {'message': 'Liked', 'likes': 101})
+        for query in ctx.captured_queries:
+            self.assertFalse(query['sql'].startswith('SELECT') and '"blog_user"' in query['sql'])
+        response = self.client.post(url)
+        self.assertEqual(response.json(), {'message': 'Unliked', 'likes': 100})
+        self.assertEqual(self.post.liked_by.count(), 100)
+
+    def test_unlike_never_goes_negative(self):
+        Post.objects.filter(pk=self.post.pk).update(likes=0)  # drifted counter
+        self.post.liked_by.add(self.author)
+        response = self.client.post(f'/api/posts/{self.post.id}/like/')
+        self.assertEqual(response.json(), {'message': 'Unliked', 'likes': 0})
+
+    def test_save_toggles(self):
+        url = f'/api/posts/{self.post.id}/save_post/'
+        self.assertEqual(self.client.post(url).json()['message'], "Post saved")
+        self.assertTrue(self.post.saved_by.filter(pk=self.author.pk).exists())
+        self.assertEqual(self.client.post(url).json()['message'], "Post unsaved")
+        self.assertEqual(self.post.saved_by.count(), 100)
+
+
+@NO_VIEW_FLUSHER
+class AsyncViewTests(TestCase):
+    """The /api/async/ views must answer exactly like their DRF twins"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.category = Category.objects.create(name="Tech")
+        cls.posts = [
+            Post.objects.create(author=cls.author, category=cls.category, title=f"Post {i}", content="x")
+            for i in range(3)
+        ]
+        cls.posts[0].set_tags(['django'])
+        Comment.objects.create(post=cls.posts[-1], author=cls.author, text="first")
+
+    def bearer(self):
+        return {'Authorization': f'Bearer {AccessToken.for_user(self.author)}'}
+
+    async def assert_same_body(self, path):
+        response = await self.async_client.get(f'/api/async/{path}')
+        expected = await sync_to_async(self.client.get)(f'/api/{path}', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, expected.status_code)
+        # Identical apart from the URL prefix in pagination links
+        self.assertEqual(response.content, expected.content.replace(b'/api/', b'/api/async/'))
+
+    async def test_reads_match_drf_views(self):
+        for path in ['posts/', 'posts/?page_size=2', 'posts/?tag=django', 'posts/?cursor=junk',
+                     f'posts/{self.posts[-1].id}/', 'categories/']:
+            with self.subTest(path=path):
+                await self.assert_same_body(path)
+        response = await self.async_client.get('/api/async/posts/999999/')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_toggles(self):
+        url = f'/api/async/posts/{self.posts[0].id}/'
+        response = await self.async_client.post(url + 'like/', headers=self.bearer())
+        self.assertEqual(response.json(), {'message': 'Liked', 'likes': 1})
+        response = await self.async_client.post(url + 'like/', headers=self.bearer())
+        self.assertEqual(response.json(), {'message': 'Unliked', 'likes': 0})
+        response = await self.async_client.post(url + 'save_post/', headers=self.bearer())
+        self.assertEqual(response.json(), {'message': 'Post saved'})
+        self.assertEqual(await Post.objects.values_list('save_count', flat=True).aget(pk=self.posts[0].pk), 1)
+
+    async def test_toggle_errors(self):
+        url = f'/api/async/posts/{self.posts[0].id}/like/'
+        self.assertEqual((await self.async_client.post(url)).status_code, 401)
+        bad = {'Authorization': 'Bearer not.a.token'}
+        self.assertEqual((await self.async_client.post(url, headers=bad)).status_code, 401)
+        missing = await self.async_client.post('/api/async/posts/999999/like/', headers=self.bearer())
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual((await self.async_client.get(url)).status_code, 405)
+
+    @mock.patch('rest_framework_simplejwt.settings.api_settings.CHECK_REVOKE_TOKEN', True)
+    async def test_revoked_token_is_rejected(self):
+        url = f'/api/async/posts/{self.posts[0].id}/save_post/'
+        headers = await sync_to_async(self.bearer)()
+        self.assertEqual((await self.async_client.post(url, headers=headers)).status_code, 200)
+        self.author.set_password('changed')
+        await self.author.asave()  # drops the cached user, so the next request misses
+        response = await self.async_client.post(url, headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['detail'], "The user's password has been changed.")
+
+
+class PostLikeConcurrencyTests(TransactionTestCase):
+    """Hammer one hot post from many threads; the counter must not drift"""
+    THREADS = 8
+    TOGGLES_PER_THREAD = 15
+
+    def test_concurrent_likes_keep_count_consistent(self):
+        author = User.objects.create_user(username='author')
+        post = Post.objects.create(author=author, title="Hot", content="x")
+        users = [User.objects.create_user(username=f"fan-{i}") for i in range(self.THREADS * 2)]
+        errors = []
+
+        def worker(index):
+            client = APIClient()
+            try:
+                for i in range(self.TOGGLES_PER_THREAD):
+                    # Two threads share each user, so same-user races happen too
+                    client.force_authenticate(users[(index + i) % len(users)])
+                    while True:
+                        try:
+                            response = client.post(f'/api/posts/{post.id}/like/')
+                            break
+                        except OperationalError:
+                            time.sleep(0.001)  # SQLite writer lock; retry the whole toggle
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        self.assertEqual(post.likes, post.liked_by.count())
+
+
+# =============================================================
+# VIEW COUNTER
+# =============================================================
+
+@NO_VIEW_FLUSHER
+class ViewCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.posts = [Post.objects.create(author=cls.author, title=f"Post {i}", content="x") for i in range(3)]
+
+    def test_retrieve_buffers_views_without_writing(self):
+        client = APIClient()
+        with CaptureQueriesContext(connection) as ctx:
+            for _ in range(3):
+                client.get(f'/api/posts/{self.posts[0].id}/')
+        for query in ctx.captured_queries:
+            self.assertFalse(query['sql'].startswith('UPDATE'))
+        self.assertEqual(get_view_buffer().drain(), {self.posts[0].id: 3})
+
+    def test_flush_coalesces_into_batched_updates(self):
+        buffer = get_view_buffer()
+        for post, hits in zip(self.posts, (5, 1, 2)):
+            buffer.incr(post.id, hits)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(flush_views(batch_size=2), 3)
+        # Per batch: the views UPDATE and the trending score UPDATE
+        updates = [q['sql'].split()[1] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(updates, ['"blog_post"', '"blog_trendingscore"'] * 2)
+        views = dict(Post.objects.values_list('id', 'views'))
+        self.assertEqual([views[p.id] for p in self.posts], [5, 1, 2])
+        self.assertEqual(buffer.drain(), {})
+
+    def test_flush_does_not_touch_updated_at(self):
+        before = Post.objects.get(pk=self.posts[0].pk).updated_at
+        get_view_buffer().incr(self.posts[0].id)
+        flush_views()
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).updated_at, before)
+
+
+# =============================================================
+# RESPONSE CACHE
+# =============================================================
+
+@NO_VIEW_FLUSHER
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.category = Category.objects.create(name='Tech')
+        cls.post = Post.objects.create(author=cls.author, title="Cached", content="x", category=cls.category)
+
+    def setUp(self):
+        response_cache().clear()
+        self.client = APIClient()
+        self.detail = f'/api/posts/{self.post.id}/'
+
+    def test_anonymous_hit_skips_database(self):
+        first = self.client.get(self.detail)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.detail)
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get('/api/posts/')['ETag']
+        response = self.client.get('/api/posts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_query_params_are_part_of_key(self):
+        Post.objects.create(author=self.author, title="Second", content="x")
+        full = self.client.get('/api/posts/').json()
+        single = self.client.get('/api/posts/', {'page_size': 1}).json()
+        self.assertEqual(len(full['results']), 2)
+        self.assertEqual(len(single['results']), 1)
+
+    def test_comment_invalidates_list_and_its_post_only(self):
+        other = Post.objects.create(author=self.author, title="Other", content="x")
+        other_url = f'/api/posts/{other.id}/'
+        self.client.get('/api/posts/')
+        self.client.get(self.detail)
+        self.client.get(other_url)
+        Comment.objects.create(post=self.post, author=self.author, text="new")
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+        self.assertEqual(len(self.client.get(self.detail).json()['comments']), 1)
+        listed = self.client.get('/api/posts/').json()['results']
+        self.assertEqual({r['id']: r['comment_count'] for r in listed}[self.post.id], 1)
+
+    def test_category_rename_invalidates_detail(self):
+        self.client.get(self.detail)
+        self.category.name = 'Science'
+        self.category.save()
+        self.assertEqual(self.client.get(self.detail).json()['category']['name'], 'Science')
+
+    def test_authenticated_requests_bypass_cache(self):
+        self.client.get(self.detail)
+        self.client.force_authenticate(self.author)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.detail)
+        self.assertGreater(len(ctx.captured_queries), 0)
+
+    def test_lru_evicts_by_bytes(self):
+        cache = ByteLRUCache('', {'OPTIONS': {'MAX_BYTES': 2500}})
+        cache.set('a', b'x' * 1000)
+        cache.set('b', b'x' * 1000)
+        cache.get('a')
+        cache.set('c', b'x' * 1000)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+
+
+# =============================================================
+# SEARCH
+# =============================================================
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', is_staff=True, is_superuser=True)
+        cls.in_title = Post.objects.create(author=cls.author, title="Django performance", content="Notes.")
+        cls.in_body = Post.objects.create(author=cls.author, title="Misc", content="Some django tips here.")
+        cls.unrelated = Post.objects.create(author=cls.author, title="Cooking", content="Pasta.")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, q):
+        response = self.client.get('/api/posts/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_ranked_with_snippets(self):
+        results = self.search('django')
+        self.assertEqual([r['id'] for r in results], [self.in_title.id, self.in_body.id])
+        self.assertIn('<mark>', results[1]['snippet'])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.unrelated.content = "Pasta with django sauce"
+        self.unrelated.save()
+        self.assertIn(self.unrelated.id, [r['id'] for r in self.search('sauce')])
+        self.unrelated.delete()
+        self.assertEqual(self.search('sauce'), [])
+
+    def test_comments_are_searchable(self):
+        Comment.objects.create(post=self.unrelated, author=self.author, text="Needs more basil")
+        self.assertEqual([r['id'] for r in self.search('basil')], [self.unrelated.id])
+
+    def test_tag_names_are_not_searched(self):
+        # Same on every backend: tags are matched by ?tag=, not full-text search
+        self.unrelated.set_tags(['gardening'])
+        self.assertEqual(self.search('gardening'), [])
+        self.assertEqual(Post.objects.filter(matching_posts_filter('gardening')).count(), 0)
+        ids = [p['id'] for p in self.client.get('/api/posts/', {'tag': 'gardening'}).json()['results']]
+        self.assertEqual(ids, [self.unrelated.id])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(self.search('django" OR NEAR('), [])
+        self.assertEqual(self.client.get('/api/posts/search/').status_code, 400)
+
+    def test_admin_search_uses_index(self):
+        self.client.force_login(self.author)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/admin/blog/post/', {'q': 'django'})
+        self.assertContains(response, "Django performance")
+        self.assertNotContains(response, "Cooking")
+        self.assertTrue(any('blog_post_fts' in q['sql'] for q in ctx.captured_queries))
+
+
+# =============================================================
+# TAGS
+# =============================================================
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.both = Post.objects.create(author=cls.author, title="Both", content="x")
+        cls.both.set_tags(['Tech', 'uzb'])
+        cls.tech = Post.objects.create(author=cls.author, title="Tech", content="x")
+        cls.tech.set_tags(['tech'])
+        cls.plain = Post.objects.create(author=cls.author, title="Plain", content="x")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def listed(self, params):
+        return {row['id'] for row in self.client.get('/api/posts/', params).json()['results']}
+
+    def counts(self):
+        return dict(Tag.objects.values_list('name', 'post_count'))
+
+    def test_filter_all_and_any(self):
+        self.assertEqual(self.listed({'tag': ['tech', 'uzb']}), {self.both.id})
+        self.assertEqual(self.listed({'tag': ['tech', 'uzb'], 'tag_match': 'any'}), {self.both.id, self.tech.id})
+        self.assertEqual(self.listed({'tag': ['tech', 'missing']}), set())
+        self.assertEqual(len(self.listed({})), 3)
+
+    def test_popular_tag_path_matches_driving_path(self):
+        cases = [(['tech', 'uzb'], 'all'), (['tech', 'uzb'], 'any'), (['tech'], 'all')]
+        for names, match in cases:
+            driven = set(filter_by_tags(Post.objects.all(), names, match))
+            with mock.patch('blog.tagging.DRIVING_TAG_LIMIT', 0):
+                probed = set(filter_by_tags(Post.objects.all(), names, match))
+            self.assertEqual(driven, probed)
+
+    def test_counts_follow_changes(self):
+        self.assertEqual(self.counts(), {'tech': 2, 'uzb': 1})
+        self.plain.set_tags(['uzb', 'new'])
+        self.both.set_tags(['uzb'])
+        self.assertEqual(self.counts(), {'tech': 1, 'uzb': 2, 'new': 1})
+        self.both.delete()
+        self.assertEqual(self.counts(), {'tech': 1, 'uzb': 1, 'new': 1})
+
+    def test_tags_endpoint_orders_by_usage(self):
+        data = self.client.get('/api/tags/').json()
+        self.assertEqual([(t['name'], t['post_count']) for t in data], [('tech', 2), ('uzb', 1)])
+
+    def test_create_and_update_with_tags(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post('/api/posts/', {'title': "New", 'content': "x", 'tags': ['A', 'b']}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(sorted(response.json()['tags']), ['a', 'b'])
+        post = Post.objects.get(title="New")
+        self.client.patch(f'/api/posts/{post.id}/', {'tags': ['b']}, format='json')
+        self.assertEqual(list(post.tags.values_list('name', flat=True)), ['b'])
+        self.assertEqual(self.counts()['a'], 0)
+
+
+# =============================================================
+# SLUGS
+# =============================================================
+
+class SlugAllocationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def create(self, title="Hello World"):
+        return Post.objects.create(author=self.author, title=title, content="x")
+
+    def test_suffixes_count_numerically(self):
+        slugs = [self.create().slug for _ in range(12)]
+        self.assertEqual(slugs[:3], ['hello-world', 'hello-world-1', 'hello-world-2'])
+        self.assertEqual(slugs[-1], 'hello-world-11')
+
+    def test_similar_slugs_do_not_interfere(self):
+        self.create("Hello World Again")
+        self.create("Hello World-ish")
+        self.assertEqual(self.create().slug, 'hello-world')
+        self.assertEqual(self.create().slug, 'hello-world-1')
+
+    def test_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as first:
+            self.create()
+        for _ in range(20):
+            self.create()
+        with CaptureQueriesContext(connection) as later:
+            self.create()
+        self.assertEqual(len(first.captured_queries), len(later.captured_queries))
+
+    def test_suffix_lookup_uses_slug_index(self):
+        self.create()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(highest_slug_suffix('hello-world'), 0)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + ctx.captured_queries[0]['sql'])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertNotIn('SCAN blog_post', plan)
+        self.assertIn('sqlite_autoindex_blog_post_1 (slug>? AND slug<?)', plan)
+
+    def test_retries_when_slug_is_taken_concurrently(self):
+        self.create()
+        with mock.patch('blog.models.next_free_slug', side_effect=['hello-world', 'hello-world-1']):
+            self.assertEqual(self.create().slug, 'hello-world-1')
+
+    def test_empty_and_long_titles(self):
+        self.assertEqual(self.create("!!!").slug, 'post')
+        self.assertLessEqual(len(self.create("word " * 40).slug), 50)
+
+
+# =============================================================
+# BULK IMPORT / EXPORT
+# =============================================================
+
+class BulkImportExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        cls.writer = User.objects.create_user(username='writer')
+        Post.objects.create(author=cls.admin, title="Hello World", content="x")
+
+    def lines(self, *records):
+        return [json.dumps(r) if isinstance(r, dict) else r for r in records]
+
+    def test_import_batches(self):
+        result = import_posts(self.lines(
+            {'title': "Hello World", 'content': "a", 'author': 'writer', 'category': 'Tech', 'tags': ['X', 'y']},
+            {'title': "Hello World", 'content': "b", 'tags': ['x']},
+            {'title': "Dated", 'content': "c", 'created_at': '2020-01-02T03:04:05+00:00'},
+            'not json',
+            {'title': "", 'content': "d"},
+            {'title': "Ghost", 'content': "e", 'author': 'nobody'},
+        ), self.admin, batch_size=2)
+
+        self.assertEqual(result['created'], 3)
+        self.assertEqual(result['skipped'], 3)
+        self.assertEqual([line for line, _ in result['errors']], [4, 5, 6])
+        self.assertEqual(
+            set(Post.objects.filter(title="Hello World").values_list('slug', flat=True)),
+            {'hello-world', 'hello-world-1', 'hello-world-2'},
+        )
+        imported = Post.objects.get(content="a")
+        self.assertEqual((imported.author, imported.category.name), (self.writer, 'Tech'))
+        self.assertEqual(dict(Tag.objects.values_list('name', 'post_count')), {'x': 2, 'y': 1})
+        self.assertEqual(Post.objects.get(title="Dated").created_at.year, 2020)
+        self.assertEqual(self.client.get('/api/posts/search/', {'q': 'dated'}).json()['results'][0]['title'], "Dated")
+
+    def test_taken_explicit_slug_falls_back_past_taken_title(self):
+        Post.objects.create(author=self.admin, title="Taken", content="x")
+        result = import_posts(self.lines({'title': "Hello World", 'slug': 'taken', 'content': "new"}), self.admin)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(Post.objects.get(content="new").slug, 'hello-world-1')
+
+    def test_bad_optional_fields_are_reported_per_line(self):
+        bad = [
+            {'author': ['writer']},
+            {'category': {'name': 'Tech'}},
+            {'category': 'x' * 101},
+            {'created_at': '2024-13-45T00:00:00'},
+            {'created_at': 123},
+            {'created_at': 'yesterday'},
+            {'image': 'not a url'},
+            {'image': 7},
+            {'slug': 'has spaces'},
+            {'slug': 'x' * 51},
+        ]
+        lines = self.lines(*({'title': f"Bad {i}", 'content': "x", **fields} for i, fields in enumerate(bad)),
+                           {'title': "Good", 'content': "x", 'image': 'https://example.com/a.png'})
+        result = import_posts(lines, self.admin, batch_size=3)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual([line for line, _ in result['errors']], list(range(1, len(bad) + 1)))
+        self.assertIn("at most 50", dict(result['errors'])[10])
+        self.assertFalse(Post.objects.filter(title__startswith="Bad").exists())
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        response = client.post('/api/posts/import/', '\n'.join(lines[:5]), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)  # nothing created, no 500
+        self.assertEqual([e['line'] for e in response.json()['errors']], [1, 2, 3, 4, 5])
+
+    def test_export_round_trip(self):
+        import_posts(self.lines({'title': "Tagged", 'content': "x", 'category': 'Tech', 'tags': ['a']}), self.admin)
+        records = [json.loads(line) for line in export_posts(chunk_size=1)]
+        self.assertEqual([r['title'] for r in records], ["Hello World", "Tagged"])
+        self.assertEqual((records[1]['category'], records[1]['tags']), ('Tech', ['a']))
+
+        Post.objects.all().delete()
+        import_posts(export_posts(), self.admin)  # nothing left to export
+        import_posts([json.dumps(r) for r in records], self.admin)
+        self.assertEqual(set(Post.objects.values_list('slug', flat=True)), {'hello-world', 'tagged'})
+
+    def test_api_endpoints_are_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(self.writer)
+        self.assertEqual(client.get('/api/posts/export/').status_code, 403)
+
+        client.force_authenticate(self.admin)
+        body = '\n'.join(self.lines({'title': "Via API", 'content': "x"}, 'oops'))
+        response = client.post('/api/posts/import/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['errors'], [{'line': 2, 'error': response.json()['errors'][0]['error']}])
+
+        response = client.get('/api/posts/export/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+
+
+# =============================================================
+# SQLITE BACKEND
+# =============================================================
+
+class SQLiteBackendTests(TestCase):
+    """blog.sqlite against a scratch database file of its own"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, 'scratch.sqlite3')
+        self.db = self.open()
+        self.addCleanup(self.db.close)
+        with self.db.cursor() as cursor:
+            cursor.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, name TEXT)")
+
+    def open(self, **options):
+        settings_dict = {**connection.settings_dict, 'NAME': self.path, 'OPTIONS': options}
+        return DatabaseWrapper(settings_dict, alias='scratch')
+
+    def test_pragmas(self):
+        with self.db.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_autocommit_reads_use_reader(self):
+        with self.db.cursor() as cursor:
+            cursor.execute("INSERT INTO item (name) VALUES (%s)", ['a'])
+            cursor.execute("SELECT name FROM item")
+            self.assertEqual(cursor.fetchall(), [('a',)])
+            self.assertIs(cursor.cursor.active, cursor.cursor.reader)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.db.get_reader().execute("DELETE FROM item")  # query_only
+
+    def test_reader_runs_init_command(self):
+        db = self.open(init_command="PRAGMA case_sensitive_like = ON; PRAGMA recursive_triggers = ON")
+        self.addCleanup(db.close)
+        db.ensure_connection()
+        reader = db.get_reader()
+        self.assertEqual(reader.execute("PRAGMA recursive_triggers").fetchone(), (1,))
+        self.assertEqual(reader.execute("PRAGMA foreign_keys").fetchone(), (1,))
+        self.assertEqual(reader.execute("SELECT 'a' LIKE 'A'").fetchone(), (0,))
+
+    def test_transactions_read_their_writes(self):
+        self.db.set_autocommit(False)
+        try:
+            with self.db.cursor() as cursor:
+                cursor.execute("INSERT INTO item (name) VALUES (%s)", ['b'])
+                cursor.execute("SELECT count(*) FROM item")
+                self.assertEqual(cursor.fetchone(), (1,))
+                self.assertIs(cursor.cursor.active, cursor.cursor.writer)
+        finally:
+            self.db.rollback()
+            self.db.set_autocommit(True)
+
+    def test_writers_queue_on_lock(self):
+        self.db.ensure_connection()
+        self.db._start_transaction_under_autocommit()
+        try:
+            errors = []
+
+            def write():
+                other = self.open(pragmas={'busy_timeout': 100})
+                try:
+                    with other.cursor() as cursor:
+                        cursor.execute("INSERT INTO item (name) VALUES ('c')")
+                except OperationalError as exc:
+                    errors.append(str(exc))
+                finally:
+                    other.close()
+
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+            self.assertIn('writer lock', errors[0])
+        finally:
+            self.db.rollback()
+        self.assertFalse(self.db.holds_write_lock)
+
+    def test_busy_timeout_none_keeps_default_lock_wait(self):
+        db = self.open(pragmas={'busy_timeout': None})
+        self.addCleanup(db.close)
+        with db.cursor() as cursor:
+            cursor.execute("INSERT INTO item (name) VALUES ('d')")
+        with mock.patch('blog.sqlite.base.writer_lock') as lock:
+            db.acquire_write_lock()
+            db.release_write_lock()
+        lock.return_value.acquire.assert_called_once_with(timeout=5.0)
+
+
+# =============================================================
+# READ REPLICAS
+# =============================================================
+
+@override_settings(DATABASE_REPLICAS={'ALIASES': ['replica1'], 'PATHS': ['/api/posts/'], 'STICKY_SECONDS': 5})
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def bearer(self, user_id):
+        payload = base64.urlsafe_b64encode(json.dumps({'user_id': user_id}).encode()).decode().rstrip('=')
+        return {'HTTP_AUTHORIZATION': f'Bearer e30.{payload}.sig'}
+
+    def serve(self, request, status=200):
+        """Run `request` through the middleware; returns (read alias used, response)"""
+        seen = []
+
+        def view(request):
+            seen.append(ReplicaRouter().db_for_read(Post))
+            return HttpResponse(status=status)
+
+        response = PrimaryStickinessMiddleware(view)(request)
+        return seen[0], response
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.serve(self.factory.get('/api/posts/'))[0], 'replica1')
+        self.assertEqual(self.serve(self.factory.get('/api/auth/login/'))[0], 'default')
+        self.assertEqual(self.serve(self.factory.post('/api/posts/'))[0], 'default')
+        self.assertEqual(ReplicaRouter().db_for_read(Post), 'default')  # outside a request
+        self.assertEqual(ReplicaRouter().db_for_write(Post), 'default')
+
+    def test_write_pins_cookie_and_user(self):
+        _, response = self.serve(self.factory.post('/api/posts/1/like/', **self.bearer(7)), status=201)
+        cookie = response.cookies['db_primary_until']
+        self.assertEqual(cookie['max-age'], 5)
+
+        self.factory.cookies['db_primary_until'] = cookie.value
+        self.assertEqual(self.serve(self.factory.get('/api/posts/'))[0], 'default')
+        self.factory.cookies.clear()
+        self.assertEqual(self.serve(self.factory.get('/api/posts/', **self.bearer(7)))[0], 'default')
+        self.assertEqual(self.serve(self.factory.get('/api/posts/', **self.bearer(8)))[0], 'replica1')
+
+    def test_failed_write_does_not_pin(self):
+        _, response = self.serve(self.factory.post('/api/posts/', **self.bearer(7)), status=400)
+        self.assertNotIn('db_primary_until', response.cookies)
+        self.assertEqual(self.serve(self.factory.get('/api/posts/', **self.bearer(7)))[0], 'replica1')
+
+    def test_expired_pin(self):
+        self.factory.cookies['db_primary_until'] = str(time.time() - 1)
+        self.assertEqual(self.serve(self.factory.get('/api/posts/'))[0], 'replica1')
+
+
+# =============================================================
+# DENORMALIZED COUNTERS
+# =============================================================
+
+class CounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, title="Counted", content="x")
+
+    def assert_counts(self, **expected):
+        post = Post.objects.get(pk=self.post.pk)
+        author = User.objects.get(pk=self.author.pk)
+        actual = {
+            'comments': post.comment_count, 'likes': post.likes, 'saves': post.save_count,
+            'posts': author.post_count, 'total_likes': author.total_likes,
+        }
+        self.assertEqual({k: actual[k] for k in expected}, expected)
+
+    def test_comments_and_posts(self):
+        self.assert_counts(comments=0, posts=1)
+        comment = Comment.objects.create(post=self.post, author=self.reader, text="hi")
+        Comment.objects.create(post=self.post, author=self.reader, text="again")
+        self.assert_counts(comments=2)
+        comment.delete()
+        self.assert_counts(comments=1)
+
+        other = Post.objects.create(author=self.author, title="Doomed", content="x")
+        other.liked_by.add(self.reader)
+        self.assert_counts(posts=2, total_likes=1)
+        with CaptureQueriesContext(connection) as ctx:
+            Comment.objects.bulk_create(Comment(post=other, author=self.reader, text="x") for _ in range(5))
+            other.delete()
+        self.assertFalse([q for q in ctx.captured_queries if 'comment_count' in q['sql']])
+        self.assert_counts(posts=1, total_likes=0)
+
+    def test_likes_and_saves_from_every_path(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        client.post(f'/api/posts/{self.post.id}/like/')
+        client.post(f'/api/posts/{self.post.id}/save_post/')
+        self.assert_counts(likes=1, total_likes=1, saves=1)
+
+        self.post.liked_by.remove(self.reader, self.author)  # author never liked it
+        self.assert_counts(likes=0, total_likes=0)
+        self.reader.liked_posts.add(self.post)
+        self.author.liked_posts.add(self.post)
+        self.assert_counts(likes=2, total_likes=2)
+        self.post.liked_by.clear()
+        self.reader.saved_posts.clear()
+        self.assert_counts(likes=0, total_likes=0, saves=0)
+
+    def test_deleting_a_user_takes_back_their_likes_and_saves(self):
+        score = TrendingScore.objects.get(post=self.post).score
+        self.post.liked_by.add(self.reader)
+        self.post.saved_by.add(self.reader)
+        self.assert_counts(likes=1, total_likes=1, saves=1)
+
+        self.reader.delete()
+        self.assert_counts(likes=0, total_likes=0, saves=0)
+        self.assertAlmostEqual(TrendingScore.objects.get(post=self.post).score, score)
+        self.assertEqual(recount(), {'post': 0, 'tag': 0, 'user': 0})
+
+    def test_recount_repairs_drift(self):
+        self.post.liked_by.add(self.reader)
+        Comment.objects.create(post=self.post, author=self.reader, text="hi")
+        Post.objects.filter(pk=self.post.pk).update(comment_count=7, likes=0)
+        User.objects.filter(pk=self.author.pk).update(post_count=0)
+
+        out = io.StringIO()
+        call_command('recount', stdout=out)
+        self.assertIn("post: 1 row(s) fixed", out.getvalue())
+        self.assertIn("user: 1 row(s) fixed", out.getvalue())
+        self.assert_counts(comments=1, likes=1, posts=1, total_likes=1)
+        self.assertEqual(recount(), {'post': 0, 'tag': 0, 'user': 0})
+
+    def test_list_reads_stored_counters(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/posts/')
+        self.assertEqual(len(ctx.captured_queries), 2)  # validator, page
+        self.assertNotIn('blog_comment', ctx.captured_queries[-1]['sql'])
+        profile = APIClient()
+        profile.force_authenticate(self.author)
+        data = profile.get(f'/api/users/{self.author.id}/').json()
+        self.assertEqual((data['post_count'], data['total_likes']), (1, 0))
+
+
+# =============================================================
+# JWT USER LOOKUP
+# =============================================================
+
+class JWTUserLookupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer', email='w@example.com', password='pw-12345')
+
+    def setUp(self):
+        user_cache.invalidate()
+        token = self.client.post('/api/auth/login/', {'username': 'writer', 'password': 'pw-12345'}).json()
+        self.auth = {'HTTP_AUTHORIZATION': f"Bearer {token['access']}"}
+
+    def user_queries(self, method, path, **extra):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(path, **{**self.auth, **extra})
+        return response, [q['sql'] for q in ctx.captured_queries if 'FROM "blog_user"' in q['sql']]
+
+    def test_cache_mode_skips_user_query_until_user_changes(self):
+        response, queries = self.user_queries('get', '/api/posts/saved/')
+        self.assertEqual((response.status_code, len(queries)), (200, 1))
+        response, queries = self.user_queries('get', '/api/posts/saved/')
+        self.assertEqual((response.status_code, queries), (200, []))
+
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.user_queries('get', '/api/posts/saved/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_USER_LOOKUP={'MODE': 'claims'})
+    def test_claims_mode_never_queries_user(self):
+        response, queries = self.user_queries(
+            'post', '/api/posts/', data={'title': 'From claims', 'content': 'x'}, content_type='application/json',
+        )
+        self.assertEqual((response.status_code, queries), (201, []))
+        self.assertEqual(Post.objects.get(title='From claims').author, self.user)
+
+    @override_settings(JWT_USER_LOOKUP={'MODE': 'db'})
+    def test_db_mode_queries_every_time(self):
+        for _ in range(2):
+            self.assertEqual(len(self.user_queries('get', '/api/posts/saved/')[1]), 1)
+
+
+# =============================================================
+# FAST-PATH SERIALIZATION
+# =============================================================
+
+class FastSerializationTests(TestCase):
+    """FAST_SERIALIZATION and the JSON encoders must not change a single byte"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='ünïcode')
+        category = Category.objects.create(name="Tech\u2028news")
+        Category.objects.create(name="Art")
+        image = ImageAsset.objects.create(
+            digest='0' * 64, original='images/originals/00/0.png', width=640, height=480, size=1,
+            variants={'original': '/media/images/originals/00/0.png', 'srcset': {'webp': '/media/a.webp 320w'}},
+        )
+        for i in range(5):
+            post = Post.objects.create(
+                author=author, category=category if i % 2 else None, title=f"Post {i} — ✓", content="x",
+                image_asset=image if i < 2 else None,
+            )
+            post.set_tags(['django'] if i < 3 else [])
+            post.saved_by.add(cls.reader)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def fetch_all(self, paths):
+        bodies = []
+        for path in paths:
+            response_cache().clear()
+            response = self.client.get(path)
+            bodies.append((response.status_code, response.content))
+        return bodies
+
+    def test_byte_identical(self):
+        paths = ['/api/posts/', '/api/posts/?page_size=2', '/api/posts/?tag=django',
+                 '/api/posts/saved/', '/api/categories/', '/api/async/posts/', '/api/async/categories/']
+        first_page = self.client.get('/api/posts/?page_size=2').json()
+        paths += [first_page['next'], '/api/posts/?page_size=2&cursor=junk']
+        expected = self.fetch_all(paths)
+        self.assertIn('\\u2028'.encode(), expected[4][1])
+
+        for fast in (False, True):
+            for encoder in ('blog.renderers.stdlib_dumps', 'blog.renderers.orjson_dumps'):
+                with self.subTest(fast=fast, encoder=encoder):
+                    with override_settings(FAST_SERIALIZATION=fast, JSON_ENCODER=encoder):
+                        self.assertEqual(self.fetch_all(paths), expected)
+
+    def test_datetimes_follow_current_timezone(self):
+        fast = values_serializer(PostListSerializer)
+        queryset = Post.objects.select_related('author', 'category')
+        with timezone.override('Asia/Tashkent'):
+            expected = PostListSerializer(queryset, many=True).data
+            self.assertEqual(fast.serialize(fast.rows(queryset)), expected)
+        self.assertTrue(expected[0]['created_at'].endswith('+05:00'))
+
+    @override_settings(FAST_SERIALIZATION=True)
+    def test_fast_list_is_one_plain_query(self):
+        response_cache().clear()
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/posts/')
+        self.assertEqual(len(ctx.captured_queries), 2)  # validator, page
+        self.assertNotIn('"content"', ctx.captured_queries[-1]['sql'])
+
+    def test_unsupported_fields_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ValuesSerializer(PostDetailSerializer)
+
+
+# =============================================================
+# METRICS
+# =============================================================
+
+@NO_VIEW_FLUSHER
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, title="Measured", content="x")
+
+    def setUp(self):
+        registry.clear()
+        response_cache().clear()
+
+    def metrics(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    def test_records_per_view(self):
+        body = self.client.get('/api/posts/').content
+        self.client.get(f'/api/posts/{self.post.id}/')
+        text = self.metrics()
+        self.assertIn('blog_requests_total{view="post-list",status="200"} 1', text)
+        self.assertIn('blog_requests_total{view="post-detail",status="200"} 1', text)
+        self.assertIn('blog_db_queries_sum{view="post-list"} 2', text)  # validator, page
+        self.assertIn('blog_db_queries_sum{view="post-detail"} 3', text)  # validator, post, first comments
+        self.assertIn(f'blog_response_bytes_sum{{view="post-list"}} {len(body)}', text)
+        self.assertIn('blog_request_duration_seconds_bucket{view="post-list",le="+Inf"} 1', text)
+        serializer_sum = next(
+            line for line in text.splitlines()
+            if line.startswith('blog_serializer_duration_seconds_sum{view="post-list"}')
+        )
+        self.assertGreater(float(serializer_sum.split()[-1]), 0)
+
+    async def test_async_queries_are_attributed(self):
+        await self.async_client.get('/api/async/posts/')
+        text = await sync_to_async(self.metrics)()
+        self.assertIn('blog_db_queries_sum{view="async-post-list"} 1', text)
+
+    def test_slow_query_log_names_project_frames(self):
+        with override_settings(METRICS={'SLOW_QUERY_MS': 0}), self.assertLogs('blog.slow_queries') as logs:
+            self.client.get(f'/api/posts/{self.post.id}/')
+        self.assertIn('in post-detail', logs.output[0])
+        self.assertIn('blog/views.py', '\n'.join(logs.output))
+        self.assertIn('blog_slow_queries_total{view="post-detail"} 3', self.metrics())
+
+    def test_access_and_dump(self):
+        with override_settings(METRICS={'ALLOWED_IPS': ['10.0.0.1']}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.get('/api/categories/')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.prom')
+            dump_metrics(path)
+            with open(path, encoding='utf-8') as f:
+                self.assertIn('view="category-list"', f.read())
+
+
+# =============================================================
+# LOAD TEST HARNESS
+# =============================================================
+
+class LoadTestTests(TestCase):
+    def test_seed_and_default_mix(self):
+        dataset = loadtest.seed(users=5, posts=30, comments=50, likes=40, rng=random.Random(1))
+        self.assertEqual((dataset['users'], dataset['posts'], dataset['comments']), (5, 30, 50))
+        self.assertEqual(Post.objects.get(pk=Comment.objects.first().post_id).comment_count,
+                         Comment.objects.filter(post_id=Comment.objects.first().post_id).count())
+
+        keys = loadtest.dataset_keys(5)
+        results = [loadtest.run_worker(loadtest.InProcessTarget(), loadtest.DEFAULT_MIX, keys, 150, seed=2)]
+        report = loadtest.report(results, results[0][1], {}, dataset, loadtest.DEFAULT_MIX)
+        self.assertEqual(report['totals']['requests'], 150)
+        self.assertEqual(report['totals']['errors'], 0, report['operations'])
+        self.assertGreater(report['totals']['queries_per_request'], 0)
+        self.assertIn('p99_ms', report['operations']['post-list']['latency'])
+        json.dumps(report)
+
+    def test_server_totals_over_https_and_when_unreachable(self):
+        with mock.patch('http.client.HTTPSConnection.request', side_effect=OSError) as request:
+            self.assertIsNone(loadtest.server_query_totals('https://bench.example/blog'))
+        request.assert_called_once_with('GET', '/blog/metrics')
+        self.assertIsNone(loadtest.server_query_totals('http://127.0.0.1:9'))
+
+    def test_workload_replay(self):
+        operations = loadtest.load_workload([
+            '{"method": "get", "path": "/api/categories/"}',
+            '',
+            '{"path": "/api/posts/missing/", "name": "missing", "weight": 2}',
+        ])
+        self.assertEqual([op.name for op in operations], ['GET /api/categories/', 'missing'])
+        plan = loadtest.plan(operations, 3, random.Random(), replay=True, offset=1)
+        self.assertEqual([op.name for op in plan], ['missing', 'GET /api/categories/', 'missing'])
+        with self.assertRaisesMessage(ValueError, 'line 1'):
+            loadtest.load_workload(['{"method": "GET"}'])
+
+        keys = {'post': [1], 'tag': ['x'], 'word': ['y'], 'tokens': []}
+        samples, _ = loadtest.run_worker(loadtest.InProcessTarget(), operations, keys, 2, replay=True)
+        self.assertEqual(samples['missing']['statuses'], {'404': 1})
+        self.assertEqual(samples['missing']['errors'], 1)
+
+
+# =============================================================
+# TRENDING FEED
+# =============================================================
+
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [User.objects.create_user(username=f'reader{i}') for i in range(3)]
+        cls.quiet = Post.objects.create(author=cls.author, title="Quiet", content="x")
+        cls.busy = Post.objects.create(author=cls.author, title="Busy", content="x")
+
+    def score(self, post):
+        return TrendingScore.objects.get(post=post).score
+
+    def feed(self, url='/api/posts/trending/'):
+        return self.client.get(url).json()
+
+    def test_interactions_update_scores_incrementally(self):
+        initial = self.score(self.busy)
+        client = APIClient()
+        client.force_authenticate(self.readers[0])
+        with CaptureQueriesContext(connection) as ctx:
+            client.post(f'/api/posts/{self.busy.id}/like/')
+        self.assertEqual(len([q for q in ctx.captured_queries if 'blog_trendingscore' in q['sql']]), 1)
+        self.assertAlmostEqual(self.score(self.busy), initial + 1)  # log2(1 + 1)
+
+        client.post(f'/api/posts/{self.busy.id}/save_post/')
+        Comment.objects.create(post=self.busy, author=self.readers[1], text="hi")
+        self.busy.liked_by.add(*self.readers[1:])
+        self.assertAlmostEqual(self.score(self.busy), initial + math.log2(1 + 3 + 3 + 2))
+        self.assertEqual([p['id'] for p in self.feed()['results']], [self.busy.id, self.quiet.id])
+
+        self.busy.liked_by.clear()
+        self.readers[0].saved_posts.clear()
+        self.busy.comments.all().delete()
+        self.assertAlmostEqual(self.score(self.busy), initial)
+
+    def test_decay_and_recompute(self):
+        week_ago = timezone.now() - timezone.timedelta(days=7)
+        old = Post.objects.create(author=self.author, title="Old", content="x")
+        Post.objects.filter(pk=old.pk).update(created_at=week_ago, likes=1000)
+        self.busy.liked_by.add(self.readers[0])
+        Post.objects.filter(pk=self.busy.pk).update(views=20)  # +1 at 0.05 per view
+
+        out = io.StringIO()
+        call_command('recompute_trending', stdout=out)
+        self.assertIn("Rescored 3 post(s)", out.getvalue())
+        self.assertAlmostEqual(self.score(self.busy) - self.score(self.quiet), math.log2(3), places=4)
+        # 14 half-lives ago: 1000 likes are worth ~0.06 of a fresh post's
+        self.assertEqual([p['id'] for p in self.feed()['results']], [self.busy.id, self.quiet.id, old.id])
+
+    def test_view_flush_rescored(self):
+        get_view_buffer().drain()
+        initial = self.score(self.quiet)
+        for _ in range(20):
+            self.client.get(f'/api/posts/{self.quiet.id}/')
+        flush_views()
+        self.assertAlmostEqual(self.score(self.quiet), initial + 1)
+
+    def test_cursor_pages_and_deletes(self):
+        posts = [Post.objects.create(author=self.author, title=f"P{i}", content="x") for i in range(5)]
+        recompute_trending()
+        with CaptureQueriesContext(connection) as ctx:
+            page = self.feed('/api/posts/trending/?page_size=3')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(set(page['results'][0]), {  # no category_name: uncategorized
+            'id', 'title', 'author_username', 'image_variants', 'comment_count', 'created_at', 'trending_score',
+        })
+
+        seen = [p['id'] for p in page['results']]
+        posts[0].delete()
+        while page['next']:
+            page = self.feed(page['next'])
+            seen += [p['id'] for p in page['results']]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertNotIn(posts[0].id, seen[3:])
+        self.assertEqual(TrendingScore.objects.count(), Post.objects.count())
+        self.assertEqual(self.client.get('/api/posts/trending/?cursor=bogus').status_code, 404)
+
+    def test_bulk_import_gets_scores(self):
+        lines = ['{"title": "Imported", "content": "x", "created_at": "2024-01-01T00:00:00+00:00"}']
+        import_posts(lines, self.author)
+        imported = Post.objects.get(title="Imported")
+        self.assertLess(self.score(imported), self.score(self.quiet))
+
+
+# =============================================================
+# FOLLOWING FEED
+# =============================================================
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        cls.author = User.objects.create_user(username='author')
+        cls.celebrity = User.objects.create_user(username='celebrity')
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def follow(self, follower, followee):
+        client = APIClient()
+        client.force_authenticate(follower)
+        return client.post(f'/api/users/{followee.id}/follow/')
+
+    def feed_ids(self, page_size=2):
+        ids, url = [], f'/api/feed/?page_size={page_size}'
+        while url:
+            page = self.client.get(url).json()
+            ids += [post['id'] for post in page['results']]
+            url = page['next']
+        return ids
+
+    def test_follow_endpoints(self):
+        self.assertEqual(self.follow(self.reader, self.author).json(), {'following': True})
+        self.assertEqual(self.follow(self.reader, self.author).status_code, 200)  # idempotent
+        self.assertEqual(self.follow(self.reader, self.reader).status_code, 400)
+        self.assertEqual(APIClient().post(f'/api/users/{self.author.id}/follow/').status_code, 401)
+        self.author.refresh_from_db()
+        self.reader.refresh_from_db()
+        self.assertEqual((self.author.follower_count, self.reader.following_count), (1, 1))
+        self.assertEqual(self.client.post(f'/api/users/{self.author.id}/unfollow/').json(), {'following': False})
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.follower_count, 0)
+
+    def test_strategies_serve_the_same_feed(self):
+        with override_settings(FEED={'MODE': 'push'}):
+            for followee in (self.author, self.celebrity):
+                self.follow(self.reader, followee)
+            self.follow(self.fan, self.celebrity)
+            posts = []
+            for i in range(3):
+                for author in (self.author, self.celebrity, self.stranger):
+                    posts.append(Post.objects.create(author=author, title=f"{author} {i}", content="x"))
+        expected = [p.id for p in reversed(posts) if p.author_id != self.stranger.id]
+
+        for mode in ('push', 'pull', 'hybrid'):
+            with self.subTest(mode=mode), override_settings(FEED={'MODE': mode, 'CELEBRITY_FOLLOWERS': 2}):
+                self.assertEqual(self.feed_ids(), expected)  # hybrid: inbox and pull overlap, shown once
+        with override_settings(FEED={'MODE': 'hybrid', 'CELEBRITY_FOLLOWERS': 2}):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get('/api/feed/')
+            self.assertEqual(len(ctx.captured_queries), 2)  # inbox page, celebrity timelines page
+
+    def test_hybrid_pulls_celebrities(self):
+        with override_settings(FEED={'MODE': 'hybrid', 'CELEBRITY_FOLLOWERS': 2}):
+            for follower in (self.reader, self.fan):
+                self.follow(follower, self.celebrity)
+            self.follow(self.reader, self.author)
+            loud = Post.objects.create(author=self.celebrity, title="Loud", content="x")
+            quiet = Post.objects.create(author=self.author, title="Quiet", content="x")
+            self.assertFalse(FeedEntry.objects.filter(post=loud).exists())
+            self.assertEqual(FeedEntry.objects.filter(post=quiet).count(), 1)
+            self.assertEqual(self.feed_ids(), [quiet.id, loud.id])
+
+    def test_inbox_bounded_and_consistent(self):
+        with override_settings(FEED={'MODE': 'push', 'INBOX_SIZE': 3, 'TRIM_EVERY': 1}):
+            Post.objects.create(author=self.author, title="Before", content="x")
+            self.follow(self.reader, self.author)  # backfills the existing post
+            posts = [Post.objects.create(author=self.author, title=f"P{i}", content="x") for i in range(4)]
+            self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 3)
+            self.assertEqual(self.feed_ids(), [p.id for p in reversed(posts[1:])])
+
+            posts[3].delete()
+            self.assertEqual(self.feed_ids(), [posts[2].id, posts[1].id])
+            self.client.post(f'/api/users/{self.author.id}/unfollow/')
+            self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+            self.assertEqual(self.feed_ids(), [])
+        self.assertEqual(APIClient().get('/api/feed/').status_code, 401)
+
+
+# =============================================================
+# IMAGES
+# =============================================================
+
+class ImageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='photographer')
+
+    def setUp(self):
+        self.media_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(
+            MEDIA_ROOT=self.media_root, IMAGES={'WORKERS': 0, 'WIDTHS': [64, 128, 4096]},
+        ))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def image_bytes(self, size=(300, 200), fmt='PNG', color='teal'):
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color).save(buffer, fmt)
+        return buffer.getvalue()
+
+    def upload(self, data, client=None, name='photo.png'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return (client or self.client).post('/api/images/', {'file': SimpleUploadedFile(name, data)})
+
+    def test_upload_generates_content_addressed_variants(self):
+        data = self.image_bytes()
+        response = self.upload(data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['status'], 'pending')  # resized after the response is built
+
+        asset = self.client.get(f"/api/images/{response.json()['id']}/").json()
+        self.assertEqual((asset['status'], asset['width'], asset['height']), ('ready', 300, 200))
+        variants = asset['variants']
+        self.assertEqual(sorted(variants['webp']), ['128', '64'])  # never upscaled past 300px
+        self.assertEqual(sorted(variants['jpeg']), ['128', '64'])
+        self.assertEqual(variants['srcset']['webp'], f"{variants['webp']['64']} 64w, {variants['webp']['128']} 128w")
+        for url in [variants['original'], *variants['webp'].values(), *variants['jpeg'].values()]:
+            name = url.removeprefix('/media/')
+            with open(os.path.join(self.media_root, name), 'rb') as f:
+                self.assertIn(hashlib.sha256(f.read()).hexdigest()[:32], name)
+
+        again = self.upload(data)
+        self.assertEqual((again.status_code, again.json()['id']), (200, asset['id']))
+        self.assertEqual(ImageAsset.objects.count(), 1)
+
+    def test_rejects_invalid_uploads(self):
+        self.assertEqual(self.upload(b"not an image", name='x.png').status_code, 400)
+        with override_settings(IMAGES={'WORKERS': 0, 'MAX_PIXELS': 1000}):
+            self.assertEqual(self.upload(self.image_bytes()).status_code, 400)
+        with override_settings(IMAGES={'WORKERS': 0, 'MAX_BYTES': 10}):
+            self.assertEqual(self.upload(self.image_bytes()).status_code, 400)
+        self.assertEqual(self.upload(self.image_bytes(), client=APIClient()).status_code, 401)
+        self.assertFalse(ImageAsset.objects.exists())
+
+    def test_posts_and_profiles_expose_variants(self):
+        image = self.upload(self.image_bytes()).json()['id']
+        avatar = self.upload(self.image_bytes((96, 96), 'JPEG', 'red')).json()['id']
+        response = self.client.post('/api/posts/', {'title': "Shot", 'content': "x", 'image_asset': image}, format='json')
+        post_id = Post.objects.get(title="Shot").pk
+        self.assertEqual(response.status_code, 201)
+        Post.objects.create(author=self.user, title="Text only", content="x")
+        self.client.patch(f'/api/users/{self.user.pk}/', {'avatar_asset': avatar}, format='json')
+
+        variants = ImageAsset.objects.get(pk=image).variants
+        with CaptureQueriesContext(connection) as ctx:
+            listed = self.client.get('/api/posts/').json()['results']
+        self.assertEqual(len(ctx.captured_queries), 2)  # validator, page
+        self.assertEqual([p['image_variants'] for p in listed], [None, variants])
+        detail = self.client.get(f'/api/posts/{post_id}/').json()
+        self.assertEqual(detail['image_variants'], variants)
+        self.assertEqual(detail['author']['avatar_variants'], ImageAsset.objects.get(pk=avatar).variants)
+        self.assertEqual(self.client.get(f'/api/users/{self.user.pk}/').json()['avatar_asset'], avatar)
+
+    def test_only_own_uploads_can_be_attached(self):
+        other = User.objects.create_user(username='other')
+        foreign = ImageAsset.objects.create(uploaded_by=other, digest="0" * 64, original="images/x.png",
+                                            width=1, height=1, size=1)
+        response = self.client.post('/api/posts/', {'title': "Lifted", 'content': "x", 'image_asset': foreign.pk},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image_asset', response.json())
+        response = self.client.patch(f'/api/users/{self.user.pk}/', {'avatar_asset': foreign.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        post = Post.objects.create(author=self.user, title="Mine", content="x")
+        response = self.client.post('/api/batch/', {'operations': [
+            {'op': 'update_post', 'id': post.pk, 'data': {'image_asset': foreign.pk}},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNone(Post.objects.get(pk=post.pk).image_asset_id)
+
+    def test_failed_resizes_can_be_retried(self):
+        with mock.patch('blog.imaging.make_variants', side_effect=OSError("disk full")), self.assertLogs('blog.images'):
+            asset_id = self.upload(self.image_bytes()).json()['id']
+        self.assertEqual(ImageAsset.objects.get(pk=asset_id).status, ImageAsset.FAILED)
+        self.assertEqual(images.process_pending(), 0)
+        self.assertEqual(images.process_pending(include_failed=True), 1)
+        self.assertEqual(ImageAsset.objects.get(pk=asset_id).status, ImageAsset.READY)
+
+
+
+# =============================================================
+# BATCHED WRITES
+# =============================================================
+
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='batcher')
+        cls.other = User.objects.create_user(username='other')
+        cls.mine = Post.objects.create(author=cls.user, title="Mine", content="x")
+        cls.theirs = Post.objects.create(author=cls.other, title="Theirs", content="x")
+        cls.their_comment = Comment.objects.create(post=cls.mine, author=cls.other, text="Hi")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, *operations):
+        return self.client.post('/api/batch/', {'operations': list(operations)}, format='json')
+
+    def test_runs_every_kind_in_one_transaction(self):
+        doomed = Post.objects.create(author=self.user, title="Doomed", content="x")
+        own_comment = Comment.objects.create(post=self.theirs, author=self.user, text="Oops")
+        response = self.batch(
+            {'op': 'comment', 'post': self.theirs.id, 'text': "First"},
+            {'op': 'comment', 'post': self.theirs.id, 'text': "Second"},
+            {'op': 'like', 'post': self.theirs.id},
+            {'op': 'like', 'post': self.mine.id},
+            {'op': 'like', 'post': self.mine.id},  # toggled back
+            {'op': 'save', 'post': self.theirs.id},
+            {'op': 'update_post', 'id': self.mine.id, 'data': {'title': "Renamed", 'tags': ['batch']}},
+            {'op': 'delete_comment', 'id': own_comment.id},
+            {'op': 'delete_post', 'id': doomed.id},
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], [201, 201, 200, 200, 200, 200, 200, 204, 204])
+        self.assertEqual(results[0]['data']['author_username'], 'batcher')
+        self.assertEqual(results[2]['data'], {'post': self.theirs.id, 'liked': True, 'likes': 1})
+        self.assertEqual([results[3]['data']['liked'], results[4]['data']['liked']], [True, False])
+        self.assertEqual(results[6]['data']['tags'], ['batch'])
+
+        self.theirs.refresh_from_db()
+        self.mine.refresh_from_db()
+        self.assertEqual((self.theirs.comment_count, self.theirs.likes, self.theirs.save_count), (2, 1, 1))
+        self.assertEqual((self.mine.title, self.mine.likes), ("Renamed", 0))
+        self.assertFalse(Post.objects.filter(pk=doomed.pk).exists())
+        self.assertEqual(recount(), {'post': 0, 'tag': 0, 'user': 0})  # counters kept exact
+        ids = [p['id'] for p in self.client.get('/api/posts/search/?q=Second').json()['results']]
+        self.assertEqual(ids, [self.theirs.id])
+
+    def test_invalid_batches_write_nothing(self):
+        response = self.batch(
+            {'op': 'comment', 'post': self.theirs.id, 'text': "Fine"},
+            {'op': 'comment', 'post': self.theirs.id, 'text': ""},
+            {'op': 'update_post', 'id': self.theirs.id, 'data': {'title': "Mine now"}},
+            {'op': 'delete_comment', 'id': self.their_comment.id},
+            {'op': 'like', 'post': 999999},
+            {'op': 'delete_post', 'id': self.mine.id},
+            {'op': 'save', 'post': self.mine.id},
+            {'op': 'shout'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.json()['results']], [424, 400, 403, 403, 404, 424, 409, 400])
+        self.assertFalse(Comment.objects.filter(text="Fine").exists())
+        self.assertTrue(Post.objects.filter(pk=self.mine.pk).exists())
+        self.assertEqual(self.batch().status_code, 400)
+        with override_settings(BATCH_MAX_OPERATIONS=1):
+            self.assertEqual(self.batch({'op': 'like', 'post': 1}, {'op': 'like', 'post': 1}).status_code, 400)
+        self.assertEqual(APIClient().post('/api/batch/', {'operations': []}, format='json').status_code, 401)
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        def queries(size):
+            posts = [Post.objects.create(author=self.other, title=f"P{i}", content="x") for i in range(size)]
+            operations = [{'op': 'comment', 'post': post.id, 'text': f"c{post.id}"} for post in posts]
+            operations += [{'op': op, 'post': post.id} for post in posts for op in ('like', 'save')]
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(self.batch(*operations).status_code, 200)
+            return len(ctx.captured_queries)
+        self.assertEqual(queries(5), queries(50))
+
+
+# =============================================================
+# SPARSE FIELDSETS
+# =============================================================
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer', bio="Long bio " * 20)
+        category = Category.objects.create(name="Tech")
+        cls.posts = [
+            Post.objects.create(author=cls.author, category=category, title=f"Post {i}", content="Body " * 200)
+            for i in range(5)
+        ]
+        for i in range(3):
+            Comment.objects.create(post=cls.posts[-1], author=cls.author, text=f"Comment {i}")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def fetch(self, url):
+        response_cache().clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        # The first query is the conditional GET validator (blog/conditional.py)
+        return response, [query['sql'] for query in ctx.captured_queries[1:]]
+
+    def test_detail_queries_and_payload(self):
+        detail = f'/api/posts/{self.posts[-1].id}/'
+        full, full_queries = self.fetch(detail)
+        cases = [
+            # query string, keys, queries, joins
+            ('?fields=id,title', ['id', 'title'], 1, 0),
+            ('?expand=', None, 1, 1),  # image_asset only
+            ('?fields=id,author,category&expand=category', ['id', 'author', 'category'], 1, 1),
+            ('?fields=id,comments&expand=comments', ['id', 'comments'], 2, 1),  # comments join their authors
+        ]
+        self.assertEqual(len(full_queries), 2)
+        for query, keys, count, joins in cases:
+            with self.subTest(query=query):
+                response, sqls = self.fetch(detail + query)
+                data = response.json()
+                if keys is not None:
+                    self.assertEqual(list(data), keys)
+                self.assertEqual(len(sqls), count)
+                self.assertEqual(sum(sql.count(' JOIN ') for sql in sqls), joins)
+                self.assertLess(len(response.content), len(full.content))
+                if 'fields=id,title' in query:
+                    self.assertNotIn('"content"', sqls[0])
+
+        collapsed = self.fetch(detail + '?expand=author')[0].json()
+        self.assertEqual(collapsed['author'], full.json()['author'])  # expanded, as before
+        self.assertEqual(collapsed['category'], full.json()['category']['id'])
+        self.assertNotIn('comments', collapsed)
+
+    def test_list_queries_and_payload(self):
+        full, _ = self.fetch('/api/posts/?page_size=2')
+        for fast in (False, True):
+            with self.subTest(fast=fast), override_settings(FAST_SERIALIZATION=fast):
+                response, sqls = self.fetch('/api/posts/?page_size=2&fields=id,title')
+                page = response.json()
+                self.assertEqual([list(post) for post in page['results']], [['id', 'title']] * 2)
+                self.assertEqual(len(sqls), 1)
+                self.assertNotIn('JOIN', sqls[0])
+                self.assertLess(len(response.content), len(full.content) / 2)
+                second = self.client.get(page['next']).json()['results']
+                self.assertEqual([post['id'] for post in second], [self.posts[2].id, self.posts[1].id])
+
+    def test_unknown_names_are_rejected(self):
+        self.assertEqual(self.client.get('/api/posts/?fields=id,password').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/posts/{self.posts[0].id}/?expand=tags').status_code, 400)
+
+
+# =============================================================
+# CONDITIONAL GET
+# =============================================================
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.category = Category.objects.create(name="Tech")
+        cls.posts = [
+            Post.objects.create(author=cls.author, category=cls.category, title=f"Post {i}", content="x")
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        response_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def revalidate(self, url, response, client=None):
+        return (client or self.client).get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_detail_and_list_answer_304_from_the_validator(self):
+        for url in (f'/api/posts/{self.posts[0].id}/', '/api/posts/?page_size=2', '/api/categories/'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response['Cache-Control'], 'no-cache')
+                self.assertTrue(response['ETag'].startswith('W/"'))
+                with mock.patch.object(PostDetailSerializer, 'to_representation') as serialize, \
+                        mock.patch.object(PostListSerializer, 'to_representation') as serialize_list, \
+                        self.assertNumQueries(1):
+                    revalidated = self.revalidate(url, response)
+                self.assertEqual(revalidated.status_code, 304)
+                self.assertEqual(revalidated['ETag'], response['ETag'])
+                self.assertFalse(serialize.called or serialize_list.called)
+                since = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                self.assertEqual(since.status_code, 304)
+
+    def test_changes_move_the_etag(self):
+        post = self.posts[-1]  # newest: first on the list page
+        detail, page = f'/api/posts/{post.id}/', '/api/posts/?page_size=2'
+        writer = APIClient()
+        writer.force_authenticate(self.author)
+        changes = [
+            lambda: writer.patch(detail, {'title': "Edited"}, format='json'),
+            lambda: writer.post(f'{detail}comment/', {'post': post.id, 'text': "First"}, format='json'),
+            lambda: writer.patch(f'/api/users/{self.author.id}/', {'username': 'renamed'}, format='json'),
+            lambda: Category.objects.get(pk=self.category.pk).save(),
+        ]
+        for change in changes:
+            before = {url: self.client.get(url) for url in (detail, page)}
+            change()
+            for url, response in before.items():
+                self.assertEqual(self.revalidate(url, response).status_code, 200, url)
+        # Posts past the page (and the row peeked at for `next`) do not invalidate it
+        page = '/api/posts/?page_size=1'
+        response = self.client.get(page)
+        self.posts[0].save()
+        self.assertEqual(self.revalidate(page, response).status_code, 304)
+
+    def test_anonymous_cache_hits_revalidate_without_queries(self):
+        anonymous = APIClient()
+        url = f'/api/posts/{self.posts[0].id}/'
+        response = anonymous.get(url)
+        with self.assertNumQueries(0):
+            revalidated = self.revalidate(url, response, anonymous)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['Last-Modified'], response['Last-Modified'])
+
+    def test_profiles_are_private_and_scoped(self):
+        url = f'/api/users/{self.reader.id}/'
+        response = self.client.get(url)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+        self.client.post(f'/api/users/{self.author.id}/follow/')
+        self.assertEqual(self.revalidate(url, response).status_code, 200)  # following_count
+        other = APIClient()
+        other.force_authenticate(self.author)
+        self.assertEqual(self.revalidate(url, response, other).status_code, 404)
+
+
+# =============================================================
+# LIVE EVENTS
+# =============================================================
+
+class LiveEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.fans = [User.objects.create_user(username=f'fan-{i}') for i in range(2)]
+        cls.post = Post.objects.create(author=cls.author, title="Live", content="x")
+        cls.url = f'/api/async/posts/{cls.post.id}/events/'
+
+    def write(self, user, method, path, data=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(client, method)(path, data, format='json')
+
+    async def open_stream(self):
+        """The stream's chunks arrive on a queue; cancelling the task is a client disconnect"""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = asyncio.Queue()
+
+        async def consume():
+            async for chunk in response.streaming_content:
+                await chunks.put(chunk)
+        return asyncio.create_task(consume()), chunks
+
+    async def test_stream_pushes_likes_and_comments(self):
+        reader, chunks = await self.open_stream()
+        first = await asyncio.wait_for(chunks.get(), 5)
+        self.assertIn(b'event: likes\ndata: {"post":%d,"likes":0}' % self.post.id, first)
+
+        write = sync_to_async(self.write)
+        for fan in self.fans:
+            await write(fan, 'post', f'/api/posts/{self.post.id}/like/')
+        await write(self.author, 'post', f'/api/posts/{self.post.id}/comment/', {'post': self.post.id, 'text': "Hi"})
+        await write(self.author, 'post', '/api/batch/', {'operations': [
+            {'op': 'comment', 'post': self.post.id, 'text': "Batched"},
+        ]})
+        events = b''
+        while events.count(b'event: comment') < 2:
+            events += await asyncio.wait_for(chunks.get(), 5)
+        self.assertIn(b'"likes":2', events)
+        comments = [json.loads(line[6:]) for line in events.split(b'\n') if b'"text"' in line]
+        self.assertEqual([c['text'] for c in comments], ["Hi", "Batched"])
+        self.assertEqual(comments[0]['author_username'], 'writer')
+
+        reader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await reader
+        self.assertEqual(live.broker.subscriber_count(), 0)
+
+    async def test_slow_streams_coalesce_and_resync(self):
+        subscriber = live.broker.subscribe(self.post.id, max_pending=3)
+        try:
+            for likes in range(1, 4):
+                live.broker.publish(self.post.id, 'likes', {'post': self.post.id, 'likes': likes})
+            await asyncio.sleep(0)  # deliveries run on the loop
+            self.assertEqual(subscriber.drain(), live.encode('likes', {'post': self.post.id, 'likes': 3}))
+
+            for i in range(5):
+                live.broker.publish(self.post.id, 'comment', {'post': self.post.id, 'id': i})
+            await asyncio.sleep(0)
+            self.assertEqual(subscriber.dropped, 5)
+            self.assertEqual(subscriber.drain(), live.RESYNC)
+            live.broker.publish(self.post.id, 'comment', {'post': self.post.id, 'id': 5})
+            await asyncio.sleep(0)
+            self.assertIn(b'"id":5', subscriber.drain())
+        finally:
+            live.broker.unsubscribe(subscriber)
+
+    async def test_errors(self):
+        missing = await self.async_client.get('/api/async/posts/999999/events/')
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(live.broker.publish(self.post.id, 'likes', {}), 0)
+        wsgi = await sync_to_async(self.client.get)(self.url)
+        self.assertEqual(wsgi.status_code, 501)
@@ -0,0 +1,187 @@
+"""
+Trending feed: a materialized, incrementally maintained ranking of posts.
+
+Each post has one TrendingScore row:
+
+    weight  likes, comments, saves and views, weighted by TRENDING['WEIGHTS']
+    base    the post's creation time, in half-lives since EPOCH
+    score   log2(1 + weight) + base
+
+Ranking by `score` is ranking by (1 + weight) * 2 ** -(age / HALF_LIFE):
+a post loses half its standing every HALF_LIFE, yet no stored score ever
+has to be rewritten as time passes, because the clock only moves the
+(common) reference point. So an interaction touches exactly one row:
+
+    like / save / comment   adjust(): one UPDATE of weight and score,
+                            in the transaction of the change itself
+    views                   adjusted per flushed batch (blog/counters.py)
+    new post                a row with weight 0 (bulk imports add theirs)
+    deleted post            its row cascades with it
+
+`manage.py recompute_trending` rebuilds every row from the stored
+counters, repairing drift from paths that skip signals and applying new
+weights or a new HALF_LIFE. The feed itself is a keyset range scan of
+`trending_score_idx`.
+
+    TRENDING = {
+        'HALF_LIFE': 43200,  # seconds
+        'WEIGHTS': {'likes': 1.0, 'comments': 2.0, 'saves': 3.0, 'views': 0.05},
+    }
+"""
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Greatest, Log
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .denorm import deleted_with, existing, relation_deltas
+from .models import Comment, Post, TrendingScore
+from .serializers import LIST_COLUMNS, LIST_RELATIONS
+
+DEFAULTS = {
+    'HALF_LIFE': 43200,
+    'WEIGHTS': {'likes': 1.0, 'comments': 2.0, 'saves': 3.0, 'views': 0.05},
+}
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+# Post counter -> TRENDING['WEIGHTS'] key
+COUNTERS = {'likes': 'likes', 'comment_count': 'comments', 'save_count': 'saves', 'views': 'views'}
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'TRENDING', {})}
+    config['WEIGHTS'] = {**DEFAULTS['WEIGHTS'], **config['WEIGHTS']}
+    return config
+
+
+# -----------------------------
+# SCORING
+# -----------------------------
+def base_score(created_at, config=None):
+    config = config or get_config()
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return (created_at - EPOCH).total_seconds() / config['HALF_LIFE']
+
+
+def score_row(post_id, created_at, counters, config=None):
+    """A TrendingScore for a post's creation time and {counter: value}"""
+    config = config or get_config()
+    weights = config['WEIGHTS']
+    weight = sum(weights[key] * counters[counter] for counter, key in COUNTERS.items())
+    base = base_score(created_at, config)
+    return TrendingScore(post_id=post_id, weight=weight, base=base, score=math.log2(1 + weight) + base)
+
+
+def score_rows(queryset, config=None, chunk_size=2000):
+    config = config or get_config()
+    rows = queryset.values_list('id', 'created_at', *COUNTERS).iterator(chunk_size=chunk_size)
+    for post_id, created_at, *counts in rows:
+        yield score_row(post_id, created_at, dict(zip(COUNTERS, counts)), config)
+
+
+def adjust(deltas):
+    """
+    Add `deltas` ({post_id: weight}) to the posts' weights and rescore them,
+    in one UPDATE. The SET expressions all read the old row, so `score` is
+    computed from the new weight.
+    """
+    deltas = {post_id: d for post_id, d in deltas.items() if d}
+    if not deltas:
+        return
+    if len(set(deltas.values())) == 1:
+        delta = Value(float(next(iter(deltas.values()))))
+    else:
+        delta = Case(*[When(post_id=post_id, then=Value(float(d))) for post_id, d in deltas.items()],
+                     default=Value(0.0), output_field=FloatField())
+    weight = Greatest(F('weight') + delta, Value(0.0))
+    TrendingScore.objects.filter(post_id__in=deltas).update(
+        weight=weight, score=Log(Value(2.0), weight + Value(1.0)) + F('base'),
+    )
+
+
+def track_posts(post_ids):
+    """Add rows for posts inserted without post_save (bulk_create)"""
+    TrendingScore.objects.bulk_create(
+        score_rows(Post.objects.filter(pk__in=post_ids)), ignore_conflicts=True,
+    )
+
+
+def recompute(batch_size=2000):
+    """Rebuild every score from the stored counters; returns the number of rows written"""
+    written = 0
+    batch = []
+    for row in score_rows(Post.objects.order_by(), chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) == batch_size:
+            written += upsert(batch)
+            batch = []
+    return written + upsert(batch)
+
+
+def upsert(rows):
+    TrendingScore.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['post'], update_fields=['weight', 'base', 'score'],
+    )
+    return len(rows)
+
+
+# -----------------------------
+# FEED
+# -----------------------------
+def trending_feed():
+    """TrendingScore rows with their posts, narrowed to PostListSerializer's columns"""
+    return (
+        TrendingScore.objects
+        .select_related(*(f'post__{name}' for name in LIST_RELATIONS))
+        .only('score', *(f'post__{name}' for name in LIST_COLUMNS))
+    )
+
+
+# -----------------------------
+# SIGNALS
+# -----------------------------
+@receiver(post_save, sender=Post)
+def track_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters = {counter: getattr(instance, counter) for counter in COUNTERS}
+        score_row(instance.pk, instance.created_at, counters).save(force_insert=True)
+
+
+@receiver(post_save, sender=Comment)
+def score_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        adjust({instance.post_id: get_config()['WEIGHTS']['comments']})
+
+
+@receiver(post_delete, sender=Comment)
+def score_removed_comment(sender, instance, origin=None, **kwargs):
+    if not deleted_with(origin, Post):
+        adjust({instance.post_id: -get_config()['WEIGHTS']['comments']})
+
+
+def score_relation(through, key, action, instance, reverse, pk_set):
+    # pre_remove has already narrowed pk_set to existing links (blog/denorm.py)
+    if action == 'pre_clear':
+        pk_set, sign = existing(through, instance, reverse), -1
+    elif action == 'post_add':
+        sign = 1
+    elif action == 'post_remove':
+        sign = -1
+    else:
+        return
+    if pk_set:
+        weight = get_config()['WEIGHTS'][key]
+        adjust({post_id: n * weight for post_id, n in relation_deltas(instance, reverse, pk_set, sign).items()})
+
+
+@receiver(m2m_changed, sender=Post.liked_by.through)
+def score_likes(sender, action, instance, reverse, pk_set, **kwargs):
+    score_relation(sender, 'likes', action, instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Post.saved_by.through)
+def score_saves(sender, action, instance, reverse, pk_set, **kwargs):
+    score_relation(sender, 'saves', action, instance, reverse, pk_set)
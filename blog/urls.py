@@ -1,9 +1,24 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CategoryViewSet, UserViewSet
+
+from . import async_views
+from .views import PostViewSet, CategoryViewSet, UserViewSet, TagViewSet, FeedView, ImageViewSet, BatchView
 
 router = DefaultRouter()
 router.register('posts', PostViewSet, basename='post')
 router.register('categories', CategoryViewSet, basename='category')
 router.register('users', UserViewSet, basename='user')
+router.register('tags', TagViewSet, basename='tag')
+router.register('images', ImageViewSet, basename='image')
 
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = router.urls + [
+    path('feed/', FeedView.as_view(), name='feed'),
+    path('batch/', BatchView.as_view(), name='batch'),
+    # Native async twins of the hottest endpoints (see blog/async_views.py)
+    path('async/posts/', async_views.post_list, name='async-post-list'),
+    path('async/posts/<int:pk>/', async_views.post_detail, name='async-post-detail'),
+    path('async/posts/<int:pk>/events/', async_views.post_events, name='async-post-events'),
+    path('async/posts/<int:pk>/like/', async_views.like_post, name='async-post-like'),
+    path('async/posts/<int:pk>/save_post/', async_views.save_post, name='async-post-save'),
+    path('async/categories/', async_views.category_list, name='async-category-list'),
+]
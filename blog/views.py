@@ -1,4 +1,13 @@
-from rest_framework import viewsets, status, generics
+import os
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models.signals import m2m_changed
+from django.http import StreamingHttpResponse
+from django.views.static import serve
+from rest_framework import mixins, viewsets, status, generics
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.views import APIView
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import (
@@ -7,14 +16,38 @@ from rest_framework.permissions import (
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
-from .models import Post, User, Category
+from .batch import max_operations as max_batch_operations, run_batch
+from .bulk import export_posts, import_posts
+from . import fastpath
+from .caching import cache_anonymous
+from .conditional import (
+    category_list_validator, conditional, post_detail_validator, post_list_validator, user_profile_validator,
+)
+from .counters import record_view
+from .feeds import feed_sources
+from .fieldsets import narrow, sparse_options
+from . import images, live
+from .models import Post, User, Category, Comment, Follow, ImageAsset, Tag
+from .pagination import CommentCursorPagination, FeedPagination, PostCursorPagination, TrendingCursorPagination
+from .search import search_posts
+from .tagging import MATCH_ALL, MATCH_ANY, filter_by_tags
+from .trending import trending_feed
 from .serializers import (
     UserSerializer,
+    UserProfileSerializer,
     PostListSerializer,
     PostDetailSerializer,
+    PostSearchSerializer,
+    TrendingPostSerializer,
     PostCreateUpdateSerializer,
     CommentSerializer,
+    PostCommentSerializer,
     CategorySerializer,
+    TagSerializer,
+    ImageAssetSerializer,
+    ImageUploadSerializer,
+    LIST_COLUMNS,
+    LIST_RELATIONS,
 )
 
 # =============================================================
@@ -54,12 +87,12 @@ class UserViewSet(viewsets.ModelViewSet):
     Authenticated users: view or edit their own profile
     """
     queryset = User.objects.all().order_by('-date_joined')
-    serializer_class = UserSerializer
+    serializer_class = UserProfileSerializer
 
     def get_permissions(self):
         if self.action in ['list', 'destroy']:
             permission_classes = [IsAdminUser]
-        elif self.action in ['retrieve', 'update', 'partial_update']:
+        elif self.action in ['retrieve', 'update', 'partial_update', 'follow', 'unfollow']:
             permission_classes = [IsAuthenticated]
         else:
             permission_classes = [AllowAny]
@@ -68,10 +101,34 @@ class UserViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Users can see all if admin, else only themselves"""
         user = self.request.user
-        if user.is_staff:
+        if user.is_staff or self.action in ['follow', 'unfollow']:
             return User.objects.all()
         return User.objects.filter(id=user.pk)
 
+    @conditional(user_profile_validator, private=True)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @action(detail=True, methods=['post'])
+    def follow(self, request, pk=None):
+        """Follow a user; their posts start showing up in /api/feed/"""
+        followee = self.get_object()
+        if followee.pk == request.user.pk:
+            return Response({'detail': 'You cannot follow yourself.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            with transaction.atomic():
+                Follow.objects.create(follower_id=request.user.pk, followee_id=followee.pk)
+        except IntegrityError:
+            pass  # already following
+        return Response({'following': True}, status=200)
+
+    @action(detail=True, methods=['post'])
+    def unfollow(self, request, pk=None):
+        """Stop following a user"""
+        followee = self.get_object()
+        Follow.objects.filter(follower_id=request.user.pk, followee_id=followee.pk).delete()
+        return Response({'following': False}, status=200)
+
 
 # =============================================================
 # CATEGORY VIEWSET
@@ -90,22 +147,119 @@ class CategoryViewSet(viewsets.ModelViewSet):
             return [IsAdminUser()]
         return [AllowAny()]
 
+    @conditional(category_list_validator)
+    def list(self, request, *args, **kwargs):
+        if not fastpath.enabled():
+            return super().list(request, *args, **kwargs)
+        fast = fastpath.values_serializer(CategorySerializer)
+        return Response(fast.serialize(fast.rows(self.filter_queryset(self.get_queryset()))))
+
+
+# =============================================================
+# TAG VIEWSET
+# =============================================================
+
+class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Tags with their usage counts, most used first.
+    Counts are maintained incrementally (see blog/tagging.py).
+    """
+    queryset = Tag.objects.all().order_by('-post_count', 'name')
+    serializer_class = TagSerializer
+    permission_classes = [AllowAny]
+
 
 # =============================================================
 # POST VIEWSET
 # =============================================================
 
+def with_list_columns(queryset):
+    """Narrow a Post queryset to the columns PostListSerializer renders"""
+    # comment_count is a stored counter (blog/denorm.py): no per-row COUNT
+    return (
+        queryset
+        .select_related(*LIST_RELATIONS)
+        .only(*LIST_COLUMNS)
+    )
+
+
+# Columns PostCursorPagination builds cursors from
+PAGINATION_KEYS = tuple(field.lstrip('-') for field in PostCursorPagination.ordering)
+
+# What PostDetailSerializer renders through relations
+DETAIL_RELATIONS = ('author__avatar_asset', 'category', 'image_asset')
+
+
+def first_comments(post):
+    """
+    The first POST_DETAIL_COMMENTS comments of `post`, as a queryset.
+
+    A plain LIMIT on comment_post_created_idx; a sliced Prefetch would
+    number every comment of the post with ROW_NUMBER() before filtering.
+    """
+    return (
+        Comment.objects.filter(post_id=post.pk).select_related('author')
+        .only('id', 'author_id', 'author__username', 'text', 'created_at')
+        .order_by('created_at', 'id')[:settings.POST_DETAIL_COMMENTS]
+    )
+
+
+def attach_first_comments(post):
+    post.first_comments = list(first_comments(post))
+    return post
+
+
+def toggle_relation(through, post, user):
+    """
+    Flip a post/user row in a many-to-many through table.
+
+    Works on the (post_id, user_id) unique index directly, so membership is a
+    single delete or insert instead of loading the whole relation. Returns
+    `(exists, changed)`: whether the row now exists and whether this call
+    was the one that flipped it. A flip sends the same m2m_changed that
+    `post.<relation>.add()/remove()` would, so counters follow (blog/denorm.py).
+    """
+    deleted, _ = through.objects.filter(post_id=post.pk, user_id=user.pk).delete()
+    if deleted:
+        action, exists = 'post_remove', False
+    else:
+        try:
+            with transaction.atomic():
+                through.objects.create(post_id=post.pk, user_id=user.pk)
+        except IntegrityError:
+            # A concurrent request by the same user inserted it first
+            return True, False
+        action, exists = 'post_add', True
+    m2m_changed.send(
+        sender=through, instance=post, action=action, reverse=False,
+        model=User, pk_set={user.pk}, using=router.db_for_write(through),
+    )
+    return exists, True
+
+
+def toggle_like(post, user):
+    """Like or unlike `post`; returns (liked, current like count)"""
+    with transaction.atomic():
+        liked, _ = toggle_relation(Post.liked_by.through, post, user)
+        likes = Post.objects.values_list('likes', flat=True).get(pk=post.pk)
+        live.publish_likes(post.pk, likes)
+    return liked, likes
+
+
+def toggle_save(post, user):
+    """Save or unsave `post`; returns whether it is now saved"""
+    with transaction.atomic():
+        saved, _ = toggle_relation(Post.saved_by.through, post, user)
+    return saved
+
+
 class PostViewSet(viewsets.ModelViewSet):
     """
     Handles all Post CRUD + custom actions (like, comment, save)
     """
-    queryset = (
-        Post.objects.all()
-        .select_related('author', 'category')
-        .prefetch_related('comments', 'liked_by', 'saved_by')
-        .order_by('-created_at')
-    )
+    queryset = Post.objects.all().order_by('-created_at', '-id')
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = PostCursorPagination
 
     def get_serializer_class(self):
         """Dynamically select serializer depending on the action"""
@@ -115,6 +269,67 @@ class PostViewSet(viewsets.ModelViewSet):
             return PostCreateUpdateSerializer
         return PostDetailSerializer
 
+    def get_sparse_options(self):
+        """`?fields=` / `?expand=` for list and detail (see blog/fieldsets.py)"""
+        if self.action not in ('list', 'retrieve'):
+            return {}
+        if not hasattr(self, '_sparse_options'):
+            self._sparse_options = sparse_options(self.request, self.get_serializer_class())
+        return self._sparse_options
+
+    def get_serializer(self, *args, **kwargs):
+        return super().get_serializer(*args, **kwargs, **self.get_sparse_options())
+
+    def get_queryset(self):
+        """Load only what the action's serializer renders"""
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            tags = self.request.query_params.getlist('tag')
+            match = MATCH_ANY if self.request.query_params.get('tag_match') == MATCH_ANY else MATCH_ALL
+            queryset = filter_by_tags(queryset, tags, match)
+            if self.get_sparse_options():
+                return narrow(queryset, self.get_serializer(), keep=PAGINATION_KEYS)
+            return with_list_columns(queryset)
+        if self.action == 'retrieve':
+            if self.get_sparse_options():
+                return narrow(queryset, self.get_serializer())
+            return queryset.select_related(*DETAIL_RELATIONS)
+        if self.action == 'comments':
+            return queryset.only('id')
+        return queryset
+
+    def get_object(self):
+        post = super().get_object()
+        if self.action == 'retrieve' and 'comments' in self.get_serializer().fields:
+            attach_first_comments(post)
+        return post
+
+    @cache_anonymous(lambda view: ['posts', 'authors'])
+    @conditional(post_list_validator)
+    def list(self, request, *args, **kwargs):
+        if not fastpath.enabled():
+            return super().list(request, *args, **kwargs)
+        return self.fast_list(self.filter_queryset(self.get_queryset()))
+
+    def fast_list(self, queryset):
+        """A PostListSerializer page built from `.values_list()` rows (see blog/fastpath.py)"""
+        fields = self.get_sparse_options().get('fields')
+        fast = fastpath.values_serializer(PostListSerializer, None if fields is None else tuple(fields))
+        page = self.paginate_queryset(fast.rows(queryset, keep=PAGINATION_KEYS))
+        return self.get_paginated_response(fast.serialize(page))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Return a post and count the view (buffered, see blog/counters.py)"""
+        response = self.render_detail(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            record_view(int(kwargs['pk']))
+        return response
+
+    @cache_anonymous(lambda view: [f"post:{view.kwargs['pk']}", 'categories', 'authors'])
+    @conditional(post_detail_validator)
+    def render_detail(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_create(self, serializer):
         """Set post author automatically"""
         serializer.save(author=self.request.user)
@@ -128,47 +343,175 @@ class PostViewSet(viewsets.ModelViewSet):
         post = self.get_object()
         serializer = CommentSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(author=request.user, post=post)
+            comment = serializer.save(author=request.user, post=post)
+            live.publish_comments([comment])
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    @cache_anonymous(lambda view: [f"post:{view.kwargs['pk']}", 'authors'])
+    def comments(self, request, pk=None):
+        """Page through a post's comments, oldest first (`?cursor=`)"""
+        post = self.get_object()
+        queryset = (
+            Comment.objects.filter(post_id=post.pk).select_related('author')
+            .only('id', 'author_id', 'author__username', 'text', 'created_at')
+        )
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(PostCommentSerializer(page, many=True).data)
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def like(self, request, pk=None):
         """Toggle like/unlike for a post"""
         post = self.get_object()
-        user = request.user
-
-        if user in post.liked_by.all():
-            post.liked_by.remove(user)
-            post.likes = max(post.likes - 1, 0)
-            message = "Unliked"
-        else:
-            post.liked_by.add(user)
-            post.likes += 1
-            message = "Liked"
-
-        post.save(update_fields=['likes'])
-        return Response({'message': message, 'likes': post.likes}, status=200)
+        liked, likes = toggle_like(post, request.user)
+        message = "Liked" if liked else "Unliked"
+        return Response({'message': message, 'likes': likes}, status=200)
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def save_post(self, request, pk=None):
         """Toggle save/unsave for a post"""
         post = self.get_object()
-        user = request.user
-
-        if post in user.saved_posts.all():
-            user.saved_posts.remove(post)
-            message = "Post unsaved"
-        else:
-            user.saved_posts.add(post)
-            message = "Post saved"
+        saved = toggle_save(post, request.user)
+        message = "Post saved" if saved else "Post unsaved"
 
         return Response({'message': message}, status=200)
 
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def search(self, request):
+        """Full-text search over posts and comments, best match first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'q': ['This query parameter is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        limit = self.paginator.get_page_size(request)
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            offset = 0
+
+        matches = search_posts(query, limit=limit, offset=offset)
+        posts = with_list_columns(Post.objects.filter(pk__in=[post_id for post_id, _ in matches])).in_bulk()
+        results = []
+        for post_id, snippet in matches:
+            if post_id in posts:
+                posts[post_id].snippet = snippet
+                results.append(posts[post_id])
+        return Response({'results': PostSearchSerializer(results, many=True).data})
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def trending(self, request):
+        """Posts by time-decayed popularity, highest first (see blog/trending.py)"""
+        paginator = TrendingCursorPagination()
+        page = paginator.paginate_queryset(trending_feed(), request, view=self)
+        posts = []
+        for row in page:
+            row.post.trending_score = row.score
+            posts.append(row.post)
+        return paginator.get_paginated_response(TrendingPostSerializer(posts, many=True).data)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Stream every post as JSONL (admin only)"""
+        response = StreamingHttpResponse(export_posts(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="posts.jsonl"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser])
+    def import_jsonl(self, request):
+        """Bulk-create posts from a JSONL request body (admin only)"""
+        # Read the raw body line by line instead of through the parsers,
+        # so large uploads are never held in memory as a whole.
+        stream = request.stream
+        if stream is None:
+            return Response({'detail': 'Empty request body.'}, status=status.HTTP_400_BAD_REQUEST)
+        result = import_posts(stream, request.user)
+        result['errors'] = [{'line': line, 'error': message} for line, message in result['errors']]
+        return Response(result, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def saved(self, request):
         """Return all posts saved by the logged-in user"""
         user = request.user
-        saved_posts = user.saved_posts.all().select_related('author').prefetch_related('comments')
-        serializer = PostListSerializer(saved_posts, many=True)
-        return Response(serializer.data)
+        saved_posts = with_list_columns(user.saved_posts.all())
+        if fastpath.enabled():
+            return self.fast_list(saved_posts)
+        page = self.paginate_queryset(saved_posts)
+        serializer = PostListSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+# =============================================================
+# IMAGES
+# =============================================================
+
+class ImageViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Upload an image (multipart `file`) and poll it until its variants are
+    ready; attach it to posts as `image_asset`, to profiles as `avatar_asset`.
+    """
+    queryset = ImageAsset.objects.all()
+    serializer_class = ImageAssetSerializer
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get_permissions(self):
+        if self.action == 'create':
+            return [IsAuthenticated()]
+        return [AllowAny()]
+
+    def create(self, request, *args, **kwargs):
+        """201 with a pending asset (variants follow in the background), 200 for known content"""
+        upload = ImageUploadSerializer(data=request.data)
+        upload.is_valid(raise_exception=True)
+        asset, created = images.store_upload(upload.validated_data['file'], request.user)
+        return Response(
+            ImageAssetSerializer(asset).data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+        )
+
+
+def serve_image(request, path):
+    """
+    Serve content-addressed media (IMAGES['PREFIX']) with far-future caching.
+    Only wired up when IMAGES['SERVE'] is on; in production let the web
+    server send the same headers.
+    """
+    root = os.path.join(settings.MEDIA_ROOT, images.get_config()['PREFIX'])
+    response = serve(request, path, document_root=root)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+# =============================================================
+# BATCHED WRITES
+# =============================================================
+
+class BatchView(APIView):
+    """Run many writes in one request and one transaction (see blog/batch.py)"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not operations:
+            return Response({'operations': ["Expected a non-empty list."]}, status=status.HTTP_400_BAD_REQUEST)
+        if len(operations) > max_batch_operations():
+            return Response(
+                {'operations': [f"At most {max_batch_operations()} operations per batch."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        succeeded, results = run_batch(operations, request)
+        return Response({'results': results}, status=status.HTTP_200_OK if succeeded else status.HTTP_400_BAD_REQUEST)
+
+
+# =============================================================
+# FOLLOWING FEED
+# =============================================================
+
+class FeedView(APIView):
+    """Posts by the users you follow, newest first (strategy per settings.FEED, see blog/feeds.py)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        paginator = FeedPagination()
+        page = paginator.paginate_sources(feed_sources(request.user), request)
+        return paginator.get_paginated_response(PostListSerializer(page, many=True).data)
+
@@ -2,6 +2,10 @@
 ASGI config for blog_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with any ASGI server (e.g. ``uvicorn blog_api.asgi:application``)
+for the native async views under /api/async/, including the live event
+streams at /api/async/posts/<id>/events/, which WSGI does not serve. The
+streams' broker is per process (see blog/live.py).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
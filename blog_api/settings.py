@@ -2,6 +2,7 @@
 Django settings for blog_api project.
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -49,8 +50,10 @@ AUTH_USER_MODEL = 'blog.User'
 # MIDDLEWARE
 # ------------------------------------------------------------
 MIDDLEWARE = [
+    'blog.metrics.MetricsMiddleware',  # outermost, so it times the whole stack
     'corsheaders.middleware.CorsMiddleware',  # must be at the top for CORS
     'django.middleware.security.SecurityMiddleware',
+    'blog.routers.PrimaryStickinessMiddleware',  # picks the DB alias for reads
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',  # keep for admin
@@ -83,11 +86,81 @@ CORS_ALLOW_ALL_ORIGINS = True
 # ------------------------------------------------------------
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'blog.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'blog.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# List endpoints serialize straight from .values_list() rows (see blog/fastpath.py)
+FAST_SERIALIZATION = False
+# JSON encoder behind FastJSONRenderer (see blog/renderers.py)
+JSON_ENCODER = 'blog.renderers.stdlib_dumps'
+
+# Per-request metrics, served at /metrics (see blog/metrics.py)
+METRICS = {
+    'ENABLED': True,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+    'DUMP_PATH': os.environ.get('BLOG_METRICS_DUMP') or None,
+    'DUMP_INTERVAL': 60,
+    'SLOW_QUERY_MS': 100,
+    'SLOW_QUERY_SAMPLE': 1.0,
+}
+
+# Keyset pagination for post feeds (see blog/pagination.py)
+POST_PAGE_SIZE = 20
+POST_MAX_PAGE_SIZE = 100
+
+# Comments: how many the post detail embeds, and paging of /posts/{id}/comments/
+POST_DETAIL_COMMENTS = 10
+COMMENT_PAGE_SIZE = 50
+COMMENT_MAX_PAGE_SIZE = 200
+
+# Operations accepted per POST /api/batch/ (see blog/batch.py)
+BATCH_MAX_OPERATIONS = 1000
+
+# Trending feed scoring (see blog/trending.py); run `manage.py recompute_trending`
+# after changing it
+TRENDING = {
+    'HALF_LIFE': 43200,  # seconds for a post's standing to halve
+    'WEIGHTS': {'likes': 1.0, 'comments': 2.0, 'saves': 3.0, 'views': 0.05},
+}
+
+# Following feed at /api/feed/ (see blog/feeds.py)
+FEED = {
+    'MODE': 'hybrid',  # or 'push' (fan-out-on-write), 'pull' (fan-out-on-read)
+    'INBOX_SIZE': 500,
+    'CELEBRITY_FOLLOWERS': 10000,
+    'TRIM_EVERY': 20,
+}
+
+# Image uploads at /api/images/ and their resized variants (see blog/images.py)
+IMAGES = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': {'webp': 80, 'jpeg': 82},
+    'MAX_BYTES': 10 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'WORKERS': 2,  # resizing processes; 0 resizes inline, in the request's thread
+}
+
+# Live like/comment events at /api/async/posts/<id>/events/ (see blog/live.py);
+# served under ASGI only
+LIVE = {
+    'MAX_PENDING': 100,  # comments buffered per stream before it is told to resync
+    'KEEPALIVE': 15,  # seconds
+}
+
+# Write-behind view counter (see blog/counters.py)
+VIEW_COUNTER = {
+    'BACKEND': 'blog.counters.LocalViewBuffer',
+    'FLUSH_INTERVAL': 5,  # seconds
+    'BATCH_SIZE': 500,
 }
 
 
@@ -108,6 +181,13 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+# How authenticated requests find their user (see blog/authentication.py)
+JWT_USER_LOOKUP = {
+    'MODE': 'cache',  # or 'claims' (stateless), or 'db'
+    'TTL': 60,
+    'MAX_USERS': 10000,
+}
+
 
 # ------------------------------------------------------------
 # TEMPLATES
@@ -131,13 +211,55 @@ TEMPLATES = [
 # ------------------------------------------------------------
 # DATABASE
 # ------------------------------------------------------------
+# blog.sqlite is the stock SQLite backend plus WAL/pragmas, a read-only
+# connection for autocommit SELECTs and a process-wide writer lock
+# (see blog/sqlite/base.py).
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'blog.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,  # keep tuned connections (and their page cache) across requests
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',  # take the write lock at BEGIN, never mid-transaction
+        },
     }
 }
 
+# Read replicas (see blog/routers.py). Locally, BLOG_SQLITE_REPLICAS=N adds N
+# SQLite copies of the primary, refreshed with `manage.py sync_replicas`.
+REPLICA_ALIASES = [f'replica{i}' for i in range(1, int(os.environ.get('BLOG_SQLITE_REPLICAS', 0)) + 1)]
+for _alias in REPLICA_ALIASES:
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / f'db.{_alias}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['blog.routers.ReplicaRouter']
+DATABASE_REPLICAS = {
+    'ALIASES': REPLICA_ALIASES,
+    'PATHS': ['/api/posts/', '/api/categories/', '/api/users/', '/api/async/'],
+    'STICKY_SECONDS': 5,  # keep a writer on the primary while replicas catch up
+}
+
+
+# ------------------------------------------------------------
+# CACHES
+# ------------------------------------------------------------
+# 'responses' holds rendered anonymous post list/detail responses
+# (see blog/caching.py). For a cache shared between worker processes use
+# 'django.core.cache.backends.filebased.FileBasedCache' with a LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'blog.caching.ByteLRUCache',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_BYTES': 64 * 1024 * 1024},
+    },
+}
+
 
 # ------------------------------------------------------------
 # PASSWORD VALIDATION
@@ -8,7 +8,9 @@ from rest_framework_simplejwt.views import TokenRefreshView
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
-from blog.views import RegisterView, CustomTokenObtainPairView
+from blog.metrics import metrics_view
+from blog import images
+from blog.views import RegisterView, CustomTokenObtainPairView, serve_image
 
 
 # ------------------------------------------------------------
@@ -40,6 +42,9 @@ urlpatterns = [
     # 📝 Blog app endpoints
     path('api/', include('blog.urls')),
 
+    # 📈 Prometheus metrics
+    path('metrics', metrics_view, name='metrics'),
+
     # 📄 Swagger Docs
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='swagger-ui'),
 ]
@@ -48,5 +53,11 @@ urlpatterns = [
 # ------------------------------------------------------------
 # Serve media files in development
 # ------------------------------------------------------------
+if images.get_config()['SERVE']:
+    # Content-addressed images, cached forever (see blog/images.py)
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.strip('/')}/{images.get_config()['PREFIX']}/<path:path>", serve_image),
+    ]
+
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)